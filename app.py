@@ -1,13 +1,66 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-from models import User, Patient, Doctor, Administrator, Appointment, Room, Treatment, Bill, MedicalRecord, Department, session as db_session
-from datetime import datetime, timedelta, time
-from sqlalchemy import func
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, stream_with_context
+from models import (
+    User, Patient, Doctor, Administrator, Appointment, ClinicRoom, Room, Treatment, Bill, MedicalRecord, Department,
+    Session, begin_write, engine, session as db_session,
+)
+from scheduling import (
+    BOOKING_LEAD_DAYS, DEFAULT_DURATION, MAX_DAYS_AHEAD, SLOT_HOURS, appointment_span, earliest_slots,
+    find_first_free_slot, load_patient_bitmaps, slot_bit, taken_slots,
+)
+from table_versions import etag_for, track_writes
+from doctor_load import DOCTOR_LOAD
+from availability import DOCTOR_CALENDARS, free_hours
+from intervals import APPOINTMENT_INTERVALS
+from rooms import ROOM_OCCUPANCY
+from patient_charts import PATIENT_CHARTS
+from process_index import track_process_indexes
+from batch_scheduling import BatchConflict, schedule_batch
+from records import RECORD_TYPES, RecordError, apply_records, parse_duration
+from search import format_cursor, parse_cursor, search_people, search_records
+from metrics import init_metrics, render_prometheus
+from query_debug import init_query_debug
+from serializers import (
+    PATIENT_FIELDS, DOCTOR_FIELDS, APPOINTMENT_FIELDS, ROOM_FIELDS, CLINIC_ROOM_FIELDS, TREATMENT_FIELDS,
+    USER_FIELDS, ADMINISTRATOR_FIELDS, DEPARTMENT_FIELDS, MEDICAL_RECORD_FIELDS, BILL_FIELDS,
+)
+from datetime import date, datetime, timedelta, time
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import hmac
+import json
 import os
+import random
 
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-key")
 
+# Writes bump per-table versions, which back the /api ETags
+track_writes(Session)
+
+# Committed writes keep the in-memory scheduling indexes current and drop
+# the cached charts of the patients they touch
+PROCESS_INDEXES = (DOCTOR_LOAD, DOCTOR_CALENDARS, APPOINTMENT_INTERVALS, ROOM_OCCUPANCY, PATIENT_CHARTS)
+track_process_indexes(Session, *PROCESS_INDEXES)
+
+# Per-endpoint latency, SQL and template timings, exported at /metrics to
+# admins and to scrapers sending METRICS_TOKEN as a bearer token;
+# SERVER_TIMING=1 also reports them to the browser in a Server-Timing header
+app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN"))
+init_metrics(app, engine, server_timing=os.environ.get("SERVER_TIMING") == "1")
+
+# Debug-mode N+1 warnings (FLASK_DEBUG=1, or running this file directly);
+# SLOW_QUERY_MS=<ms> logs slow statements with their plan
+if __name__ == "__main__":
+    app.debug = True
+init_query_debug(app, engine)
+
+# Each request works in its own session; drop it (rolling back anything
+# left uncommitted) so a failed request cannot leak state into the next one
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    db_session.remove()
+
 # --- LOGIN API (POST) ---
 @app.route("/login", methods=["POST"])
 def login():
@@ -55,6 +108,8 @@ def signup():
     address = data.get("address")
     phone = data.get("phone")
 
+    begin_write(db_session)
+
     # Check if email exists
     existing = db_session.query(User).filter_by(Email=email).first()
     if existing:
@@ -67,7 +122,7 @@ def signup():
         User_Type="patient"
     )
     db_session.add(new_user)
-    db_session.commit()
+    db_session.flush()
 
     # Create patient profile
     profile = Patient(
@@ -90,6 +145,8 @@ def edit_profile():
 
     user_id = session["user_id"]
     user_type = session.get("user_type", "").lower()
+    if request.method == "POST":
+        begin_write(db_session)
 
     user = db_session.query(User).filter(User.User_ID == user_id).first()
 
@@ -282,343 +339,498 @@ def RequestAppointment():
     return render_template("RequestAppointment.html")
 
 # --- Requests ---
-@app.get("/api/patients")
-def api_patients():
-    patients = db_session.query(Patient).all()
-    data = [
-        {
-            "Patient_ID": p.Patient_ID,
-            "First_Name": p.First_Name,
-            "Last_Name": p.Last_Name,
-        }
-        for p in patients
-    ]
-    response = jsonify(data)
+# List endpoints return one page at a time, keyed on the primary key, when
+# asked for one:
+#   ?limit=<n>   page size (default DEFAULT_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+#   ?after=<id>  only rows whose id is greater than <id>
+# The id to pass as `after` for the next page is sent in the X-Next-Cursor
+# header; it is absent on the last page. Without either argument they still
+# return every matching row, as they did before pages existed.
+#
+# Full-table exports use ?format=ndjson (one JSON object per line) or
+# ?format=json (a single array); both stream every matching row after
+# `after`, reading STREAM_BATCH_SIZE rows at a time so memory stays flat.
+# The unpaged list is the same stream as ?format=json.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+class InvalidQueryArg(ValueError):
+    pass
+
+
+@app.errorhandler(InvalidQueryArg)
+def invalid_query_arg(error):
+    return jsonify({"error": str(error)}), 400
+
+
+def int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidQueryArg(f"'{name}' must be an integer")
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise InvalidQueryArg(f"'{name}' must be a date (YYYY-MM-DD)")
+
+
+def filter_eq(query, column, arg_name):
+    value = int_arg(arg_name)
+    return query.filter(column == value) if value is not None else query
+
+
+def filter_date_range(query, column):
+    """Applies the inclusive ?date_from=&date_to= range to a Date column."""
+    date_from = date_arg("date_from")
+    date_to = date_arg("date_to")
+    if date_from is not None:
+        query = query.filter(column >= date_from)
+    if date_to is not None:
+        query = query.filter(column <= date_to)
+    return query
+
+
+def paginate(query, id_column):
+    """Returns (rows, next_cursor) for the page selected by ?limit= and ?after=."""
+    limit = int_arg("limit") or DEFAULT_PAGE_SIZE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = int_arg("after")
+    if after is not None:
+        query = query.filter(id_column > after)
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(id_column.asc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, getattr(rows[-1], id_column.key)
+
+
+def stream_response(query, spec, fmt):
+    """Streams every row of the query in id order as NDJSON or a JSON array."""
+    id_column, serialize = spec.id_column, spec.serialize
+    after = int_arg("after")
+    if after is not None:
+        query = query.filter(id_column > after)
+    rows = query.order_by(id_column.asc()).yield_per(STREAM_BATCH_SIZE)
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    def batches():
+        batch = []
+        for row in rows:
+            batch.append(encode(serialize(row)))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def generate_ndjson():
+        for batch in batches():
+            yield "\n".join(batch) + "\n"
+
+    def generate_json_array():
+        yield "["
+        separator = ""
+        for batch in batches():
+            yield separator + ",".join(batch)
+            separator = ","
+        yield "]"
+
+    generate = generate_ndjson if fmt == "ndjson" else generate_json_array
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[fmt])
+
+
+def list_response(query, spec):
+    """
+    Serves a list endpoint as one keyset page when ?limit= or ?after= is
+    given, as a stream with ?format=, and as the whole list otherwise.
+    `query` selects the columns of `spec` (a serializers.FieldSpec).
+    Responses carry an ETag tied to the table's shared write version and to
+    the query string, so every page and filter has its own; a matching
+    If-None-Match is answered with 304 after only the version lookup.
+    """
+    query_key = hashlib.blake2b(request.query_string, digest_size=8).hexdigest()
+    etag = f"{etag_for(db_session, spec.id_column.table.name)}-{query_key}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        fmt = request.args.get("format")
+        if fmt:
+            if fmt not in STREAM_MIMETYPES:
+                raise InvalidQueryArg(f"'format' must be one of: {', '.join(STREAM_MIMETYPES)}")
+            response = stream_response(query, spec, fmt)
+        elif "limit" not in request.args and "after" not in request.args:
+            response = stream_response(query, spec, "json")
+        else:
+            rows, next_cursor = paginate(query, spec.id_column)
+            response = page_response([spec.serialize(row) for row in rows], next_cursor)
+    response.set_etag(etag)
+    # Let browsers keep the body but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
     response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, ETag"
     return response
 
-@app.get("/api/doctors")
-def api_doctors():
-    doctors = db_session.query(Doctor).all()
-    data = [
-        {
-            "Doctor_ID": d.Doctor_ID,
-            "First_Name": d.First_Name,
-            "Last_Name": d.Last_Name,
-            "Specialization": d.Specialization,
-        }
-        for d in doctors
-    ]
+
+def page_response(data, next_cursor):
     response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     return response
 
+
+@app.get("/api/patients")
+def api_patients():
+    return list_response(PATIENT_FIELDS.query(db_session), PATIENT_FIELDS)
+
+# Everything about one patient in one response: demographics, appointments
+# with doctor names and rooms, medical records with their treatments, and
+# bills. Patients see their own chart, doctors and admins any.
+@app.get("/api/patients/<int:patient_id>/chart")
+def api_patient_chart(patient_id):
+    user_type = session.get("user_type", "").lower()
+    if user_type == "patient":
+        if session.get("patient_id") != patient_id:
+            return jsonify({"error": "Unauthorized"}), 401
+    elif user_type not in ("doctor", "admin"):
+        return jsonify({"error": "Unauthorized"}), 401
+    chart = PATIENT_CHARTS.get(db_session, patient_id)
+    if chart is None:
+        return jsonify({"error": "Patient not found"}), 404
+    return jsonify(chart)
+
+@app.get("/api/doctors")
+def api_doctors():
+    return list_response(DOCTOR_FIELDS.query(db_session), DOCTOR_FIELDS)
+
 @app.get("/api/appointments")
 def api_appointments():
-    appointments = db_session.query(Appointment).all()
-    def serialize_dt(value):
-        return str(value) if value is not None else None
-    data = [
-        {
-            "Appt_ID": a.Appt_ID,
-            "Doctor_ID": a.Doctor_ID,
-            "Patient_ID": a.Patient_ID,
-            "Date": serialize_dt(a.Date),
-            "Time": serialize_dt(a.Time),
-        }
-        for a in appointments
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    query = APPOINTMENT_FIELDS.query(db_session)
+    query = filter_eq(query, Appointment.Doctor_ID, "doctor_id")
+    query = filter_eq(query, Appointment.Patient_ID, "patient_id")
+    query = filter_date_range(query, Appointment.Date)
+    return list_response(query, APPOINTMENT_FIELDS)
 
 @app.get("/api/rooms")
 def api_rooms():
-    rooms = db_session.query(Room).all()
-    data = [
-        {
-            "Room_ID": r.Room_ID,
-            "Appt_ID": r.Appt_ID,
-            "room_type": r.room_type,
-        }
-        for r in rooms
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    query = filter_eq(ROOM_FIELDS.query(db_session), Room.Appt_ID, "appt_id")
+    query = filter_eq(query, Room.Room_No, "room_no")
+    return list_response(query, ROOM_FIELDS)
+
+@app.get("/api/clinic_rooms")
+def api_clinic_rooms():
+    query = CLINIC_ROOM_FIELDS.query(db_session)
+    room_type = request.args.get("room_type")
+    if room_type:
+        query = query.filter(ClinicRoom.room_type == room_type)
+    return list_response(query, CLINIC_ROOM_FIELDS)
+
+# Rooms of a type with a place free for a whole appointment:
+#   ?room_type=<type>&date=<date>&time=HH:MM[&duration=<minutes>]
+@app.get("/api/clinic_rooms/free")
+def api_clinic_rooms_free():
+    room_type = request.args.get("room_type")
+    day = date_arg("date")
+    try:
+        start_time = datetime.strptime(request.args.get("time", ""), "%H:%M").time()
+    except ValueError:
+        raise InvalidQueryArg("'time' must be HH:MM")
+    if not room_type or day is None:
+        raise InvalidQueryArg("pass 'room_type', 'date' and 'time'")
+    try:
+        duration = parse_duration(request.args.get("duration")) or DEFAULT_DURATION
+    except RecordError as e:
+        raise InvalidQueryArg(str(e))
+    return jsonify([
+        {"Room_No": room_no, "Free_Places": places}
+        for room_no, places in ROOM_OCCUPANCY.free_rooms(db_session, room_type, day, start_time, duration)
+    ])
 
 @app.get("/api/treatments")
 def api_treatments():
-    treatments = db_session.query(Treatment).all()
-    # Note: frontend expects 'Perscription' (misspelling), so we output that key
-    data = [
-        {
-            "Treatment_ID": t.Treatment_ID,
-            "Medicine": t.Medicine,
-            "Perscription": t.Prescription,
-        }
-        for t in treatments
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    query = filter_eq(TREATMENT_FIELDS.query(db_session), Treatment.Record_ID, "record_id")
+    return list_response(query, TREATMENT_FIELDS)
 
 # --- Additional APIs for ViewRecords page ---
 @app.get("/api/users")
 def api_users():
-    users = db_session.query(User).all()
-    data = [
-        {
-            "User_ID": u.User_ID,
-            "Email": u.Email,
-            "User_Type": u.User_Type,
-            "Password": u.Password
-        }
-        for u in users
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    return list_response(USER_FIELDS.query(db_session), USER_FIELDS)
 
 @app.get("/api/administrators")
 def api_administrators():
-    admins = db_session.query(Administrator).all()
-    data = [
-        {
-            "Admin_ID": a.Admin_ID,
-            "First_Name": a.First_Name,
-            "Last_Name": a.Last_Name,
-            "Dept_ID": a.Dept_ID,
-        }
-        for a in admins
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    return list_response(ADMINISTRATOR_FIELDS.query(db_session), ADMINISTRATOR_FIELDS)
 
 @app.get("/api/departments")
 def api_departments():
-    depts = db_session.query(Department).all()
-    data = [
-        {
-            "Dept_ID": d.Dept_ID,
-            "Dept_name": d.Dept_name,
-            "Dept_head": d.Dept_head,
-            "Doctor_ID": d.Doctor_ID,
-        }
-        for d in depts
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    return list_response(DEPARTMENT_FIELDS.query(db_session), DEPARTMENT_FIELDS)
 
 @app.get("/api/medical_records")
 def api_medical_records():
-    records = db_session.query(MedicalRecord).all()
-    data = [
-        {
-            "Record_ID": r.Record_ID,
-            "Patient_ID": r.Patient_ID,
-            "Doctor_ID": r.Doctor_ID,
-            "Symptoms": getattr(r, "Symptoms", None),
-            "Diagnosis": r.Diagnosis,
-        }
-        for r in records
-    ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+    query = MEDICAL_RECORD_FIELDS.query(db_session)
+    query = filter_eq(query, MedicalRecord.Doctor_ID, "doctor_id")
+    query = filter_eq(query, MedicalRecord.Patient_ID, "patient_id")
+    return list_response(query, MEDICAL_RECORD_FIELDS)
 
 @app.get("/api/bills")
 def api_bills():
-    bills = db_session.query(Bill).all()
-    def serialize_dt(value):
-        return str(value) if value is not None else None
-    data = [
+    query = filter_eq(BILL_FIELDS.query(db_session), Bill.Patient_ID, "patient_id")
+    query = filter_date_range(query, Bill.Date)
+    return list_response(query, BILL_FIELDS)
+
+# --- Search ---
+# Ranked full-text search over diagnoses, symptoms and treatments.
+# Patients see their own records, doctors the records they wrote, admins all.
+#   ?q=<text>    words to find; the last one matches as a prefix
+#   ?limit=<n>   hits per page (default SEARCH_PAGE_SIZE, capped at MAX_PAGE_SIZE)
+#   ?after=<c>   cursor from the previous page's X-Next-Cursor header (score and
+#                Record_ID of its last hit; the next page seeks past it)
+SEARCH_PAGE_SIZE = 20
+
+@app.get("/api/search/records")
+def api_search_records():
+    user_type = session.get("user_type", "").lower()
+    if user_type == "patient" and session.get("patient_id"):
+        scope = {"patient_id": session["patient_id"]}
+    elif user_type == "doctor" and session.get("doctor_id"):
+        scope = {"doctor_id": session["doctor_id"]}
+    elif user_type == "admin":
+        scope = {}
+    else:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    limit = max(1, min(int_arg("limit") or SEARCH_PAGE_SIZE, MAX_PAGE_SIZE))
+    after = request.args.get("after")
+    if after:
+        try:
+            after = parse_cursor(after)
+        except ValueError:
+            raise InvalidQueryArg("'after' must be a cursor from X-Next-Cursor")
+    hits, next_after = search_records(db_session, request.args.get("q", ""), limit=limit, after=after or None, **scope)
+    return page_response(hits, format_cursor(next_after) if next_after else None)
+
+# Typeahead over names, emails and phone numbers (prefix match).
+# Admins and doctors find patients and doctors; patients find doctors.
+#   ?q=<text>              what has been typed so far
+#   ?kind=patient|doctor   only one kind of person
+#   ?limit=<n>             matches to return (default PEOPLE_PAGE_SIZE, capped at MAX_PEOPLE_PAGE_SIZE)
+PEOPLE_PAGE_SIZE = 10
+MAX_PEOPLE_PAGE_SIZE = 50
+
+@app.get("/api/search/people")
+def api_search_people():
+    user_type = session.get("user_type", "").lower()
+    if user_type in ("admin", "doctor"):
+        kinds = ("patient", "doctor")
+    elif user_type == "patient":
+        kinds = ("doctor",)
+    else:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    kind = request.args.get("kind")
+    if kind:
+        if kind not in ("patient", "doctor"):
+            raise InvalidQueryArg("'kind' must be one of: patient, doctor")
+        kinds = tuple(k for k in kinds if k == kind)
+    limit = max(1, min(int_arg("limit") or PEOPLE_PAGE_SIZE, MAX_PEOPLE_PAGE_SIZE))
+    return jsonify(search_people(db_session, request.args.get("q", ""), kinds, limit))
+
+# --- Availability ---
+# Free bookable hours per doctor and day, from the in-memory calendar index.
+#   ?from=<date>&to=<date>   inclusive range (default: today and the next 6 days,
+#                            at most MAX_AVAILABILITY_DAYS); past days have no free hours
+# The multi-doctor variant takes ?ids=1,2,3 and/or ?specialization=.
+MAX_AVAILABILITY_DAYS = 92
+MAX_AVAILABILITY_DOCTORS = 100
+
+def availability_range():
+    today = datetime.utcnow().date()
+    start = date_arg("from") or today
+    end = date_arg("to") or start + timedelta(days=6)
+    if end < start:
+        raise InvalidQueryArg("'to' must not be before 'from'")
+    if (end - start).days >= MAX_AVAILABILITY_DAYS:
+        raise InvalidQueryArg(f"at most {MAX_AVAILABILITY_DAYS} days per request")
+    return start, end, today
+
+def availability_response(doctor_ids, start, end, today):
+    busy = DOCTOR_CALENDARS.busy_bitmaps(db_session, doctor_ids, start, end, today)
+    return [
         {
-            "Payment_ID": b.Payment_ID,
-            "Patient_ID": b.Patient_ID,
-            "Date": serialize_dt(b.Date),
-            "Cost": b.Cost,
-            "Paid": b.Paid,
+            "Doctor_ID": doctor_id,
+            "Days": [
+                {"Date": str(day), "Free": [f"{hour:02d}:00" for hour in free_hours(bitmap)]}
+                for day, bitmap in busy[doctor_id].items()
+            ],
         }
-        for b in bills
+        for doctor_id in doctor_ids
     ]
-    response = jsonify(data)
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    return response
+
+@app.get("/api/doctors/<int:doctor_id>/availability")
+def api_doctor_availability(doctor_id):
+    start, end, today = availability_range()
+    if db_session.get(Doctor, doctor_id) is None:
+        return jsonify({"error": "Doctor not found"}), 404
+    return jsonify(availability_response([doctor_id], start, end, today)[0])
+
+@app.get("/api/doctors/availability")
+def api_doctors_availability():
+    start, end, today = availability_range()
+    query = db_session.query(Doctor.Doctor_ID)
+    ids = request.args.get("ids")
+    if ids:
+        try:
+            query = query.filter(Doctor.Doctor_ID.in_([int(i) for i in ids.split(",") if i.strip()]))
+        except ValueError:
+            raise InvalidQueryArg("'ids' must be a comma-separated list of integers")
+    specialization = request.args.get("specialization")
+    if specialization:
+        query = query.filter(Doctor.Specialization == specialization)
+    if not ids and not specialization:
+        raise InvalidQueryArg("pass 'ids' and/or 'specialization'")
+    doctor_ids = [row[0] for row in query.order_by(Doctor.Doctor_ID).limit(MAX_AVAILABILITY_DOCTORS + 1)]
+    if len(doctor_ids) > MAX_AVAILABILITY_DOCTORS:
+        raise InvalidQueryArg(f"at most {MAX_AVAILABILITY_DOCTORS} doctors per request")
+    return jsonify(availability_response(doctor_ids, start, end, today))
 
 # --- Create/Update records (generic) ---
+# The body is one record, or a JSON array of records of the same type that
+# is applied in a single transaction (see records.apply_records).
 @app.post("/api/records/<string:rtype>")
 def api_records_mutation(rtype: str):
-    data = request.json or {}
     rtype = (rtype or "").strip()
+    if rtype not in RECORD_TYPES:
+        return jsonify({"error": "Unsupported type"}), 400
 
-    def next_id(model, id_attr):
-        current = db_session.query(getattr(model, id_attr)).order_by(getattr(model, id_attr).desc()).first()
-        return (current[0] + 1) if current and current[0] is not None else 1
-
-    def parse_date(v):
-        if not v:
-            return None
-        return datetime.strptime(v, "%Y-%m-%d").date()
-
-    def parse_time(v):
-        if not v:
-            return None
-        return datetime.strptime(v, "%H:%M").time()
-
-    # Users
-    if rtype == "Users":
-        user_id = data.get("User_ID")
-        user = db_session.query(User).filter(User.User_ID == user_id).first() if user_id else None
-        allowed_types = {"patient", "doctor", "admin"}
-        provided_type = (data.get("User_Type") or "").strip().lower()
-
-        if user:
-            email = (data.get("Email") or "").strip()
-            if email:
-                user.Email = email
-            if provided_type in allowed_types:
-                user.User_Type = provided_type
-            pwd = data.get("Password")
-            if pwd is not None and pwd != "":
-                user.Password = pwd
-            db_session.commit()
-            return jsonify({"status": "updated", "User_ID": user.User_ID})
-        # create
-        new_user = User(
-            Email=(data.get("Email") or "").strip(),
-            Password=(data.get("Password") or ""),
-            User_Type=(provided_type if provided_type in allowed_types else "patient"),
-        )
-        db_session.add(new_user)
-        db_session.commit()
-        return jsonify({"status": "created", "User_ID": new_user.User_ID})
-
-    # Departments
-    elif rtype == "Departments":
-        dept_id = data.get("Dept_ID")
-        dept = db_session.query(Department).filter(Department.Dept_ID == dept_id).first() if dept_id else None
-        if dept:
-            dept.Dept_name = data.get("Dept_name", dept.Dept_name)
-            dept.Dept_head = data.get("Dept_head", dept.Dept_head)
-            dept.Doctor_ID = data.get("Doctor_ID", dept.Doctor_ID)
-            db_session.commit()
-            return jsonify({"status": "updated", "Dept_ID": dept.Dept_ID})
-        new_dept = Department(
-            Dept_ID=next_id(Department, "Dept_ID"),
-            Dept_name=data.get("Dept_name"),
-            Dept_head=data.get("Dept_head"),
-            Doctor_ID=data.get("Doctor_ID"),
-        )
-        db_session.add(new_dept)
-        db_session.commit()
-        return jsonify({"status": "created", "Dept_ID": new_dept.Dept_ID})
-
-    # Medical Records
-    elif rtype == "MedicalRecords":
-        record_id = data.get("Record_ID")
-        rec = db_session.query(MedicalRecord).filter(MedicalRecord.Record_ID == record_id).first() if record_id else None
-        if rec:
-            rec.Patient_ID = data.get("Patient_ID", rec.Patient_ID)
-            rec.Doctor_ID = data.get("Doctor_ID", rec.Doctor_ID)
-            if "Symptoms" in data:
-                rec.Symptoms = data.get("Symptoms")
-            rec.Diagnosis = data.get("Diagnosis", rec.Diagnosis)
-            db_session.commit()
-            return jsonify({"status": "updated", "Record_ID": rec.Record_ID})
-        new_rec = MedicalRecord(
-            Record_ID=next_id(MedicalRecord, "Record_ID"),
-            Patient_ID=data.get("Patient_ID"),
-            Doctor_ID=data.get("Doctor_ID"),
-            Symptoms=data.get("Symptoms"),
-            Diagnosis=data.get("Diagnosis"),
-        )
-        db_session.add(new_rec)
-        db_session.commit()
-        return jsonify({"status": "created", "Record_ID": new_rec.Record_ID})
-
-    # Appointments
-    elif rtype == "Appointments":
-        appt_id = data.get("Appt_ID")
-        appt = db_session.query(Appointment).filter(Appointment.Appt_ID == appt_id).first() if appt_id else None
-        if appt:
-            appt.Doctor_ID = data.get("Doctor_ID", appt.Doctor_ID)
-            appt.Patient_ID = data.get("Patient_ID", appt.Patient_ID)
-            appt.Date = parse_date(data.get("Date")) or appt.Date
-            appt.Time = parse_time(data.get("Time")) or appt.Time
-            db_session.commit()
-            return jsonify({"status": "updated", "Appt_ID": appt.Appt_ID})
-        new_appt = Appointment(
-            Doctor_ID=data.get("Doctor_ID"),
-            Patient_ID=data.get("Patient_ID"),
-            Date=parse_date(data.get("Date")),
-            Time=parse_time(data.get("Time")),
-        )
-        db_session.add(new_appt)
-        db_session.commit()
-        return jsonify({"status": "created", "Appt_ID": new_appt.Appt_ID})
-
-    # Rooms
-    elif rtype == "Rooms":
-        room_id = data.get("Room_ID")
-        room = db_session.query(Room).filter(Room.Room_ID == room_id).first() if room_id else None
-        if room:
-            room.Appt_ID = data.get("Appt_ID", room.Appt_ID)
-            room.room_type = data.get("room_type", room.room_type)
-            db_session.commit()
-            return jsonify({"status": "updated", "Room_ID": room.Room_ID})
-        new_room = Room(
-            Appt_ID=data.get("Appt_ID"),
-            room_type=data.get("room_type"),
-        )
-        db_session.add(new_room)
-        db_session.commit()
-        return jsonify({"status": "created", "Room_ID": new_room.Room_ID})
-
-    # Treatments
-    elif rtype == "Treatments":
-        treatment_id = data.get("Treatment_ID")
-        tr = db_session.query(Treatment).filter(Treatment.Treatment_ID == treatment_id).first() if treatment_id else None
-        if tr:
-            tr.Record_ID = data.get("Record_ID", tr.Record_ID)
-            tr.Medicine = data.get("Medicine", tr.Medicine)
-            tr.Prescription = data.get("Prescription", tr.Prescription)
-            db_session.commit()
-            return jsonify({"status": "updated", "Treatment_ID": tr.Treatment_ID})
-        new_tr = Treatment(
-            Record_ID=data.get("Record_ID"),
-            Medicine=data.get("Medicine"),
-            Prescription=data.get("Prescription"),
-        )
-        db_session.add(new_tr)
+    data = request.json or {}
+    batch = isinstance(data, list)
+    items = data if batch else [data]
+
+    begin_write(db_session)
+    try:
+        results = apply_records(db_session, rtype, items)
         db_session.commit()
-        return jsonify({"status": "created", "Treatment_ID": new_tr.Treatment_ID})
-
-    # Bills
-    elif rtype == "Bills":
-        payment_id = data.get("Payment_ID")
-        b = db_session.query(Bill).filter(Bill.Payment_ID == payment_id).first() if payment_id else None
-        if b:
-            b.Patient_ID = data.get("Patient_ID", b.Patient_ID)
-            b.Date = parse_date(data.get("Date")) or b.Date
-            b.Cost = float(data.get("Cost")) if data.get("Cost") not in (None, "") else b.Cost
-            if "Paid" in data:
-                b.Paid = data.get("Paid")
-            db_session.commit()
-            return jsonify({"status": "updated", "Payment_ID": b.Payment_ID})
-        new_b = Bill(
-            Patient_ID=data.get("Patient_ID"),
-            Date=parse_date(data.get("Date")),
-            Cost=float(data.get("Cost")) if data.get("Cost") not in (None, "") else 0.0,
-            Paid=data.get("Paid"),
+    except IntegrityError as e:
+        db_session.rollback()
+        return jsonify({"error": f"Constraint violation: {e.orig}"}), 409
+
+    if batch:
+        return jsonify({"results": results})
+    result = results[0]
+    if result["status"] == "error":
+        return jsonify({"error": result["error"]}), 400
+    return jsonify(result)
+
+# --- Slot suggestions ---
+# The k earliest free (doctor, date, time) slots for the logged-in patient
+# across every eligible doctor, from BOOKING_LEAD_DAYS out:
+#   ?k=<n>   (default SUGGESTION_COUNT, at most MAX_SUGGESTION_COUNT)
+#   ?specialization=<name>&dept_id=<id>   same filters as /api/appointments/auto
+# Slots at the same time list the less loaded doctor first. Book one by
+# POSTing it to /api/appointments/auto.
+SUGGESTION_COUNT = 5
+MAX_SUGGESTION_COUNT = 50
+
+# Re-checks per suggestion list against bookings the calendars have not heard of yet
+BOOKING_ATTEMPTS = 5
+# An auto-booking without a picked slot goes to one of this many least
+# loaded doctors, at random: concurrent requests (in other processes too)
+# then rarely race for the same doctor's first free hour
+AUTO_BOOKING_SPREAD = 4
+
+@app.get("/api/appointments/suggestions")
+def api_appointment_suggestions():
+    if "user_id" not in session or session.get("user_type", "").lower() != "patient":
+        return jsonify({"error": "Unauthorized"}), 401
+    patient_id = session.get("patient_id") or session.get("user_id")
+    k = int_arg("k")
+    if k is None:
+        k = SUGGESTION_COUNT
+    if not 1 <= k <= MAX_SUGGESTION_COUNT:
+        raise InvalidQueryArg(f"'k' must be between 1 and {MAX_SUGGESTION_COUNT}")
+
+    today = datetime.utcnow().date()
+    loads = DOCTOR_LOAD.loads(
+        db_session,
+        today,
+        specialization=request.args.get("specialization") or None,
+        dept_id=int_arg("dept_id"),
+    )
+    start = today + timedelta(days=BOOKING_LEAD_DAYS)
+    doctor_busy = DOCTOR_CALENDARS.busy_days(db_session, sorted(loads), today)
+    patient_busy = load_patient_bitmaps(db_session, patient_id, start, start + timedelta(days=MAX_DAYS_AHEAD))
+    # The calendars can trail a booking another process commits meanwhile;
+    # drop what the slot table already holds and look further
+    taken = set()
+    for _ in range(BOOKING_ATTEMPTS):
+        slots = [
+            slot for slot in earliest_slots(doctor_busy, patient_busy, start, k + len(taken), rank=loads)
+            if slot not in taken
+        ][:k]
+        newly_taken = taken_slots(db_session, slots)
+        if not newly_taken:
+            break
+        taken |= newly_taken
+    slots = [slot for slot in slots if slot not in taken]
+
+    doctors = {
+        doctor_id: (first, last, specialization)
+        for doctor_id, first, last, specialization in (
+            db_session.query(Doctor.Doctor_ID, Doctor.First_Name, Doctor.Last_Name, Doctor.Specialization)
+            .filter(Doctor.Doctor_ID.in_({doctor_id for _, _, doctor_id in slots}))
         )
-        db_session.add(new_b)
+    }
+    return jsonify([
+        {
+            "Doctor_ID": doctor_id,
+            "Doctor_Name": f"{doctors[doctor_id][0]} {doctors[doctor_id][1]}",
+            "Specialization": doctors[doctor_id][2],
+            "Date": str(day),
+            "Time": f"{hour:02d}:00",
+        }
+        for day, hour, doctor_id in slots
+        if doctor_id in doctors
+    ])
+
+def book_slot(doctor_id, patient_id, chosen_date, chosen_time, duration=DEFAULT_DURATION, room=None):
+    """
+    Inserts and commits the appointment, and its room booking if `room` is
+    a (room_type, Room_No) pair. Returns None, with the session rolled back,
+    if another booking got there first: the doctor's or the patient's slot
+    rows (one per hour the booking covers) or the room capacity trigger
+    reject the second insert. The search that picked the slot ran in an
+    earlier transaction: this one only writes.
+    """
+    begin_write(db_session)
+    appt = Appointment(
+        Doctor_ID=doctor_id, Patient_ID=patient_id, Date=chosen_date, Time=chosen_time, Duration=duration,
+    )
+    db_session.add(appt)
+    if room is not None:
+        db_session.add(Room(appointment=appt, room_type=room[0], Room_No=room[1]))
+    try:
         db_session.commit()
-        return jsonify({"status": "created", "Payment_ID": new_b.Payment_ID})
-    else:
-        return jsonify({"error": "Unsupported type"}), 400
+    except IntegrityError:
+        db_session.rollback()
+        if room is not None:
+            # The room may have been taken by a process this index does not hear from
+            ROOM_OCCUPANCY.invalidate()
+        return None
+    return appt
 
 @app.post("/api/appointments/auto")
 def api_appointments_auto():
@@ -627,68 +839,105 @@ def api_appointments_auto():
         return jsonify({"error": "Unauthorized"}), 401
     patient_id = session.get("patient_id") or session.get("user_id")
 
-    # Pick the doctor with the fewest total appointments (fair load distribution)
-    doctor_row = (
-        db_session.query(Doctor, func.count(Appointment.Appt_ID).label("num_appts"))
-        .outerjoin(Appointment, Doctor.Doctor_ID == Appointment.Doctor_ID)
-        .group_by(Doctor.Doctor_ID)
-        .order_by(func.count(Appointment.Appt_ID).asc(), Doctor.Doctor_ID.asc())
-        .first()
-    )
-    doctor = doctor_row[0] if doctor_row else None
-    if not doctor:
-        return jsonify({"error": "No doctors available"}), 400
-
-    # Start searching 3 days from now
-    appt_date = (datetime.utcnow() + timedelta(days=3)).date()
-
-    # Search business hours: 09:00 - 16:00, on the earliest day with a free slot
-    max_days_ahead = 60
-    chosen_date = None
-    chosen_time = None
-    for offset in range(0, max_days_ahead + 1):
-        candidate_date = appt_date + timedelta(days=offset)
-        for hour in range(9, 17):  # 09:00 to 16:00 inclusive
-            candidate_time = time(hour, 0)
-            doctor_busy = (
-                db_session.query(Appointment)
-                .filter(
-                    Appointment.Doctor_ID == doctor.Doctor_ID,
-                    Appointment.Date == candidate_date,
-                    Appointment.Time == candidate_time,
-                )
-                .first()
-            )
-            if doctor_busy:
-                continue
-            patient_busy = (
-                db_session.query(Appointment)
-                .filter(
-                    Appointment.Patient_ID == patient_id,
-                    Appointment.Date == candidate_date,
-                    Appointment.Time == candidate_time,
-                )
-                .first()
-            )
-            if patient_busy:
-                continue
-            chosen_date = candidate_date
-            chosen_time = candidate_time
-            break
-        if chosen_date is not None:
-            break
+    # Start searching a few days from now
+    appt_date = (datetime.utcnow() + timedelta(days=BOOKING_LEAD_DAYS)).date()
+
+    # Optional JSON body: {"Duration": <minutes>, "room_type": <type>} and/or a
+    # picked {Doctor_ID, Date, Time}. With a room_type, a free room of that
+    # type is allocated for the appointment as part of the booking.
+    chosen = request.get_json(silent=True)
+    chosen = chosen if isinstance(chosen, dict) else {}
+    try:
+        duration = parse_duration(chosen.get("Duration")) or DEFAULT_DURATION
+    except RecordError as e:
+        return jsonify({"error": str(e)}), 400
+    room_type = chosen.get("room_type") or None
+    if room_type is not None and room_type not in ROOM_OCCUPANCY.room_types(db_session):
+        return jsonify({"error": f"No rooms of type '{room_type}'"}), 400
+    room = None
+
+    if chosen.get("Doctor_ID") is not None:
+        # A slot picked from /api/appointments/suggestions (or any business
+        # hour): book it if nothing overlaps it. The index check is only a
+        # fast path; the slot triggers reject overlaps it has not heard of.
+        try:
+            doctor_id = int(chosen["Doctor_ID"])
+            chosen_date = date.fromisoformat(chosen["Date"])
+            chosen_time = datetime.strptime(chosen["Time"], "%H:%M").time()
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Doctor_ID, Date (YYYY-MM-DD) and Time (HH:MM) are required"}), 400
+        doctor = db_session.get(Doctor, doctor_id)
+        if not doctor:
+            return jsonify({"error": "Doctor not found"}), 404
+        _, end = appointment_span(chosen_time, duration)
+        if (
+            not slot_bit(chosen_time) or end > (SLOT_HOURS[-1] + 1) * 60
+            or not appt_date <= chosen_date <= appt_date + timedelta(days=MAX_DAYS_AHEAD)
+        ):
+            return jsonify({"error": "Not a bookable slot"}), 400
+        today = datetime.utcnow().date()
+        appt = None
+        if not any(
+            APPOINTMENT_INTERVALS.overlaps(db_session, kind, owner_id, chosen_date, chosen_time, duration, today)
+            for kind, owner_id in (("doctor", doctor_id), ("patient", patient_id))
+        ):
+            if room_type is not None:
+                room_no = ROOM_OCCUPANCY.allocate(db_session, room_type, chosen_date, chosen_time, duration)
+                if room_no is None:
+                    return jsonify({"error": f"No {room_type} room is free at that time"}), 409
+                room = (room_type, room_no)
+            appt = book_slot(doctor_id, patient_id, chosen_date, chosen_time, duration, room)
+        if appt is None:
+            return jsonify({"error": "Slot is no longer available"}), 409
+    else:
+        # One of the doctors with the fewest upcoming appointments (fair load
+        # distribution), optionally within ?specialization= and/or ?dept_id=
+        candidates = DOCTOR_LOAD.least_loaded(
+            db_session,
+            datetime.utcnow().date(),
+            specialization=request.args.get("specialization") or None,
+            dept_id=int_arg("dept_id"),
+            k=AUTO_BOOKING_SPREAD,
+        )
+        if not candidates:
+            return jsonify({"error": "No doctors available"}), 400
 
-    if chosen_date is None:
-        return jsonify({"error": "No available slots"}), 409
+        # Slots lost to a concurrent booking, (doctor_id, date, hour); never tried twice
+        lost = set()
 
-    appt = Appointment(
-        Doctor_ID=doctor.Doctor_ID,
-        Patient_ID=patient_id,
-        Date=chosen_date,
-        Time=chosen_time,
-    )
-    db_session.add(appt)
-    db_session.commit()
+        def accept(day, hour):
+            if (doctor_id, day, hour) in lost:
+                return False
+            return room_type is None or (
+                ROOM_OCCUPANCY.allocate(db_session, room_type, day, time(hour, 0), duration) is not None
+            )
+
+        # Earliest business hour from which both doctor and patient (and a room,
+        # if asked for) are free for the whole duration, from one range query.
+        # A concurrent booking can take it before our insert; then search
+        # again, so the request only fails once every candidate is full.
+        appt = None
+        while appt is None:
+            if not candidates:
+                return jsonify({"error": "No available slots"}), 409
+            doctor_id = random.choice(candidates)
+            slot = find_first_free_slot(db_session, doctor_id, patient_id, appt_date, duration=duration, accept=accept)
+            if slot is None:
+                candidates.remove(doctor_id)
+                continue
+            chosen_date, chosen_hour = slot
+            chosen_time = time(chosen_hour, 0)
+            if room_type is not None:
+                room_no = ROOM_OCCUPANCY.allocate(db_session, room_type, chosen_date, chosen_time, duration)
+                if room_no is None:
+                    # Taken by another request since the search accepted it
+                    lost.add((doctor_id, chosen_date, chosen_hour))
+                    continue
+                room = (room_type, room_no)
+            appt = book_slot(doctor_id, patient_id, chosen_date, chosen_time, duration, room)
+            if appt is None:
+                lost.add((doctor_id, chosen_date, chosen_hour))
+        doctor = db_session.get(Doctor, doctor_id)
 
     doctor_name = f"{doctor.First_Name} {doctor.Last_Name}"
     return jsonify({
@@ -698,7 +947,38 @@ def api_appointments_auto():
         "Doctor_Name": doctor_name,
         "Date": str(chosen_date),
         "Time": chosen_time.strftime("%H:%M"),
+        "Duration": duration,
+        "Room_No": room[1] if room else None,
     })
 
+# Admins place many requests at once: a JSON array of
+# {Patient_ID, Specialization?, Dept_ID?, From?, To?, Duration?}, solved together and
+# booked in one transaction (see batch_scheduling). ?dry_run=1 only plans.
+MAX_BATCH_REQUESTS = 10000
+
+@app.post("/api/appointments/batch")
+def api_appointments_batch():
+    if session.get("user_type", "").lower() != "admin":
+        return jsonify({"error": "Unauthorized"}), 401
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({"error": "Body must be a JSON array of requests"}), 400
+    if len(items) > MAX_BATCH_REQUESTS:
+        return jsonify({"error": f"At most {MAX_BATCH_REQUESTS} requests per batch"}), 400
+    try:
+        results = schedule_batch(db_session, items, dry_run=request.args.get("dry_run") == "1")
+    except BatchConflict as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"results": results})
+
+# --- METRICS (Prometheus text format) ---
+@app.route("/metrics")
+def metrics():
+    token = app.config["METRICS_TOKEN"]
+    scraper = token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not scraper and session.get("user_type", "").lower() != "admin":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+# What an appointment row looked like before or after a write
+AppointmentState = namedtuple("AppointmentState", "doctor_id patient_id date time duration")
+
+STATE_ATTRS = ("Doctor_ID", "Patient_ID", "Date", "Time", "Duration")
+
+
+def _state(values):
+    return AppointmentState(*(values[attr] for attr in STATE_ATTRS)) if values is not None else None
+
+
+def appointment_changes(writes):
+    """
+    The appointment changes of a transaction (a write_tracking.TransactionWrites
+    watching STATE_ATTRS): a list of (old, new) AppointmentState pairs, None
+    for the side that does not exist (a create or a delete), or None when
+    the session ran a bulk statement whose effect is unknown.
+    """
+    rows = writes.changes("appointment")
+    if rows is None:
+        return None
+    changes = []
+    for old, new in rows:
+        old, new = _state(old), _state(new)
+        if old != new:
+            changes.append((old, new))
+    return changes
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from lookups import chunked
+from models import Appointment
+from process_index import DayIndex
+from scheduling import ALL_SLOTS_MASK, SLOT_HOURS, slot_mask
+
+
+class DoctorCalendarIndex(DayIndex):
+    """
+    Busy-slot bitmaps per doctor and day (bit i = an appointment overlaps SLOT_HOURS[i]),
+    kept in memory for the days from `loaded_from` on.
+
+    A doctor's calendar is read with one indexed range query the first time
+    it is asked for and then kept current from committed appointment
+    changes (see process_index), so a week of availability for many
+    doctors is a few dict lookups.
+    """
+
+    def _clear(self):
+        super()._clear()
+        self.busy = {}       # doctor_id -> {date: bitmap}
+        # Slots taken more than once (seed data allows it): (doctor_id, date, bit) -> extra bookings,
+        # so cancelling one of them does not free the slot
+        self.doubles = {}
+
+    def _book(self, doctor_id, day, mask, step):
+        days = self.busy[doctor_id]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            taken = days.get(day, 0) & bit
+            key = (doctor_id, day, bit)
+            if step > 0:
+                if taken:
+                    self.doubles[key] = self.doubles.get(key, 0) + 1
+                else:
+                    days[day] = days.get(day, 0) | bit
+            elif self.doubles.get(key):
+                self.doubles[key] -= 1
+                if not self.doubles[key]:
+                    del self.doubles[key]
+            elif taken:
+                days[day] &= ~bit
+
+    def _load(self, db_session, doctor_ids):
+        missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in self.busy]
+        for chunk in chunked(missing):
+            for doctor_id in chunk:
+                self.busy[doctor_id] = {}
+            rows = (
+                db_session.query(Appointment.Doctor_ID, Appointment.Date, Appointment.Time, Appointment.Duration)
+                .filter(Appointment.Doctor_ID.in_(chunk), Appointment.Date >= self.loaded_from)
+            )
+            for doctor_id, day, appt_time, duration in rows:
+                mask = slot_mask(appt_time, duration)
+                if mask:
+                    self._book(doctor_id, day, mask, 1)
+
+    def busy_bitmaps(self, db_session, doctor_ids, start_date, end_date, today):
+        """
+        {doctor_id: {date: bitmap}} for every day from start_date to end_date
+        (inclusive). Days before `today` are reported fully booked.
+        """
+        with self.lock:
+            self._refresh(db_session, today)
+            self._load(db_session, doctor_ids)
+            days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+            return {
+                doctor_id: {
+                    day: (ALL_SLOTS_MASK if day < today else self.busy[doctor_id].get(day, 0))
+                    for day in days
+                }
+                for doctor_id in doctor_ids
+            }
+
+    def busy_days(self, db_session, doctor_ids, today):
+        """
+        {doctor_id: {date: bitmap}} with each doctor's live day map, for
+        lazy scans over many days. Callers only read it, with .get().
+        """
+        with self.lock:
+            self._refresh(db_session, today)
+            self._load(db_session, doctor_ids)
+            return {doctor_id: self.busy[doctor_id] for doctor_id in doctor_ids}
+
+    def _apply(self, changes):
+        for old, new in changes:
+            for state, step in ((old, -1), (new, 1)):
+                if state is None or state.doctor_id not in self.busy or state.date is None:
+                    continue
+                if state.date < self.loaded_from:
+                    continue
+                mask = slot_mask(state.time, state.duration)
+                if mask:
+                    self._book(state.doctor_id, state.date, mask, step)
+
+
+def free_hours(bitmap):
+    """Slot hours left free in a day bitmap, earliest first."""
+    return [hour for i, hour in enumerate(SLOT_HOURS) if not bitmap & (1 << i)]
+
+
+DOCTOR_CALENDARS = DoctorCalendarIndex()
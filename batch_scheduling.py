@@ -0,0 +1,398 @@
+"""
+Places many appointment requests at once, e.g. for clinic onboarding or a
+recall campaign.
+
+Each request names a patient and optionally a specialization, a department
+and a date window. The whole batch is solved in memory against one
+snapshot of the doctor calendars and upcoming loads, then written with one
+bulk INSERT in a single transaction.
+
+The objective is the auto-booking rule applied to the whole batch: the
+upcoming loads of the doctors end up as even as the requests allow, and
+each appointment takes the earliest hours its doctor and patient have free
+for its whole duration in the window. A first pass places the most
+constrained requests first, each with the least loaded eligible doctor, so
+open requests cannot use up the few doctors a narrow request could go to.
+A second pass then moves bookings off the most loaded doctors along chains
+of requests that fit elsewhere (see rebalance), which fixes what the first
+pass got wrong when a window or a full calendar kept a request from its
+least loaded doctor.
+
+Usage:
+    python batch_scheduling.py requests.json [--dry-run]
+    python batch_scheduling.py requests.csv --out results.json
+
+The input is a JSON array of objects, or a CSV file, with the columns
+Patient_ID, Specialization, Dept_ID, From and To (dates as YYYY-MM-DD) and
+Duration (minutes, one slot if empty).
+
+Bookings made from the command line reach running servers through the
+shared table versions (see table_versions): their calendars, loads and
+ETags expire on the next request that reads them.
+"""
+import argparse
+import csv
+import heapq
+import json
+import sys
+from collections import deque, namedtuple
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from availability import DOCTOR_CALENDARS
+from doctor_load import DOCTOR_LOAD
+from lookups import chunked
+from models import Appointment, Patient, begin_write, session
+from records import RecordError, parse_date, parse_duration
+from scheduling import (
+    BOOKING_LEAD_DAYS, DEFAULT_DURATION, MAX_DAYS_AHEAD, free_slots, slot_mask, slots_needed,
+)
+from table_versions import track_writes
+
+# Solves per batch; a conflict with a concurrent booking reloads the snapshot
+BATCH_ATTEMPTS = 3
+
+
+class BatchConflict(RuntimeError):
+    """Concurrent bookings kept taking planned slots; nothing was written."""
+
+
+SlotRequest = namedtuple("SlotRequest", "patient_id specialization dept_id start end duration")
+
+
+def parse_request(item, today):
+    """SlotRequest from one payload item; raises RecordError if it is invalid."""
+    if not isinstance(item, dict):
+        raise RecordError("Request must be an object")
+    try:
+        patient_id = int(item.get("Patient_ID"))
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid Patient_ID '{item.get('Patient_ID')}'")
+    dept_id = item.get("Dept_ID")
+    try:
+        dept_id = int(dept_id) if dept_id not in (None, "") else None
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid Dept_ID '{dept_id}'")
+    start = parse_date(item.get("From")) or today + timedelta(days=BOOKING_LEAD_DAYS)
+    end = parse_date(item.get("To")) or start + timedelta(days=MAX_DAYS_AHEAD)
+    if start < today:
+        raise RecordError("From must not be in the past")
+    if end < start:
+        raise RecordError("To must not be before From")
+    if (end - start).days > MAX_DAYS_AHEAD:
+        raise RecordError(f"Window is longer than {MAX_DAYS_AHEAD} days")
+    duration = parse_duration(item.get("Duration")) or DEFAULT_DURATION
+    return SlotRequest(patient_id, item.get("Specialization") or None, dept_id, start, end, duration)
+
+
+def load_patient_calendars(db_session, patient_ids, start_date, end_date):
+    """{patient_id: {date: bitmap}} of the patients' booked slots, a chunk of ids per query."""
+    busy = {patient_id: {} for patient_id in patient_ids}
+    for chunk in chunked(patient_ids):
+        rows = (
+            db_session.query(Appointment.Patient_ID, Appointment.Date, Appointment.Time, Appointment.Duration)
+            .filter(
+                Appointment.Patient_ID.in_(chunk),
+                Appointment.Date >= start_date,
+                Appointment.Date <= end_date,
+            )
+        )
+        for patient_id, appt_date, appt_time, duration in rows:
+            days = busy[patient_id]
+            days[appt_date] = days.get(appt_date, 0) | slot_mask(appt_time, duration)
+    return busy
+
+
+class Assignment:
+    """
+    The bookings of a batch being solved, on private copies of the doctor
+    and patient calendars and of the doctor loads.
+    """
+
+    def __init__(self, requests, members, loads, doctor_busy, patient_busy):
+        self.requests = dict(requests)
+        self.members = {key: sorted(ids) for key, ids in members.items()}
+        self.loads = loads
+        self.doctor_busy = doctor_busy
+        self.patient_busy = patient_busy
+        self.placed = {}                                        # index -> (doctor_id, date, hour)
+        self.on_doctor = {doctor_id: set() for doctor_id in doctor_busy}   # doctor_id -> {index, ...}
+
+    def eligible(self, index):
+        request = self.requests[index]
+        return self.members[request.specialization, request.dept_id]
+
+    def fit(self, index, doctor_id):
+        """Earliest (date, hour) in the request's window free for the doctor and the patient, or None."""
+        request = self.requests[index]
+        return next(free_slots(
+            self.doctor_busy[doctor_id], self.patient_busy[request.patient_id], request.start,
+            (request.end - request.start).days, slots_needed(request.duration),
+        ), None)
+
+    def _calendars(self, index, doctor_id):
+        return self.doctor_busy[doctor_id], self.patient_busy[self.requests[index].patient_id]
+
+    def place(self, index, doctor_id, slot):
+        day, hour = slot
+        mask = slot_mask(time(hour, 0), self.requests[index].duration)
+        for days in self._calendars(index, doctor_id):
+            days[day] = days.get(day, 0) | mask
+        self.loads[doctor_id] += 1
+        self.on_doctor[doctor_id].add(index)
+        self.placed[index] = (doctor_id, day, hour)
+
+    def remove(self, index):
+        """Takes a placed request back off its doctor; returns (doctor_id, (date, hour)) it had."""
+        doctor_id, day, hour = self.placed.pop(index)
+        # Placed only on free hours, so the bits are the request's alone
+        mask = slot_mask(time(hour, 0), self.requests[index].duration)
+        for days in self._calendars(index, doctor_id):
+            days[day] &= ~mask
+        self.loads[doctor_id] -= 1
+        self.on_doctor[doctor_id].discard(index)
+        return doctor_id, (day, hour)
+
+    def move(self, chain):
+        """
+        Applies [(index, doctor_id), ...] moves, last first, so each doctor
+        loses its request before it gains one. Undoes them all and returns
+        False if one no longer fits (two of them were the same patient's).
+        """
+        done = []
+        for index, doctor_id in reversed(chain):
+            previous = self.remove(index)
+            slot = self.fit(index, doctor_id)
+            if slot is None:
+                self.place(index, *previous)
+                for moved, before in reversed(done):
+                    self.remove(moved)
+                    self.place(moved, *before)
+                return False
+            self.place(index, doctor_id, slot)
+            done.append((index, previous))
+        return True
+
+
+def place_greedily(assignment, order, loads):
+    """
+    First pass: each (index, SlotRequest) in `order` goes to its least
+    loaded eligible doctor with a free slot for it, at the earliest one.
+    """
+    # One min-heap of (load, doctor_id) per filter; entries whose load has
+    # changed since they were pushed are dropped when they surface
+    heaps = {key: [(loads[doctor_id], doctor_id) for doctor_id in ids] for key, ids in assignment.members.items()}
+    for heap in heaps.values():
+        heapq.heapify(heap)
+    for index, request in order:
+        heap = heaps[request.specialization, request.dept_id]
+        passed = []
+        while heap:
+            load, doctor_id = heapq.heappop(heap)
+            if loads[doctor_id] != load:
+                continue
+            slot = assignment.fit(index, doctor_id)
+            if slot is None:
+                # Full for this patient in this window; still a candidate for the others
+                passed.append((load, doctor_id))
+                continue
+            assignment.place(index, doctor_id, slot)
+            for key, ids in assignment.members.items():
+                if doctor_id in ids:
+                    heapq.heappush(heaps[key], (loads[doctor_id], doctor_id))
+            break
+        for entry in passed:
+            heapq.heappush(heap, entry)
+
+
+def relief_chain(assignment, source, dead):
+    """
+    The shortest chain of moves [(index, doctor_id), ...] that takes one
+    booking off `source` and adds one to a doctor at least two below it:
+    the first request leaves `source` for a doctor it fits with, whose own
+    request leaves for the next, and so on. Breadth first over doctors.
+    Returns None if there is none; the doctors it reached are then added
+    to `dead`, as none of them can end a chain for a doctor loaded no
+    more than `source`.
+    """
+    loads = assignment.loads
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        doctor_id = queue.popleft()
+        for index in sorted(assignment.on_doctor[doctor_id]):
+            for target in assignment.eligible(index):
+                if target in parents or target in dead or assignment.fit(index, target) is None:
+                    continue
+                parents[target] = (doctor_id, index)
+                if loads[target] <= loads[source] - 2:
+                    chain = []
+                    while parents[target] is not None:
+                        doctor_id, index = parents[target]
+                        chain.append((index, target))
+                        target = doctor_id
+                    return chain[::-1]
+                queue.append(target)
+    dead.update(parents)
+    return None
+
+
+def rebalance(assignment, max_moves):
+    """
+    Second pass: relieves the most loaded doctor that has a relief chain,
+    until none has one or max_moves chains were applied. Each chain moves
+    one booking from a doctor to one at least two below it, so the sum of
+    squared loads drops with every move and the loop ends.
+    """
+    for _ in range(max_moves):
+        dead = set()
+        for source in sorted(assignment.on_doctor, key=lambda doctor_id: (-assignment.loads[doctor_id], doctor_id)):
+            if source in dead or not assignment.on_doctor[source]:
+                continue
+            chain = relief_chain(assignment, source, dead)
+            if chain is not None and assignment.move(chain):
+                break
+            dead.add(source)
+        else:
+            return
+
+
+def solve(db_session, requests, today):
+    """
+    Assigns a slot to each (index, SlotRequest). Returns
+    {index: (doctor_id, date, hour)}; requests that cannot be placed are left out.
+    """
+    if not requests:
+        return {}
+    loads = DOCTOR_LOAD.loads(db_session, today)
+    members = {}
+    for _, request in requests:
+        key = (request.specialization, request.dept_id)
+        if key not in members:
+            members[key] = set(DOCTOR_LOAD.loads(db_session, today, *key))
+    doctor_ids = sorted(set().union(*members.values()))
+    # Private copies: the batch books into them as it goes
+    doctor_busy = {
+        doctor_id: dict(days)
+        for doctor_id, days in DOCTOR_CALENDARS.busy_days(db_session, doctor_ids, today).items()
+    }
+    patient_busy = load_patient_calendars(
+        db_session,
+        sorted({request.patient_id for _, request in requests}),
+        min(request.start for _, request in requests),
+        max(request.end for _, request in requests),
+    )
+    assignment = Assignment(requests, members, loads, doctor_busy, patient_busy)
+
+    # Fewest eligible doctors first, then the narrowest window
+    order = sorted(
+        requests,
+        key=lambda item: (len(members[item[1].specialization, item[1].dept_id]), item[1].end - item[1].start, item[0]),
+    )
+    place_greedily(assignment, order, loads)
+    rebalance(assignment, max_moves=len(assignment.placed))
+    return assignment.placed
+
+
+def schedule_batch(db_session, items, today=None, dry_run=False):
+    """
+    Places every request in `items` and, unless dry_run, books them in one
+    transaction. Returns one result dict per item, in payload order.
+    """
+    today = today or datetime.utcnow().date()
+    results = [None] * len(items)
+    requests = []
+    for index, item in enumerate(items):
+        try:
+            requests.append((index, parse_request(item, today)))
+        except RecordError as e:
+            results[index] = {"status": "error", "error": str(e)}
+
+    known = set()
+    for chunk in chunked({request.patient_id for _, request in requests}):
+        known.update(row[0] for row in db_session.query(Patient.Patient_ID).filter(Patient.Patient_ID.in_(chunk)))
+    for index, request in requests:
+        if request.patient_id not in known:
+            results[index] = {"status": "error", "error": f"Patient {request.patient_id} not found"}
+    requests = [(index, request) for index, request in requests if results[index] is None]
+
+    for _ in range(BATCH_ATTEMPTS):
+        assigned = solve(db_session, requests, today)
+        planned = []
+        for index, request in requests:
+            if index in assigned:
+                doctor_id, day, hour = assigned[index]
+                planned.append((index, {
+                    "Doctor_ID": doctor_id, "Patient_ID": request.patient_id, "Date": day, "Time": time(hour, 0),
+                    "Duration": request.duration,
+                }))
+        if dry_run or not planned:
+            new_ids = [None] * len(planned)
+            break
+        # Written in a transaction of its own: the slot triggers reject whatever was booked since the solve
+        begin_write(db_session)
+        try:
+            new_ids = db_session.scalars(
+                insert(Appointment).returning(Appointment.Appt_ID, sort_by_parameter_order=True),
+                [values for _, values in planned],
+            ).all()
+            db_session.commit()
+            break
+        except IntegrityError:
+            # A booking committed elsewhere took one of the slots: drop the
+            # in-memory snapshot and solve again against the database
+            db_session.rollback()
+            DOCTOR_CALENDARS.reset()
+            DOCTOR_LOAD.reset()
+    else:
+        raise BatchConflict(f"Batch kept conflicting with concurrent bookings after {BATCH_ATTEMPTS} attempts")
+
+    for (index, values), appt_id in zip(planned, new_ids):
+        results[index] = {
+            "status": "planned" if dry_run else "created",
+            "Appt_ID": appt_id,
+            "Patient_ID": values["Patient_ID"],
+            "Doctor_ID": values["Doctor_ID"],
+            "Date": str(values["Date"]),
+            "Time": values["Time"].strftime("%H:%M"),
+            "Duration": values["Duration"],
+        }
+    for index, request in requests:
+        if results[index] is None:
+            results[index] = {"status": "error", "error": "No free slot in the window"}
+    return results
+
+
+def read_requests(path):
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("requests", help="JSON array or CSV file of requests")
+    parser.add_argument("--dry-run", action="store_true", help="compute the assignment without booking it")
+    parser.add_argument("--out", help="write the per-request results here as JSON (default: stdout)")
+    parser.add_argument("--today", type=date.fromisoformat, help="schedule as if today were this date")
+    args = parser.parse_args(argv)
+
+    items = read_requests(args.requests)
+    track_writes(session.session_factory)
+    results = schedule_batch(session, items, today=args.today, dry_run=args.dry_run)
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())), file=sys.stderr)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compares the old per-hour probing in /api/appointments/auto with the
+bitmap search in scheduling.py on a doctor calendar that is ~90% full.
+
+Usage: python benchmarks/bench_auto_booking.py [--fill 0.9] [--runs 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+from datetime import date, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Doctor, Patient, Appointment
+from scheduling import SLOT_HOURS, MAX_DAYS_AHEAD, find_first_free_slot
+
+
+def legacy_find_slot(db_session, doctor_id, patient_id, start_date, max_days_ahead=MAX_DAYS_AHEAD):
+    """The pre-bitmap search: two .first() probes per candidate hour."""
+    for offset in range(0, max_days_ahead + 1):
+        candidate_date = start_date + timedelta(days=offset)
+        for hour in SLOT_HOURS:
+            candidate_time = time(hour, 0)
+            doctor_busy = (
+                db_session.query(Appointment)
+                .filter(
+                    Appointment.Doctor_ID == doctor_id,
+                    Appointment.Date == candidate_date,
+                    Appointment.Time == candidate_time,
+                )
+                .first()
+            )
+            if doctor_busy:
+                continue
+            patient_busy = (
+                db_session.query(Appointment)
+                .filter(
+                    Appointment.Patient_ID == patient_id,
+                    Appointment.Date == candidate_date,
+                    Appointment.Time == candidate_time,
+                )
+                .first()
+            )
+            if patient_busy:
+                continue
+            return candidate_date, hour
+    return None
+
+
+def build_calendar(db_session, start_date, fill, seed=42):
+    """One doctor whose horizon is `fill` booked, with the free slots packed at the end."""
+    doctor_user = User(Email="bench.doctor@hospital.com", Password="x", User_Type="doctor")
+    patient_user = User(Email="bench.patient@hospital.com", Password="x", User_Type="patient")
+    filler_user = User(Email="bench.filler@hospital.com", Password="x", User_Type="patient")
+    db_session.add_all([doctor_user, patient_user, filler_user])
+    db_session.flush()
+    db_session.add_all([
+        Doctor(Doctor_ID=doctor_user.User_ID, First_Name="Bench", Last_Name="Doctor"),
+        Patient(Patient_ID=patient_user.User_ID, First_Name="Bench", Last_Name="Patient"),
+        Patient(Patient_ID=filler_user.User_ID, First_Name="Bench", Last_Name="Filler"),
+    ])
+
+    slots = [
+        (start_date + timedelta(days=offset), time(hour, 0))
+        for offset in range(0, MAX_DAYS_AHEAD + 1)
+        for hour in SLOT_HOURS
+    ]
+    # Booking the first `fill` share of the horizon is the worst case for the search
+    booked = slots[: int(len(slots) * fill)]
+    rng = random.Random(seed)
+    db_session.add_all([
+        Appointment(
+            Doctor_ID=doctor_user.User_ID,
+            Patient_ID=filler_user.User_ID if rng.random() < 0.9 else patient_user.User_ID,
+            Date=d,
+            Time=t,
+        )
+        for d, t in booked
+    ])
+    db_session.commit()
+    return doctor_user.User_ID, patient_user.User_ID
+
+
+def measure(label, fn, runs, engine):
+    statements = [0]
+
+    def count(*_args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        result = fn()
+        start = timer.perf_counter()
+        for _ in range(runs):
+            fn()
+        elapsed = (timer.perf_counter() - start) / runs
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    per_call = statements[0] // (runs + 1)
+    print(f"{label:<8} {elapsed * 1000:9.2f} ms/booking  {per_call:5d} queries/booking  -> {result}")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fill", type=float, default=0.9, help="share of the horizon already booked")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        db_session = sessionmaker(bind=engine)()
+
+        start_date = date.today() + timedelta(days=3)
+        doctor_id, patient_id = build_calendar(db_session, start_date, args.fill)
+        print(f"calendar: {args.fill:.0%} of {(MAX_DAYS_AHEAD + 1) * len(SLOT_HOURS)} slots booked")
+
+        legacy, legacy_time = measure(
+            "legacy", lambda: legacy_find_slot(db_session, doctor_id, patient_id, start_date), args.runs, engine
+        )
+        bitmap, bitmap_time = measure(
+            "bitmap", lambda: find_first_free_slot(db_session, doctor_id, patient_id, start_date), args.runs, engine
+        )
+        assert legacy == bitmap, "searches disagree"
+        print(f"speedup: {legacy_time / bitmap_time:.1f}x")
+        db_session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measures bill import throughput through POST /api/records/Bills: one HTTP
+call per record versus a single batch payload of --records records.
+
+Usage: python benchmarks/bench_batch_records.py [--records 10000] [--single 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time as timer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_bills(count, offset=0):
+    return [
+        {
+            "Patient_ID": str(5 + (offset + i) % 3),
+            "Date": f"2025-{1 + (offset + i) % 12:02d}-{1 + (offset + i) % 28:02d}",
+            "Cost": f"{50 + (offset + i) % 400}.00",
+            "Paid": "No",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000, help="records in the batch request")
+    parser.add_argument("--single", type=int, default=1000, help="records sent one request each")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app binds its engine at import time, so point it at a scratch database first
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from app import app
+        client = app.test_client()
+
+        start = timer.perf_counter()
+        for bill in make_bills(args.single):
+            response = client.post("/api/records/Bills", json=bill)
+            assert response.status_code == 200, response.get_json()
+        single_rate = args.single / (timer.perf_counter() - start)
+        print(f"single : {single_rate:10,.0f} records/s  ({args.single} requests)")
+
+        payload = make_bills(args.records, offset=args.single)
+        start = timer.perf_counter()
+        response = client.post("/api/records/Bills", json=payload)
+        batch_rate = args.records / (timer.perf_counter() - start)
+        results = response.get_json()["results"]
+        assert sum(r["status"] == "created" for r in results) == args.records
+        print(f"batch  : {batch_rate:10,.0f} records/s  (1 request, {args.records} records)")
+        print(f"speedup: {batch_rate / single_rate:.1f}x")
+
+        # Same batch again as updates of the rows just created
+        for bill, result in zip(payload, results):
+            bill["Payment_ID"] = result["Payment_ID"]
+            bill["Paid"] = "Yes"
+        start = timer.perf_counter()
+        response = client.post("/api/records/Bills", json=payload)
+        update_rate = args.records / (timer.perf_counter() - start)
+        assert all(r["status"] == "updated" for r in response.get_json()["results"])
+        print(f"update : {update_rate:10,.0f} records/s  (1 request, {args.records} records)")
+
+
+if __name__ == "__main__":
+    main()
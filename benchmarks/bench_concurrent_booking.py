@@ -0,0 +1,142 @@
+"""
+Fires hundreds of parallel POST /api/appointments/auto bookings at a
+generated database and checks that no doctor slot ends up booked twice.
+
+Each worker is a separate process with its own engine, session and
+in-memory scheduling indexes, as under a multi-process server, so workers
+race for the first free hours of the least loaded doctors. The slot
+triggers turn every lost race into a retry on another slot. Reports
+bookings/s per worker count and exits 1 if any double booking, server
+error or 409 is found (the calendars have room for every booking), or if
+a run falls below --min-scaling of the ideal rate: the first run's rate
+times the cores its workers can use, min(workers, CPUs), over the first
+run's.
+
+Usage:
+    python benchmarks/bench_concurrent_booking.py [--bookings 400] [--workers 1 2 4 8] [--size 20000]
+        [--min-scaling 0.5]
+
+Throughput is bounded by SQLite's single writer and by the cores
+available. With one core the ideal is the single-worker rate; extra
+workers still cost some of it in context switches and in page caches
+that every other process's commit empties.
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time as timer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_routes
+import generate_dataset
+import models
+from app import app
+from models import APPT_END_SQL, APPT_START_SQL
+
+
+def book(path, emails, barrier, results):
+    """Worker: logs every patient in, waits for the others, then books one appointment each."""
+    models.session.remove()
+    models.Session.configure(bind=models.create_db_engine(f"sqlite:///{path}"))
+    clients = []
+    for email in emails:
+        client = app.test_client()
+        client.post("/login", data={"email": email, "password": "patient123"})
+        clients.append(client)
+    barrier.wait()
+    statuses = {}
+    for client in clients:
+        status = client.post("/api/appointments/auto").status_code
+        statuses[status] = statuses.get(status, 0) + 1
+    results.put(statuses)
+
+
+def double_bookings(path, watermark):
+    """(doctor, date, time, other time) of every new booking that overlaps another of its doctor's."""
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            "SELECT n.Doctor_ID, n.Date, n.Time, a.Time FROM appointment n JOIN appointment a"
+            " ON a.Doctor_ID = n.Doctor_ID AND a.Date = n.Date AND a.Appt_ID != n.Appt_ID"
+            f" WHERE n.Appt_ID > ? AND {APPT_START_SQL.format(a='a')} < {APPT_END_SQL.format(a='n')}"
+            f" AND {APPT_START_SQL.format(a='n')} < {APPT_END_SQL.format(a='a')}",
+            (watermark,),
+        ).fetchall()
+
+
+def run(workers, bookings, size, db_dir, work_dir):
+    path, args = bench_routes.prepare_db(size, db_dir, work_dir)
+    # Bring the copy up to the current schema (slot table, triggers) once, before forking
+    bench_routes.bind_app(path).dispose()
+    models.session.remove()
+    with sqlite3.connect(path) as conn:
+        watermark = conn.execute("SELECT COALESCE(MAX(Appt_ID), 0) FROM appointment").fetchone()[0]
+
+    layout = generate_dataset.Layout(args.admins, args.doctors, args.patients)
+    emails = [layout.patient_email(n % args.patients) for n in range(bookings)]
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(target=book, args=(path, emails[i::workers], barrier, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = timer.perf_counter()
+    statuses = {}
+    for _ in processes:
+        for status, count in results.get().items():
+            statuses[status] = statuses.get(status, 0) + count
+    elapsed = timer.perf_counter() - start
+    for process in processes:
+        process.join()
+    return statuses, elapsed, double_bookings(path, watermark)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=400, help="bookings per run, split across the workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", type=int, default=20000, help="appointments in the generated database")
+    parser.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "hospital-bench"))
+    parser.add_argument("--min-scaling", type=float, default=0.5,
+                        help="lowest acceptable bookings/s, relative to the first run's scaled to the usable cores")
+    args = parser.parse_args()
+    os.makedirs(args.db_dir, exist_ok=True)
+
+    failed = False
+    base_rate = None
+    cpus = os.cpu_count() or 1
+    base_cores = min(args.workers[0], cpus)
+    print(f"{cpus} CPUs")
+    print(f"{'workers':>7} {'bookings/s':>11} {'scaling':>8}  statuses")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as work_dir:
+            statuses, elapsed, doubles = run(workers, args.bookings, args.size, args.db_dir, work_dir)
+        created = statuses.get(200, 0)
+        rate = created / elapsed
+        base_rate = base_rate or rate
+        print(f"{workers:>7} {rate:>11.1f} {rate / base_rate:>7.2f}x  {dict(sorted(statuses.items()))}")
+        if doubles:
+            failed = True
+            print(f"  DOUBLE BOOKED: {len(doubles)} slots, e.g. {doubles[:3]}")
+        if any(status >= 500 for status in statuses):
+            failed = True
+            print("  server errors")
+        if statuses.get(409):
+            failed = True
+            print("  conflicts: free slots were left")
+        ideal = base_rate * min(workers, cpus) / base_cores
+        if rate < ideal * args.min_scaling:
+            failed = True
+            print(f"  NOT SCALING: below {args.min_scaling:.2f}x of {ideal:.1f} bookings/s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compares allocating rooms with one SQL overlap count per candidate room
+against the in-memory occupancy index in rooms.py, for one busy day.
+
+Every appointment of the day asks for a room of a random type; it is
+booked with its room (and committed) before the next one is placed, as under
+/api/appointments/auto. The room_capacity triggers check every insert.
+
+Usage: python benchmarks/bench_room_allocation.py [--rooms 300] [--appointments 3000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+from datetime import date, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The models module binds an engine on import; keep that one off any real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+from models import APPT_END_SQL, APPT_START_SQL, Appointment, ClinicRoom, Room, init_db
+from process_index import track_process_indexes
+from rooms import ROOM_OCCUPANCY
+from scheduling import SLOT_HOURS
+from table_versions import track_writes
+
+ROOM_TYPES = ("exam", "procedure", "imaging", "therapy")
+
+# The pre-index way: count each candidate room's overlapping bookings in SQL
+PROBE_SQL = text(
+    "SELECT count(*) FROM room r JOIN appointment a ON a.Appt_ID = r.Appt_ID"
+    " WHERE r.Room_No = :room_no AND a.Date = :day"
+    f" AND {APPT_START_SQL.format(a='a')} < :end AND :start < {APPT_END_SQL.format(a='a')}"
+)
+
+
+def build_day(path, rooms, appointments, seed=42):
+    """A database with `rooms` clinic rooms; returns the rng and the `appointments` to place on the day."""
+    engine = init_db(f"sqlite:///{path}")
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        conn.execute(insert(ClinicRoom), [
+            {"Name": f"Room {n}", "room_type": ROOM_TYPES[n % len(ROOM_TYPES)], "Capacity": rng.randint(1, 3)}
+            for n in range(rooms)
+        ])
+    engine.dispose()
+    # One appointment per doctor and hour, within the hour, keeps the slot triggers happy
+    return rng, [
+        (n // len(SLOT_HOURS), n, time(SLOT_HOURS[n % len(SLOT_HOURS)], 0), rng.choice((15, 30, 45, 60)))
+        for n in range(appointments)
+    ]
+
+
+def allocate_all(path, day, rng, appointments, use_index):
+    """Books the appointments that get a room; returns (seconds spent choosing rooms, rooms booked)."""
+    engine = init_db(f"sqlite:///{path}")
+    Session = sessionmaker(bind=engine)
+    track_writes(Session)
+    track_process_indexes(Session, ROOM_OCCUPANCY)
+    db_session = Session()
+    ROOM_OCCUPANCY.reset()
+    by_type = {}
+    for room_no, room_type in db_session.query(ClinicRoom.Room_No, ClinicRoom.room_type).order_by(
+        ClinicRoom.room_type, ClinicRoom.Capacity, ClinicRoom.Room_No
+    ):
+        by_type.setdefault(room_type, []).append(room_no)
+    capacity = dict(db_session.query(ClinicRoom.Room_No, ClinicRoom.Capacity))
+
+    choosing = 0.0
+    booked = 0
+    for doctor_id, patient_id, appt_time, duration in appointments:
+        room_type = rng.choice(ROOM_TYPES)
+        start = timer.perf_counter()
+        if use_index:
+            room_no = ROOM_OCCUPANCY.allocate(db_session, room_type, day, appt_time, duration)
+        else:
+            span = {"day": day, "start": appt_time.hour * 60 + appt_time.minute}
+            span["end"] = span["start"] + duration
+            room_no = next((
+                room_no for room_no in by_type[room_type]
+                if db_session.execute(PROBE_SQL, {"room_no": room_no, **span}).scalar() < capacity[room_no]
+            ), None)
+        choosing += timer.perf_counter() - start
+        if room_no is None:
+            continue
+        appt = Appointment(Doctor_ID=doctor_id, Patient_ID=patient_id, Date=day, Time=appt_time, Duration=duration)
+        db_session.add(appt)
+        db_session.add(Room(appointment=appt, room_type=room_type, Room_No=room_no))
+        db_session.commit()
+        booked += 1
+    db_session.close()
+    engine.dispose()
+    return choosing, booked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=300)
+    parser.add_argument("--appointments", type=int, default=3000, help="appointments on the day")
+    args = parser.parse_args()
+
+    day = date.today() + timedelta(days=3)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, use_index in (("probe", False), ("index", True)):
+            path = os.path.join(tmp, f"{label}.db")
+            rng, appointments = build_day(path, args.rooms, args.appointments)
+            choosing, booked = allocate_all(path, day, rng, appointments, use_index)
+            results[label] = (choosing, booked)
+            print(f"{label:<6} {choosing / args.appointments * 1000:8.3f} ms/allocation  {booked} rooms booked")
+    assert results["probe"][1] == results["index"][1], "allocators disagree"
+    print(f"speedup: {results['probe'][0] / results['index'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
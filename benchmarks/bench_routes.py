@@ -0,0 +1,350 @@
+"""
+Latency benchmark for every route in app.py, driven through the Flask test
+client against generated databases of several sizes.
+
+For each route it records p50/p95/p99 latency, SQL statements per request
+and peak Python memory, and writes them to a JSON baseline. With --compare
+it re-runs and flags routes that got slower (or chattier) than a baseline.
+
+Usage:
+    python benchmarks/bench_routes.py --sizes 1000 100000 1000000 --out baseline.json
+    python benchmarks/bench_routes.py --sizes 1000 100000 --compare baseline.json --threshold 0.2
+
+Sizes are appointment counts; the other tables scale with them. Generated
+databases are cached in --db-dir and each run works on a fresh copy.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The app binds an engine on import; keep that one off any real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event
+import generate_dataset
+import models
+from app import DEFAULT_PAGE_SIZE, PROCESS_INDEXES, app
+from metrics import time_engine
+from patient_charts import PATIENT_CHARTS
+
+SEED = 7
+ADMINS = 5
+
+CHART_ROUTE = "GET /api/patients/<id>/chart patient"
+
+# Rules build_routes leaves out on purpose: 'METHOD /rule' -> why
+UNBENCHMARKED_RULES = {
+    "GET /RequestAppointment": "renders templates/RequestAppointment.html, which does not exist (always 500)",
+}
+
+# Run before every request of a route, outside the timing: routes that
+# measure a cold cache
+ROUTE_SETUP = {
+    f"{CHART_ROUTE} cold": PATIENT_CHARTS.reset,
+}
+
+
+def dataset_args(size, path):
+    doctors = max(5, size // 1300)
+    return generate_dataset.parse_args([
+        "--format", "sqlite",
+        "--out", path,
+        "--seed", str(SEED),
+        "--admins", str(ADMINS),
+        "--doctors", str(doctors),
+        "--patients", str(max(50, size // 10)),
+        "--appointments", str(size),
+        "--rooms", str(size // 4),
+        "--records", str(size // 4),
+        "--treatments", str(size // 3),
+        "--bills", str(size // 5),
+    ])
+
+
+def prepare_db(size, db_dir, work_dir):
+    """Generates (or reuses) the dataset for `size` and returns a scratch copy of it."""
+    cached = os.path.join(db_dir, f"hospital_{size}.db")
+    if not os.path.exists(cached):
+        print(f"generating {cached} ...", file=sys.stderr, flush=True)
+        generate_dataset.generate(dataset_args(size, cached))
+    path = os.path.join(work_dir, f"bench_{size}.db")
+    shutil.copyfile(cached, path)
+    return path, dataset_args(size, cached)
+
+
+def bind_app(path):
+    """Points the app's session factory at another database; returns the engine."""
+    models.session.remove()
+    # init_db also brings databases cached by older versions up to the current schema
+    engine = models.init_db(f"sqlite:///{path}")
+    models.Session.configure(bind=engine)
+    # As in production, the app's request metrics time the SQL of its engine
+    time_engine(engine)
+    for index in PROCESS_INDEXES:
+        index.reset()
+    return engine
+
+
+def logged_in_client(email, password):
+    client = app.test_client()
+    client.post("/login", data={"email": email, "password": password})
+    with client.session_transaction() as flask_session:
+        user_id = flask_session.get("user_id")
+    return client, user_id
+
+
+def build_routes(layout):
+    """
+    (name, client, method, url, kwargs) for every route under test; kwargs
+    may be a callable returning fresh ones per request. Raises if a rule of
+    the app's url_map (and method) is left out.
+    """
+    patient, patient_id = logged_in_client(layout.patient_email(0), "patient123")
+    doctor, doctor_id = logged_in_client(layout.doctor_email(0), "doc123")
+    admin, admin_id = logged_in_client(layout.admin_email(0), "admin123")
+    anonymous = app.test_client()
+    visitor = app.test_client()
+    login_form = {"data": {"email": layout.patient_email(1), "password": "patient123"}}
+    signups = itertools.count()
+
+    def signup_form():
+        n = next(signups)
+        return {"json": {
+            "email": f"signup{n}@bench.example", "password": "signup123", "first_name": "Bench",
+            "last_name": f"Signup{n}", "address": "1 Main St", "phone": "0400000000",
+        }}
+
+    profile_form = {"data": {
+        "email": layout.patient_email(0), "first_name": "Bench", "last_name": "Patient",
+        "address": "2 Park Ave", "phone": "0400000001",
+    }}
+    week = date.today() + timedelta(days=7)
+    doctor_ids = ",".join(str(layout.doctor_id(n)) for n in range(min(layout.doctors, 10)))
+    batch = {"json": [{"Patient_ID": layout.patient_id(n)} for n in range(10, 15)]}
+
+    routes = [
+        ("GET /", visitor, "get", "/", {}),
+        ("GET /static", visitor, "get", "/static/style.css", {}),
+        ("GET /signup", visitor, "get", "/signup", {}),
+        ("POST /signup", visitor, "post", "/signup", signup_form),
+        ("GET /logout", visitor, "get", "/logout", {}),
+        ("POST /login", anonymous, "post", "/login", login_form),
+        ("GET /home patient", patient, "get", "/home", {}),
+        ("GET /profile patient", patient, "get", "/profile", {}),
+        ("GET /profile doctor", doctor, "get", "/profile", {}),
+        ("GET /profile admin", admin, "get", "/profile", {}),
+        ("GET /edit_profile patient", patient, "get", "/edit_profile", {}),
+        ("POST /edit_profile patient", patient, "post", "/edit_profile", profile_form),
+        ("GET /patient/<id>", patient, "get", f"/patient/{patient_id}", {}),
+        ("GET /doctor/<id>", doctor, "get", f"/doctor/{doctor_id}", {}),
+        ("GET /admin/<id>", admin, "get", f"/admin/{admin_id}", {}),
+        ("GET /metrics", admin, "get", "/metrics", {}),
+        ("GET /ViewRecords admin", admin, "get", "/ViewRecords", {}),
+        ("GET /AppointmentView patient", patient, "get", f"/AppointmentView/{patient_id}", {}),
+        ("GET /AppointmentView doctor", doctor, "get", f"/AppointmentView/{doctor_id}", {}),
+        ("GET /AppointmentView admin", admin, "get", f"/AppointmentView/{admin_id}", {}),
+        ("GET /MedicalRecords patient", patient, "get", f"/MedicalRecords/{patient_id}", {}),
+        ("GET /MedicalRecords doctor", doctor, "get", f"/MedicalRecords/{doctor_id}", {}),
+        ("GET /BillView patient", patient, "get", f"/BillView/{patient_id}", {}),
+        # Warm: served from the chart cache after the first request; cold: rebuilt every time
+        (CHART_ROUTE, patient, "get", f"/api/patients/{patient_id}/chart", {}),
+        (f"{CHART_ROUTE} cold", patient, "get", f"/api/patients/{patient_id}/chart", {}),
+    ]
+    for table in ("patients", "doctors", "appointments", "rooms", "clinic_rooms", "treatments",
+                  "users", "administrators", "departments", "medical_records", "bills"):
+        routes.append((f"GET /api/{table}", admin, "get", f"/api/{table}", {}))
+        routes.append((f"GET /api/{table} page", admin, "get", f"/api/{table}?limit={DEFAULT_PAGE_SIZE}", {}))
+    routes += [
+        ("GET /api/appointments doctor filter", admin, "get",
+         f"/api/appointments?doctor_id={layout.doctor_id(0)}&date_from=2024-06-01&date_to=2024-06-30", {}),
+        ("GET /api/bills patient filter", admin, "get", f"/api/bills?patient_id={layout.patient_id(0)}", {}),
+        ("GET /api/clinic_rooms/free", admin, "get",
+         f"/api/clinic_rooms/free?room_type={generate_dataset.ROOM_TYPES[0]}&date={week}&time=10:00", {}),
+        ("POST /api/records/Bills", admin, "post", "/api/records/Bills",
+         {"json": {"Patient_ID": str(layout.patient_id(2)), "Date": "2025-03-01", "Cost": "120.00", "Paid": "No"}}),
+        ("POST /api/records/Appointments update", admin, "post", "/api/records/Appointments",
+         {"json": {"Appt_ID": "1", "Time": "10:00"}}),
+        ("GET /api/doctors/<id>/availability", patient, "get",
+         f"/api/doctors/{layout.doctor_id(0)}/availability", {}),
+        ("GET /api/doctors/availability", patient, "get", f"/api/doctors/availability?ids={doctor_ids}", {}),
+        ("GET /api/appointments/suggestions", patient, "get", "/api/appointments/suggestions", {}),
+        ("POST /api/appointments/auto", patient, "post", "/api/appointments/auto", {}),
+        ("POST /api/appointments/batch", admin, "post", "/api/appointments/batch", batch),
+        ("GET /api/search/records", admin, "get", "/api/search/records?q=pain", {}),
+        ("GET /api/search/people", admin, "get", "/api/search/people?q=jo", {}),
+    ]
+    missing = uncovered_rules(routes)
+    if missing:
+        raise RuntimeError(f"routes without a benchmark: {', '.join(missing)}")
+    return routes
+
+
+def uncovered_rules(routes):
+    """
+    'METHOD /rule' of every url_map rule and method that none of `routes`
+    requests, leaving out UNBENCHMARKED_RULES.
+    """
+    adapter = app.url_map.bind("localhost")
+    covered = set()
+    for _, _, method, url, _ in routes:
+        endpoint, _ = adapter.match(urlsplit(url).path, method=method.upper())
+        covered.add((endpoint, method.upper()))
+    return sorted(
+        f"{method} {rule.rule}"
+        for rule in app.url_map.iter_rules()
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+        if (rule.endpoint, method) not in covered and f"{method} {rule.rule}" not in UNBENCHMARKED_RULES
+    )
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure_route(client, method, url, kwargs, engine, iterations, budget, setup=None):
+    statements = [0]
+
+    def count(*_args):
+        statements[0] += 1
+
+    call = getattr(client, method)
+    fresh = kwargs if callable(kwargs) else lambda: kwargs
+    call(url, **fresh())  # warm-up: template compilation, caches
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        samples = []
+        started = timer.perf_counter()
+        statements[0] = 0
+        for _ in range(iterations):
+            if setup is not None:
+                setup()
+            request_kwargs = fresh()
+            t0 = timer.perf_counter()
+            response = call(url, **request_kwargs)
+            # Streamed bodies are only produced as they are read
+            response.get_data()
+            samples.append((timer.perf_counter() - t0) * 1000)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+            # Always take at least three samples, then respect the time budget
+            if len(samples) >= 3 and timer.perf_counter() - started > budget:
+                break
+        per_request = statements[0] / len(samples)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    if setup is not None:
+        setup()
+    request_kwargs = fresh()
+    tracemalloc.start()
+    call(url, **request_kwargs).get_data()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "samples": len(samples),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "statements": round(per_request, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(sizes, db_dir, iterations, budget):
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            path, args = prepare_db(size, db_dir, work_dir)
+            engine = bind_app(path)
+            layout = generate_dataset.Layout(args.admins, args.doctors, args.patients)
+            results[str(size)] = {}
+            print(f"\n== {size:,} appointments ==")
+            print(f"{'route':<42} {'p50':>9} {'p95':>9} {'p99':>9} {'stmts':>7} {'peak KiB':>10}")
+            for name, client, method, url, kwargs in build_routes(layout):
+                stats = measure_route(client, method, url, kwargs, engine, iterations, budget, ROUTE_SETUP.get(name))
+                results[str(size)][name] = stats
+                print(f"{name:<42} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                      f"{stats['statements']:>7.1f} {stats['peak_kib']:>10.1f}")
+            models.session.remove()
+            engine.dispose()
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Returns a list of human-readable regressions."""
+    regressions = []
+    for size, routes in current.items():
+        for name, stats in routes.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                if stats[metric] > base[metric] * (1 + threshold):
+                    regressions.append(
+                        f"{size:>8} {name}: {metric} {base[metric]:.2f} -> {stats[metric]:.2f} "
+                        f"(+{(stats[metric] / base[metric] - 1) * 100:.0f}%)"
+                    )
+            if stats["statements"] > base["statements"]:
+                regressions.append(
+                    f"{size:>8} {name}: statements {base['statements']} -> {stats['statements']}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "hospital_bench"),
+                        help="where generated databases are cached")
+    parser.add_argument("--iterations", type=int, default=50, help="requests per route")
+    parser.add_argument("--budget", type=float, default=10.0, help="max seconds spent per route")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    results = run(args.sizes, args.db_dir, args.iterations, args.budget)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, fh, indent=2)
+        print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\nno regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
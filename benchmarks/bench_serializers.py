@@ -0,0 +1,106 @@
+"""
+Compares serializing appointments through full ORM entities (the old /api
+handlers) with the column-projection FieldSpec path in serializers.py.
+
+Usage: python benchmarks/bench_serializers.py [--rows 10000 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+from datetime import date, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Appointment
+from serializers import APPOINTMENT_FIELDS
+
+INSERT_BATCH = 50000
+
+
+def populate(engine, rows):
+    start = date(2025, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, INSERT_BATCH):
+            conn.execute(Appointment.__table__.insert(), [
+                {
+                    "Doctor_ID": i % 200 + 1,
+                    "Patient_ID": i % 50000 + 1,
+                    "Date": start + timedelta(days=i % 365),
+                    "Time": time(9 + i % 8, 0),
+                }
+                for i in range(offset, min(offset + INSERT_BATCH, rows))
+            ])
+
+
+def orm_path(db_session):
+    def serialize_dt(value):
+        return str(value) if value is not None else None
+    return [
+        {
+            "Appt_ID": a.Appt_ID,
+            "Doctor_ID": a.Doctor_ID,
+            "Patient_ID": a.Patient_ID,
+            "Date": serialize_dt(a.Date),
+            "Time": serialize_dt(a.Time),
+        }
+        for a in db_session.query(Appointment).all()
+    ]
+
+
+def projection_path(db_session):
+    serialize = APPOINTMENT_FIELDS.serialize
+    return [serialize(row) for row in APPOINTMENT_FIELDS.query(db_session).all()]
+
+
+def measure(fn, Session):
+    # Time and memory are taken in separate runs; tracemalloc slows Python down
+    db_session = Session()
+    gc.collect()
+    start = timer.perf_counter()
+    data = fn(db_session)
+    elapsed = timer.perf_counter() - start
+    count = len(data)
+    del data
+    db_session.close()
+
+    db_session = Session()
+    gc.collect()
+    tracemalloc.start()
+    data = fn(db_session)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    db_session.close()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'path':<11} {'rows/s':>12} {'peak alloc':>12}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(engine)
+            populate(engine, rows)
+            Session = sessionmaker(bind=engine)
+
+            results = {}
+            for label, fn in (("orm", orm_path), ("projection", projection_path)):
+                count, elapsed, peak = measure(fn, Session)
+                results[label] = elapsed
+                print(f"{count:>9} {label:<11} {count / elapsed:>12,.0f} {peak / 2**20:>9.1f} MiB")
+            print(f"{'':>9} speedup {results['orm'] / results['projection']:.1f}x")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Double-booking guard check: writes appointments from a separate SQLite
+connection, as another server process or a script would, after the app has
+warmed its in-memory indexes, and checks that bookings overlapping them
+are still rejected.
+
+  - the app may not book a doctor into an hour a foreign 90-minute
+    appointment runs into;
+  - the app may not book a patient twice at once, with another doctor;
+  - a raw insert overlapping a booked hour fails on the slot triggers;
+  - no two appointments of a doctor or a patient overlap on the test day.
+
+Exits 1 on the first guard that lets a double booking through.
+
+Usage:
+    python benchmarks/check_booking_guards.py [--size 1000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+
+from bench_routes import bind_app, logged_in_client, prepare_db
+import generate_dataset
+import models
+from intervals import APPOINTMENT_INTERVALS
+from models import APPT_END_SQL, APPT_START_SQL
+from scheduling import BOOKING_LEAD_DAYS, MAX_DAYS_AHEAD
+
+# Pairs of appointments of one owner on the test day that share time
+OVERLAPS_SQL = (
+    "SELECT count(*) FROM appointment a JOIN appointment b"
+    " ON b.{owner} = a.{owner} AND b.Date = a.Date AND b.Appt_ID > a.Appt_ID"
+    f" WHERE a.Date = ? AND {APPT_START_SQL.format(a='a')} < {APPT_END_SQL.format(a='b')}"
+    f" AND {APPT_START_SQL.format(a='b')} < {APPT_END_SQL.format(a='a')}"
+)
+
+
+def free_day(conn, doctor_ids, patient_id):
+    """First bookable day on which none of the doctors nor the patient has an appointment."""
+    today = datetime.utcnow().date()
+    for offset in range(BOOKING_LEAD_DAYS, BOOKING_LEAD_DAYS + MAX_DAYS_AHEAD):
+        day = today + timedelta(days=offset)
+        taken = conn.execute(
+            "SELECT count(*) FROM appointment WHERE Date = ? AND (Patient_ID = ? OR Doctor_ID IN ({}))".format(
+                ", ".join("?" * len(doctor_ids))
+            ),
+            (day.isoformat(), patient_id, *doctor_ids),
+        ).fetchone()[0]
+        if not taken:
+            return day
+    raise RuntimeError("no free day for the test doctors and patient")
+
+
+def foreign_booking(conn, doctor_id, patient_id, day, hour, minute, duration):
+    conn.execute(
+        "INSERT INTO appointment (Doctor_ID, Patient_ID, Date, Time, Duration) VALUES (?, ?, ?, ?, ?)",
+        (doctor_id, patient_id, day.isoformat(), f"{hour:02d}:{minute:02d}:00.000000", duration),
+    )
+    # Writers outside the app's sessions bump the shared version themselves
+    conn.execute("UPDATE table_version SET Version = Version + 1 WHERE Table_Name = 'appointment'")
+    conn.commit()
+
+
+def check(size, db_dir):
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        path, args = prepare_db(size, db_dir, work_dir)
+        engine = bind_app(path)
+        layout = generate_dataset.Layout(args.admins, args.doctors, args.patients)
+        patient, _ = logged_in_client(layout.patient_email(0), "patient123")
+        with patient.session_transaction() as flask_session:
+            patient_id = flask_session.get("patient_id") or flask_session.get("user_id")
+        doctor_ids = [layout.doctor_id(n) for n in range(3)]
+        other_patients = [layout.patient_id(n) for n in (1, 2, 3)]
+        foreign = sqlite3.connect(path, timeout=10)
+        try:
+            day = free_day(foreign, doctor_ids, patient_id)
+            # Let this process index the (empty) day before the foreign writes
+            today = datetime.utcnow().date()
+            for kind, owner_id in [("doctor", d) for d in doctor_ids] + [("patient", patient_id)]:
+                APPOINTMENT_INTERVALS.overlaps(models.session, kind, owner_id, day, time(9, 0), 60, today)
+            models.session.remove()
+
+            def book(doctor_id, hour):
+                return patient.post("/api/appointments/auto", json={
+                    "Doctor_ID": doctor_id, "Date": day.isoformat(), "Time": f"{hour:02d}:00",
+                }).status_code
+
+            # Doctor 0 is booked 09:00-10:30 elsewhere; 10:00 runs into it
+            foreign_booking(foreign, doctor_ids[0], other_patients[0], day, 9, 0, 90)
+            status = book(doctor_ids[0], 10)
+            if status != 409:
+                failures.append(f"doctor booked over a foreign 09:00+90min appointment: {status}")
+
+            # The patient sees doctor 1 at 13:00-14:30 elsewhere; doctor 2 at 14:00 overlaps it
+            foreign_booking(foreign, doctor_ids[1], patient_id, day, 13, 0, 90)
+            status = book(doctor_ids[2], 14)
+            if status != 409:
+                failures.append(f"patient booked over a foreign 13:00+90min appointment: {status}")
+
+            # Off the hour and straight into the table: the triggers alone must refuse it
+            try:
+                foreign_booking(foreign, doctor_ids[0], other_patients[1], day, 10, 15, 30)
+                failures.append("raw insert at 10:15 over the 09:00+90min appointment was accepted")
+            except sqlite3.IntegrityError:
+                foreign.rollback()
+
+            # Free hours still book
+            status = book(doctor_ids[2], 16)
+            if status != 200:
+                failures.append(f"booking a free hour failed: {status}")
+
+            for owner in ("Doctor_ID", "Patient_ID"):
+                overlapping = foreign.execute(OVERLAPS_SQL.format(owner=owner), (day.isoformat(),)).fetchone()[0]
+                if overlapping:
+                    failures.append(f"{overlapping} overlapping pairs by {owner} on {day}")
+        finally:
+            foreign.close()
+            models.session.remove()
+            engine.dispose()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000, help="appointments in the generated database")
+    parser.add_argument("--db-dir", default=os.path.join(tempfile.gettempdir(), "hospital_bench"),
+                        help="where generated databases are cached")
+    args = parser.parse_args()
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    failures = check(args.size, args.db_dir)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("double bookings rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import heapq
+import time
+from sqlalchemy import func
+from models import Appointment, Department, Doctor
+from process_index import ProcessIndex
+from table_versions import all_versions, versions
+
+# Any write to these, by this process or another, reloads the index
+SOURCE_TABLES = ("doctor", "department")
+
+# Appointments written by another process reload the counts at most this
+# often (seconds): they only rank doctors, the slot triggers guard the
+# bookings, and under a busy multi-process server every request would
+# otherwise pay for a full reload
+FOREIGN_RELOAD_INTERVAL = 1.0
+
+
+class DoctorLoadIndex(ProcessIndex):
+    """
+    Upcoming-appointment counts per doctor, kept in memory and updated from
+    committed appointment changes (see appointment_changes).
+
+    least_loaded() answers from a min-heap per (specialization, department)
+    filter, built the first time that filter is used; later count changes push
+    fresh entries and stale ones are dropped when they reach the top, so a pick
+    is O(k log n). The counts are loaded with one GROUP BY on first use, and
+    again after the doctor or department tables change, when a bulk
+    appointment statement makes an incremental update impossible, or, at most
+    every FOREIGN_RELOAD_INTERVAL, after appointments are written by anything
+    but this process.
+    """
+
+    def _clear(self):
+        self.loaded = False
+        self.loaded_at = None
+        self.behind = False  # appointments were written elsewhere since the load
+        self.today = None
+        self.source_versions = None
+        self.by_date = {}    # date -> {doctor_id: appointments that day}
+        self.load = {}       # doctor_id -> upcoming appointments
+        self.doctors = {}    # doctor_id -> (specialization, {dept_id, ...})
+        self.heaps = {}      # (specialization, dept_id) -> [(load, doctor_id), ...]
+        self.members = {}    # (specialization, dept_id) -> {doctor_id, ...}
+
+    # --- loading ---
+
+    def _reload(self, db_session, today, source_versions):
+        self.by_date = {}
+        self.load = {}
+        self.doctors = {}
+        self.heaps = {}
+        self.members = {}
+        for doctor_id, specialization, dept_id in (
+            db_session.query(Doctor.Doctor_ID, Doctor.Specialization, Department.Dept_ID)
+            .outerjoin(Department, Department.Doctor_ID == Doctor.Doctor_ID)
+        ):
+            entry = self.doctors.setdefault(doctor_id, (specialization, set()))
+            if dept_id is not None:
+                entry[1].add(dept_id)
+            self.load[doctor_id] = 0
+        for doctor_id, appt_date, count in (
+            db_session.query(Appointment.Doctor_ID, Appointment.Date, func.count())
+            .filter(Appointment.Date >= today)
+            .group_by(Appointment.Doctor_ID, Appointment.Date)
+        ):
+            if doctor_id in self.load:
+                self.by_date.setdefault(appt_date, {})[doctor_id] = count
+                self.load[doctor_id] += count
+        self.today = today
+        self.source_versions = source_versions
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        self.behind = False
+
+    def _advance(self, today):
+        """Drops the days that are no longer upcoming."""
+        for day in [day for day in self.by_date if day < today]:
+            for doctor_id, count in self.by_date.pop(day).items():
+                self._set(doctor_id, self.load[doctor_id] - count)
+        self.today = today
+
+    # --- heaps ---
+
+    def _set(self, doctor_id, load):
+        self.load[doctor_id] = load
+        for key, heap in self.heaps.items():
+            if doctor_id in self.members[key]:
+                heapq.heappush(heap, (load, doctor_id))
+                # Stale entries pile up under frequent updates; rebuild past 2x
+                if len(heap) > 2 * len(self.members[key]) + 16:
+                    self._build(key)
+
+    def _build(self, key):
+        specialization, dept_id = key
+        members = self.members[key] = {
+            doctor_id for doctor_id, (doctor_spec, depts) in self.doctors.items()
+            if (specialization is None or doctor_spec == specialization)
+            and (dept_id is None or dept_id in depts)
+        }
+        heap = self.heaps[key] = [(self.load[doctor_id], doctor_id) for doctor_id in members]
+        heapq.heapify(heap)
+        return heap
+
+    def _refresh(self, db_session, today):
+        current = all_versions(db_session)
+        source_versions = versions(db_session, SOURCE_TABLES, current)
+        if self.watch.foreign_writes(db_session, current):
+            self.behind = True
+        if self.loaded and self.behind and time.monotonic() - self.loaded_at >= FOREIGN_RELOAD_INTERVAL:
+            self.loaded = False
+        if not self.loaded or self.source_versions != source_versions:
+            self._reload(db_session, today, source_versions)
+        elif today > self.today:
+            self._advance(today)
+
+    # --- public API ---
+
+    def least_loaded(self, db_session, today, specialization=None, dept_id=None, k=1):
+        """
+        Ids of the (at most) k doctors with the fewest appointments on or
+        after `today`, fewest first, optionally among one specialization
+        and/or department; ties go to the lowest id. Empty if no doctor matches.
+        """
+        with self.lock:
+            self._refresh(db_session, today)
+            key = (specialization, dept_id)
+            heap = self.heaps.get(key)
+            if heap is None:
+                heap = self._build(key)
+            picked = []
+            while heap and len(picked) < k:
+                load, doctor_id = heapq.heappop(heap)
+                if self.load.get(doctor_id) == load and doctor_id not in picked:
+                    picked.append(doctor_id)
+            for doctor_id in picked:
+                heapq.heappush(heap, (self.load[doctor_id], doctor_id))
+            return picked
+
+    def loads(self, db_session, today, specialization=None, dept_id=None):
+        """{doctor_id: upcoming appointments} for the doctors matching the filter."""
+        with self.lock:
+            self._refresh(db_session, today)
+            key = (specialization, dept_id)
+            if key not in self.members:
+                self._build(key)
+            return {doctor_id: self.load[doctor_id] for doctor_id in self.members[key]}
+
+    def _apply(self, changes):
+        if not self.loaded:
+            return
+        deltas = {}
+        for old, new in changes:
+            for state, step in ((old, -1), (new, 1)):
+                if state is None or state.doctor_id not in self.load or state.date is None:
+                    continue
+                if state.date < self.today:
+                    continue
+                day = self.by_date.setdefault(state.date, {})
+                day[state.doctor_id] = day.get(state.doctor_id, 0) + step
+                deltas[state.doctor_id] = deltas.get(state.doctor_id, 0) + step
+        for doctor_id, delta in deltas.items():
+            if delta:
+                self._set(doctor_id, self.load[doctor_id] + delta)
+
+
+DOCTOR_LOAD = DoctorLoadIndex()
@@ -0,0 +1,571 @@
+"""
+Generates a synthetic hospital for scale testing.
+
+Output is either seed files in the seed_data/ CSV schema (load them with
+`python seed_data.py --bulk --seed-dir DIR`) or a ready-to-use SQLite
+database. The same --seed always produces the same data, whatever the
+number of worker processes. There is one user per administrator, doctor
+and patient, so the user table size is the sum of those three.
+
+Usage:
+    python generate_dataset.py --format sqlite --out big.db --appointments 10000000 --doctors 3000
+    python generate_dataset.py --format csv --out big_seed/ --patients 50000
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import sys
+import time as time_module
+from datetime import date, timedelta
+
+# Rows generated per worker task
+CHUNK_SIZE = 50000
+
+FIRST_NAMES = (
+    "Emily", "Michael", "Sara", "John", "Alice", "David", "Anna", "James", "Maria", "Robert",
+    "Linda", "William", "Elizabeth", "Joseph", "Susan", "Thomas", "Jessica", "Daniel", "Karen", "Matthew",
+    "Aino", "Eero", "Helmi", "Juhani", "Leena", "Mikko", "Noora", "Pekka", "Sanna", "Teemu",
+)
+LAST_NAMES = (
+    "Stone", "Brown", "Connor", "Smith", "Jones", "Lee", "Taylor", "Wilson", "Davies", "Evans",
+    "Thomas", "Johnson", "Roberts", "Walker", "Wright", "Robinson", "Thompson", "White", "Hughes", "Edwards",
+    "Virtanen", "Korhonen", "Nieminen", "Makinen", "Hamalainen", "Laine", "Heikkinen", "Koskinen", "Jarvinen", "Lehtonen",
+)
+STREETS = ("Health St", "Wellness Ave", "Care Rd", "Main St", "Park Ave", "Oak Rd", "Hill St", "Lake Rd")
+SPECIALIZATIONS = (
+    "Cardiology", "Neurology", "Pediatrics", "Orthopedics", "Dermatology",
+    "Oncology", "General Practice", "Psychiatry", "Radiology", "Gastroenterology",
+)
+# Share of doctors per specialization; general practice is the largest
+SPECIALIZATION_WEIGHTS = (8, 5, 9, 6, 4, 3, 20, 4, 2, 3)
+CONDITIONS = ("Healthy", "Asthma", "Diabetes", "Hypertension", "Allergic Rhinitis", "Migraine", "Arthritis", "")
+DIAGNOSES = (
+    ("Routine check-up", "Routine check-up"),
+    ("Cardiac screening", "Chest discomfort"),
+    ("Pediatric consultation", "Coughing and wheezing"),
+    ("Migraine", "Headache and nausea"),
+    ("Influenza", "Fever and muscle aches"),
+    ("Hypertension", "Dizziness"),
+    ("Type 2 diabetes", "Fatigue and thirst"),
+    ("Sprained ankle", "Ankle swelling"),
+    ("Dermatitis", "Itchy rash"),
+    ("Gastritis", "Stomach pain"),
+)
+MEDICINES = (
+    ("Vitamin D", "Take 1000 IU daily"),
+    ("Aspirin", "81 mg daily"),
+    ("Albuterol", "Two puffs as needed"),
+    ("Ibuprofen", "400 mg every 6 hours as needed"),
+    ("Amoxicillin", "500 mg three times daily for 7 days"),
+    ("Metformin", "500 mg twice daily"),
+    ("Lisinopril", "10 mg daily"),
+    ("Hydrocortisone cream", "Apply twice daily"),
+    ("Omeprazole", "20 mg before breakfast"),
+)
+ROOM_TYPES = ("consultation", "examination", "procedure", "imaging", "ward")
+# Patients a clinic room holds at once, per type; the others hold one
+ROOM_CAPACITY = {"ward": 4}
+
+# seed_data CSV headers, per file
+CSV_HEADERS = {
+    "users": ("Email", "Password", "User_Type"),
+    "administrators": ("Email", "First_Name", "Last_Name", "Dept_name", "Password"),
+    "doctors": ("Email", "First_Name", "Last_Name", "Specialization", "Password"),
+    "patients": ("Email", "First_Name", "Last_Name", "Address", "Phone", "Condition", "Admission_Date", "Discharge_Date", "Password"),
+    "departments": ("Dept_name", "Dept_head", "Doctor_Email"),
+    "appointments": ("Doctor_Email", "Patient_Email", "Date", "Time"),
+    "clinic_rooms": ("Name", "room_type", "Capacity"),
+    "rooms": ("Doctor_Email", "Patient_Email", "Date", "Time", "room_type", "Room_Name"),
+    "medical_records": ("Patient_Email", "Doctor_Email", "Symptoms", "Diagnosis"),
+    "treatments": ("Patient_Email", "Doctor_Email", "Diagnosis", "Medicine", "Prescription"),
+    "bills": ("Patient_Email", "Date", "Cost", "Paid"),
+}
+
+# SQLite columns written per table; ids of autoincrement tables are left to rowid
+SQL_COLUMNS = {
+    "user": ("User_ID", "Email", "Password", "User_Type"),
+    "administrator": ("Admin_ID", "First_Name", "Last_Name", "Dept_ID"),
+    "doctor": ("Doctor_ID", "First_Name", "Last_Name", "Specialization"),
+    "patient": ("Patient_ID", "First_Name", "Last_Name", "Address", "Phone", "Admission_Date", "Discharge_Date", "Condition"),
+    "department": ("Dept_ID", "Dept_name", "Dept_head", "Doctor_ID"),
+    "appointment": ("Doctor_ID", "Patient_ID", "Date", "Time"),
+    "clinic_room": ("Room_No", "Name", "room_type", "Capacity"),
+    "room": ("Appt_ID", "room_type", "Room_No"),
+    "medical_record": ("Patient_ID", "Doctor_ID", "Diagnosis", "Symptoms"),
+    "treatment": ("Record_ID", "Medicine", "Prescription"),
+    "bill": ("Patient_ID", "Date", "Cost", "Paid"),
+}
+
+
+class Layout:
+    """Deterministic ids and emails for every generated person."""
+
+    def __init__(self, admins, doctors, patients):
+        self.admins = admins
+        self.doctors = doctors
+        self.patients = patients
+        # User ids: administrators, then doctors, then patients
+        self.first_doctor_id = admins + 1
+        self.first_patient_id = admins + doctors + 1
+
+    def doctor_id(self, n):
+        return self.first_doctor_id + n
+
+    def patient_id(self, n):
+        return self.first_patient_id + n
+
+    @staticmethod
+    def doctor_email(n):
+        return f"dr{n}@hospital.example"
+
+    @staticmethod
+    def patient_email(n):
+        return f"patient{n}@hospital.example"
+
+    @staticmethod
+    def admin_email(n):
+        return f"admin{n}@hospital.example"
+
+
+def chunk_rng(seed, table, chunk):
+    # String seeds hash deterministically, independent of PYTHONHASHSEED
+    return random.Random(f"{seed}:{table}:{chunk}")
+
+
+def weekdays(start, days):
+    return [start + timedelta(days=i) for i in range(days) if (start + timedelta(days=i)).weekday() < 5]
+
+
+def skewed_index(rng, n):
+    """Index in [0, n) where low indexes come up more often (frequent patients)."""
+    return int(n * rng.random() ** 2)
+
+
+def person_name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+# --- Worker tasks: each returns formatted rows for one chunk ---
+# `csv` rows follow CSV_HEADERS, `sqlite` rows follow SQL_COLUMNS.
+
+def gen_patients(task):
+    seed, fmt, layout, start, count, dates = task
+    rng = chunk_rng(seed, "patients", start)
+    rows = []
+    for n in range(start, start + count):
+        first, last = person_name(rng)
+        address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}"
+        phone = f"04{rng.randint(0, 99999999):08d}"
+        condition = rng.choice(CONDITIONS)
+        admission = discharge = None
+        if rng.random() < 0.1:
+            admission = rng.choice(dates)
+            discharge = admission + timedelta(days=rng.randint(1, 14))
+        if fmt == "csv":
+            rows.append((
+                layout.patient_email(n), first, last, address, phone, condition,
+                admission.isoformat() if admission else "", discharge.isoformat() if discharge else "", "patient123",
+            ))
+        else:
+            rows.append((
+                layout.patient_id(n), first, last, address, phone,
+                admission.isoformat() if admission else None, discharge.isoformat() if discharge else None, condition,
+            ))
+    return rows, []
+
+
+def slot_patient(rng, layout, doctor_n, slot):
+    """
+    A patient for one of the doctor's slots. At every slot each doctor
+    draws from its own share of the patients, the numbers congruent to
+    doctor_n - slot modulo the number of doctors, so no patient is booked
+    with two doctors at once, whichever worker generates them. The share
+    moves with the slot, so patients see many doctors over time.
+    """
+    first = (doctor_n - slot) % layout.doctors
+    return first + layout.doctors * skewed_index(rng, len(range(first, layout.patients, layout.doctors)))
+
+
+def gen_appointments(task):
+    """
+    Appointments for a group of doctors. Each doctor gets its quota of
+    distinct slots and a patient per slot that no other doctor has then
+    (see slot_patient), so nobody is double-booked. Returns the appointment
+    rows plus (row index, room type) for appointments that get a room.
+    """
+    seed, fmt, layout, doctor_quotas, dates, slot_hours, room_ratio = task
+    total_slots = len(dates) * len(slot_hours)
+    rows = []
+    rooms = []
+    for doctor_n, quota in doctor_quotas:
+        rng = chunk_rng(seed, "appointments", doctor_n)
+        for slot in sorted(rng.sample(range(total_slots), quota)):
+            day, hour = divmod(slot, len(slot_hours))
+            patient_n = slot_patient(rng, layout, doctor_n, slot)
+            appt_date = dates[day].isoformat()
+            hour = slot_hours[hour]
+            if fmt == "csv":
+                rows.append((layout.doctor_email(doctor_n), layout.patient_email(patient_n), appt_date, f"{hour:02d}:00"))
+            else:
+                # Same TIME storage format SQLAlchemy uses on SQLite
+                rows.append((layout.doctor_id(doctor_n), layout.patient_id(patient_n), appt_date, f"{hour:02d}:00:00.000000"))
+            if rng.random() < room_ratio:
+                rooms.append((len(rows) - 1, rng.choice(ROOM_TYPES)))
+    return rows, rooms
+
+
+def gen_records(task):
+    """Medical records plus, per record, (row index, medicine, prescription) treatments."""
+    seed, fmt, layout, start, count, treatments_per_record = task
+    rng = chunk_rng(seed, "records", start)
+    rows = []
+    treatments = []
+    whole, fraction = divmod(treatments_per_record, 1)
+    for i in range(count):
+        patient_n = skewed_index(rng, layout.patients)
+        doctor_n = rng.randrange(layout.doctors)
+        diagnosis, symptoms = rng.choice(DIAGNOSES)
+        if fmt == "csv":
+            rows.append((layout.patient_email(patient_n), layout.doctor_email(doctor_n), symptoms, diagnosis))
+        else:
+            rows.append((layout.patient_id(patient_n), layout.doctor_id(doctor_n), diagnosis, symptoms))
+        for _ in range(int(whole) + (rng.random() < fraction)):
+            medicine, prescription = rng.choice(MEDICINES)
+            treatments.append((i, medicine, prescription))
+    return rows, treatments
+
+
+def gen_bills(task):
+    seed, fmt, layout, start, count, dates = task
+    rng = chunk_rng(seed, "bills", start)
+    rows = []
+    for _ in range(count):
+        patient_n = skewed_index(rng, layout.patients)
+        bill_date = rng.choice(dates).isoformat()
+        cost = round(rng.uniform(20, 2000), 2)
+        paid = "Yes" if rng.random() < 0.7 else "No"
+        if fmt == "csv":
+            rows.append((layout.patient_email(patient_n), bill_date, f"{cost:.2f}", paid))
+        else:
+            rows.append((layout.patient_id(patient_n), bill_date, cost, paid))
+    return rows, []
+
+
+# --- Sinks ---
+
+class CsvSink:
+    """Writes seed_data-style <table>.txt files into a directory."""
+
+    def __init__(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.files = {}
+        self.writers = {}
+
+    def writer(self, name):
+        if name not in self.writers:
+            fh = open(os.path.join(self.out_dir, f"{name}.txt"), "w", encoding="utf-8", newline="")
+            self.files[name] = fh
+            self.writers[name] = csv.writer(fh)
+            self.writers[name].writerow(CSV_HEADERS[name])
+        return self.writers[name]
+
+    def write(self, name, rows):
+        self.writer(name).writerows(rows)
+
+    def close(self):
+        for fh in self.files.values():
+            fh.close()
+
+
+class SqliteSink:
+    """
+    Writes straight into a new SQLite database with the app's schema.
+    Indexes are dropped while loading and rebuilt once at the end.
+    """
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            raise SystemExit(f"{path} already exists; refusing to overwrite it")
+        import sqlite3
+        from models import Base, create_db_engine
+        self.url = f"sqlite:///{os.path.abspath(path)}"
+        engine = create_db_engine(self.url)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL").fetchall():
+            self.conn.execute(f'DROP INDEX "{name}"')
+        self.statements = {
+            table: f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+            for table, columns in SQL_COLUMNS.items()
+        }
+
+    def write(self, table, rows):
+        self.conn.executemany(self.statements[table], rows)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        from models import (
+            create_db_engine, ensure_appointment_slots, ensure_indexes, ensure_person_keys, ensure_room_capacity,
+            ensure_search_index, ensure_table_versions,
+        )
+        engine = create_db_engine(self.url)
+        print("building indexes...", file=sys.stderr, flush=True)
+        ensure_indexes(engine)
+        ensure_search_index(engine)
+        ensure_person_keys(engine)
+        ensure_appointment_slots(engine)
+        ensure_room_capacity(engine)
+        ensure_table_versions(engine)
+        engine.dispose()
+
+
+# --- Driver ---
+
+def doctor_quotas(rng, doctors, appointments, total_slots):
+    """Splits the appointments across doctors with a realistic, uneven load."""
+    specializations = rng.choices(range(len(SPECIALIZATIONS)), weights=SPECIALIZATION_WEIGHTS, k=doctors)
+    # Some doctors carry noticeably more patients than others
+    weights = [rng.lognormvariate(0, 0.3) for _ in specializations]
+    scale = appointments / sum(weights)
+    quotas = [int(w * scale) for w in weights]
+    # Hand the rounding remainder to the busiest doctors
+    for n in sorted(range(doctors), key=lambda n: -weights[n])[: appointments - sum(quotas)]:
+        quotas[n] += 1
+    busiest = max(quotas, default=0)
+    if busiest > total_slots:
+        raise SystemExit(
+            f"the busiest doctor needs {busiest} slots but only {total_slots} exist; "
+            f"add --doctors or --days"
+        )
+    return specializations, quotas
+
+
+def chunks(start, total, size=CHUNK_SIZE):
+    for offset in range(start, total, size):
+        yield offset, min(size, total - offset)
+
+
+def doctor_groups(quotas, size=CHUNK_SIZE):
+    group, load = [], 0
+    for n, quota in enumerate(quotas):
+        group.append((n, quota))
+        load += quota
+        if load >= size:
+            yield group
+            group, load = [], 0
+    if group:
+        yield group
+
+
+def clinic_rooms(rooms, slots, count=None):
+    """
+    [(name, room_type, capacity)] of the clinic room registry. By default
+    every type gets one room more than it needs for half as many places
+    again as it has bookings per slot on average, so only the busiest hours
+    run out of rooms.
+    """
+    registry = []
+    for room_type in ROOM_TYPES:
+        capacity = ROOM_CAPACITY.get(room_type, 1)
+        if count is None:
+            places = rooms / slots / len(ROOM_TYPES) * 1.5 if slots else 0
+            per_type = int(-(-places // capacity)) + 1
+        else:
+            per_type = count // len(ROOM_TYPES) + (ROOM_TYPES.index(room_type) < count % len(ROOM_TYPES))
+        registry += [(f"{room_type.title()} {n + 1}", room_type, capacity) for n in range(per_type)]
+    return registry
+
+
+class RoomAllocator:
+    """
+    Gives room bookings, in write order, the first clinic room of their type
+    with a free place at that hour, so the generated bookings respect the
+    capacities like the room_capacity triggers would (appointments last one
+    slot). A booking that finds every room full stays unallocated.
+    """
+
+    def __init__(self, registry):
+        self.rooms = {}   # room_type -> [(room index in registry, capacity)]
+        for index, (_, room_type, capacity) in enumerate(registry):
+            self.rooms.setdefault(room_type, []).append((index, capacity))
+        self.used = {}    # (date, hour, room_type) -> places taken per room of the type
+        self.unallocated = 0
+
+    def allocate(self, room_type, day, hour):
+        """Index in the registry of the room given to the booking, or None."""
+        rooms = self.rooms.get(room_type, ())
+        used = self.used.get((day, hour, room_type))
+        if used is None:
+            used = self.used[day, hour, room_type] = [0] * len(rooms)
+        for n, (index, capacity) in enumerate(rooms):
+            if used[n] < capacity:
+                used[n] += 1
+                return index
+        self.unallocated += 1
+        return None
+
+
+class Report:
+    def __init__(self):
+        self.started = time_module.perf_counter()
+
+    def __call__(self, table, rows):
+        elapsed = time_module.perf_counter() - self.started
+        print(f"{table:<16} {rows:>12,} rows  {elapsed:8.1f}s", file=sys.stderr, flush=True)
+
+
+def generate(args):
+    # Imported here: scheduling imports models, which opens DATABASE_URL
+    from scheduling import SLOT_HOURS
+    fmt = args.format
+    if args.appointments and args.patients < args.doctors:
+        raise SystemExit("every doctor needs a patient of its own at each hour; add --patients")
+    layout = Layout(args.admins, args.doctors, args.patients)
+    rng = random.Random(f"{args.seed}:layout")
+    dates = weekdays(date.fromisoformat(args.start_date), args.days)
+    specializations, quotas = doctor_quotas(rng, args.doctors, args.appointments, len(dates) * len(SLOT_HOURS))
+    registry = clinic_rooms(args.rooms, len(dates) * len(SLOT_HOURS), args.clinic_rooms)
+    allocator = RoomAllocator(registry)
+    sink = CsvSink(args.out) if fmt == "csv" else SqliteSink(args.out)
+    report = Report()
+
+    # People and departments are small; build them in this process
+    used = sorted(set(specializations))
+    heads = {}
+    for n, s in enumerate(specializations):
+        heads.setdefault(s, n)
+    doctor_names = [person_name(rng) for _ in range(args.doctors)]
+    admin_names = [person_name(rng) for _ in range(args.admins)]
+    if fmt == "csv":
+        sink.write("users", (
+            [(layout.admin_email(n), "admin123", "admin") for n in range(args.admins)]
+            + [(layout.doctor_email(n), "doc123", "doctor") for n in range(args.doctors)]
+            + [(layout.patient_email(n), "patient123", "patient") for n in range(args.patients)]
+        ))
+        sink.write("doctors", [
+            (layout.doctor_email(n), *doctor_names[n], SPECIALIZATIONS[specializations[n]], "doc123")
+            for n in range(args.doctors)
+        ])
+        sink.write("departments", [
+            (SPECIALIZATIONS[s], "Dr. " + " ".join(doctor_names[heads[s]]), layout.doctor_email(heads[s])) for s in used
+        ])
+        sink.write("administrators", [
+            (layout.admin_email(n), *admin_names[n], SPECIALIZATIONS[used[n % len(used)]], "admin123")
+            for n in range(args.admins)
+        ] if used else [])
+        sink.write("clinic_rooms", registry)
+    else:
+        sink.write("user", (
+            [(n + 1, layout.admin_email(n), "admin123", "admin") for n in range(args.admins)]
+            + [(layout.doctor_id(n), layout.doctor_email(n), "doc123", "doctor") for n in range(args.doctors)]
+            + [(layout.patient_id(n), layout.patient_email(n), "patient123", "patient") for n in range(args.patients)]
+        ))
+        sink.write("doctor", [
+            (layout.doctor_id(n), *doctor_names[n], SPECIALIZATIONS[specializations[n]]) for n in range(args.doctors)
+        ])
+        sink.write("department", [
+            (i + 1, SPECIALIZATIONS[s], "Dr. " + " ".join(doctor_names[heads[s]]), layout.doctor_id(heads[s]))
+            for i, s in enumerate(used)
+        ])
+        sink.write("administrator", [
+            (n + 1, *admin_names[n], (n % len(used)) + 1 if used else None) for n in range(args.admins)
+        ])
+        # Room numbers are registry positions, starting at 1
+        sink.write("clinic_room", [(n + 1, *room) for n, room in enumerate(registry)])
+    report("people", args.admins + args.doctors + args.patients)
+    report("clinic_rooms", len(registry))
+
+    room_ratio = args.rooms / args.appointments if args.appointments else 0
+    treatments_per_record = args.treatments / args.records if args.records else 0
+
+    with multiprocessing.Pool(args.workers) as pool:
+        written = 0
+        tasks = ((args.seed, fmt, layout, start, count, dates) for start, count in chunks(0, args.patients))
+        for rows, _ in pool.imap(gen_patients, tasks):
+            sink.write("patients" if fmt == "csv" else "patient", rows)
+            written += len(rows)
+        report("patients", written)
+
+        written = rooms_written = 0
+        tasks = ((args.seed, fmt, layout, group, dates, SLOT_HOURS, room_ratio) for group in doctor_groups(quotas))
+        for rows, rooms in pool.imap(gen_appointments, tasks):
+            # Rooms are shared by every doctor, so they are allocated here, in write order
+            allocated = [
+                (i, room_type, allocator.allocate(room_type, rows[i][2], int(rows[i][3][:2])))
+                for i, room_type in rooms
+            ]
+            if fmt == "csv":
+                sink.write("appointments", rows)
+                sink.write("rooms", [
+                    (*rows[i], room_type, registry[room][0] if room is not None else "")
+                    for i, room_type, room in allocated
+                ])
+            else:
+                sink.write("appointment", rows)
+                # Appointment ids are assigned in write order, starting at 1
+                sink.write("room", [
+                    (written + i + 1, room_type, room + 1 if room is not None else None)
+                    for i, room_type, room in allocated
+                ])
+            written += len(rows)
+            rooms_written += len(rooms)
+        report("appointments", written)
+        report("rooms", rooms_written)
+        report("unallocated", allocator.unallocated)
+
+        written = treatments_written = 0
+        tasks = ((args.seed, fmt, layout, start, count, treatments_per_record) for start, count in chunks(0, args.records))
+        for rows, treatments in pool.imap(gen_records, tasks):
+            if fmt == "csv":
+                sink.write("medical_records", rows)
+                sink.write("treatments", [(rows[i][0], rows[i][1], rows[i][3], m, p) for i, m, p in treatments])
+            else:
+                sink.write("medical_record", rows)
+                sink.write("treatment", [(written + i + 1, m, p) for i, m, p in treatments])
+            written += len(rows)
+            treatments_written += len(treatments)
+        report("medical_records", written)
+        report("treatments", treatments_written)
+
+        written = 0
+        tasks = ((args.seed, fmt, layout, start, count, dates) for start, count in chunks(0, args.bills))
+        for rows, _ in pool.imap(gen_bills, tasks):
+            sink.write("bills" if fmt == "csv" else "bill", rows)
+            written += len(rows)
+        report("bills", written)
+
+    sink.close()
+    report("done", 0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--format", choices=("csv", "sqlite"), default="sqlite")
+    parser.add_argument("--out", required=True, help="directory for csv, database file for sqlite")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--admins", type=int, default=10)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--rooms", type=int, default=50000, help="appointments that get a room")
+    parser.add_argument("--clinic-rooms", type=int, help="rooms in the registry (default: sized to the bookings)")
+    parser.add_argument("--records", type=int, default=50000, help="medical records")
+    parser.add_argument("--treatments", type=int, default=80000)
+    parser.add_argument("--bills", type=int, default=40000)
+    parser.add_argument("--start-date", default="2024-01-01", help="first appointment day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=800, help="length of the appointment calendar in days")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Importing models opens DATABASE_URL; keep it off hospital.db
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    generate(parse_args())
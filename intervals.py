@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right, insort
+from lookups import chunked
+from models import Appointment
+from process_index import DayIndex
+from scheduling import appointment_span
+
+
+class DayIntervals:
+    """
+    One owner's appointments on one day as [start, end) minute intervals,
+    sorted by start. reach[i] is the latest end among the first i+1
+    intervals, so an overlap test is one bisect even when intervals overlap
+    each other (double bookings in seed data).
+    """
+
+    __slots__ = ("spans", "reach")
+
+    def __init__(self):
+        self.spans = []   # [(start, end), ...] sorted
+        self.reach = []
+
+    def __len__(self):
+        return len(self.spans)
+
+    def _update_reach(self, i):
+        del self.reach[i:]
+        reach = self.reach[-1] if self.reach else 0
+        for _, end in self.spans[i:]:
+            reach = max(reach, end)
+            self.reach.append(reach)
+
+    def add(self, start, end):
+        insort(self.spans, (start, end))
+        self._update_reach(bisect_left(self.spans, (start, end)))
+
+    def remove(self, start, end):
+        i = bisect_left(self.spans, (start, end))
+        if i < len(self.spans) and self.spans[i] == (start, end):
+            del self.spans[i]
+            self._update_reach(i)
+
+    def overlaps(self, start, end):
+        """True if any interval shares time with [start, end)."""
+        # The intervals starting before `end` are a prefix of the list; one of
+        # them overlaps exactly when the furthest of their ends is past `start`
+        i = bisect_right(self.spans, (end, -1))
+        return i > 0 and self.reach[i - 1] > start
+
+    def count_overlapping(self, start, end):
+        """How many intervals share time with [start, end)."""
+        i = bisect_right(self.spans, (end, -1))
+        count = 0
+        # Walk back from the last candidate until no earlier interval reaches `start`
+        while i > 0 and self.reach[i - 1] > start:
+            i -= 1
+            if self.spans[i][1] > start:
+                count += 1
+        return count
+
+
+# Whose calendars the index keeps: kind -> appointment column naming the owner
+OWNER_COLUMNS = {
+    "doctor": Appointment.Doctor_ID,
+    "patient": Appointment.Patient_ID,
+}
+
+
+class AppointmentIntervalIndex(DayIndex):
+    """
+    Appointment intervals per owner (doctor or patient) and day, for exact
+    overlap checks of bookings of any length, kept in memory for the days
+    from `loaded_from` on.
+
+    Like the calendar bitmaps, an owner's appointments are read with one
+    indexed range query the first time they are checked and then kept
+    current from committed appointment changes (see process_index).
+    """
+
+    def _clear(self):
+        super()._clear()
+        self.days = {}    # (kind, owner_id) -> {date: DayIntervals}
+
+    def _load(self, db_session, kind, owner_ids):
+        missing = [owner_id for owner_id in owner_ids if (kind, owner_id) not in self.days]
+        column = OWNER_COLUMNS[kind]
+        for chunk in chunked(missing):
+            for owner_id in chunk:
+                self.days[kind, owner_id] = {}
+            rows = (
+                db_session.query(column, Appointment.Date, Appointment.Time, Appointment.Duration)
+                .filter(column.in_(chunk), Appointment.Date >= self.loaded_from)
+            )
+            for owner_id, day, appt_time, duration in rows:
+                if appt_time is not None:
+                    self._day(kind, owner_id, day).add(*appointment_span(appt_time, duration))
+
+    def _day(self, kind, owner_id, day):
+        days = self.days[kind, owner_id]
+        intervals = days.get(day)
+        if intervals is None:
+            intervals = days[day] = DayIntervals()
+        return intervals
+
+    def overlaps(self, db_session, kind, owner_id, day, start_time, duration, today):
+        """
+        True if the owner has an appointment sharing time with one starting
+        at `start_time` on `day` (on or after `today`) for `duration` minutes.
+        """
+        with self.lock:
+            self._refresh(db_session, today)
+            self._load(db_session, kind, [owner_id])
+            intervals = self.days[kind, owner_id].get(day)
+            return intervals is not None and intervals.overlaps(*appointment_span(start_time, duration))
+
+    def _apply(self, changes):
+        if not self.days:
+            return
+        for old, new in changes:
+            for state, add in ((old, False), (new, True)):
+                if state is None or state.date is None or state.time is None:
+                    continue
+                if state.date < self.loaded_from:
+                    continue
+                span = appointment_span(state.time, state.duration)
+                for kind, owner_id in (("doctor", state.doctor_id), ("patient", state.patient_id)):
+                    if (kind, owner_id) not in self.days:
+                        continue
+                    if add:
+                        self._day(kind, owner_id, state.date).add(*span)
+                    elif state.date in self.days[kind, owner_id]:
+                        self.days[kind, owner_id][state.date].remove(*span)
+
+
+APPOINTMENT_INTERVALS = AppointmentIntervalIndex()
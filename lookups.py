@@ -0,0 +1,23 @@
+"""Helpers for reading rows by id in batches."""
+
+# Upper bound on bound parameters per IN (...) lookup
+LOOKUP_CHUNK = 500
+
+
+def chunked(values, size=LOOKUP_CHUNK):
+    """Lists of at most `size` of the values, for one IN (...) lookup each."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def as_id(value):
+    """
+    An id from a payload as the number the INTEGER columns store. Bulk
+    payloads may carry ids as strings; anything that is not an integer
+    matches no row and comes back as None.
+    """
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,149 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per endpoint."""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        with self.lock:
+            series = self.series.get(endpoint)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self.series[endpoint] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = [(endpoint, list(counts), total, count) for endpoint, (counts, total, count) in self.series.items()]
+        for endpoint, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, endpoint, amount=1):
+        with self.lock:
+            self.values[endpoint] = self.values.get(endpoint, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            snapshot = sorted(self.values.items())
+        lines += [f'{self.name}{{endpoint="{endpoint}"}} {value}' for endpoint, value in snapshot]
+        return lines
+
+
+REQUEST_SECONDS = Histogram("hospital_request_duration_seconds", "Time spent in the request handler.")
+DB_SECONDS = Histogram("hospital_db_duration_seconds", "Time spent executing SQL per request.")
+RENDER_SECONDS = Histogram("hospital_template_render_seconds", "Time spent rendering templates per request.")
+DB_STATEMENTS = Counter("hospital_db_statements_total", "SQL statements executed.")
+REQUESTS = Counter("hospital_requests_total", "Requests handled.")
+
+METRICS = (REQUEST_SECONDS, DB_SECONDS, RENDER_SECONDS, DB_STATEMENTS, REQUESTS)
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# --- SQL timing: engine events, attributed to the current request ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and "request_started" in g:
+        g.db_time += time.perf_counter() - context._metrics_started
+        g.db_statements += 1
+
+
+# --- Template timing: Flask render signals ---
+
+def _before_render(sender, template, context, **extra):
+    if "request_started" in g:
+        g.render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    if "render_started" in g:
+        g.render_time += time.perf_counter() - g.pop("render_started")
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.db_time = 0.0
+    g.db_statements = 0
+    g.render_time = 0.0
+
+
+def time_engine(engine):
+    """Adds the SQL run on `engine` to the timings of the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def init_metrics(app, engine, server_timing=False):
+    """
+    Times every request of `app`, the SQL it runs on `engine` and its
+    template rendering. An app bound to another engine later passes that
+    one to time_engine. With server_timing, responses also carry a
+    Server-Timing header. Bodies streamed after the handler returns are
+    not included.
+    """
+    time_engine(engine)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    app.before_request(_start_request)
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "request_started" not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or "unmatched"
+        REQUESTS.inc(endpoint)
+        REQUEST_SECONDS.observe(endpoint, total)
+        DB_SECONDS.observe(endpoint, g.db_time)
+        RENDER_SECONDS.observe(endpoint, g.render_time)
+        DB_STATEMENTS.inc(endpoint, g.db_statements)
+        if server_timing:
+            response.headers["Server-Timing"] = (
+                f'db;dur={g.db_time * 1000:.2f};desc="{g.db_statements} statements", '
+                f"render;dur={g.render_time * 1000:.2f}, "
+                f"total;dur={total * 1000:.2f}"
+            )
+        return response
@@ -1,8 +1,12 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Date, Time, Float, ForeignKey, Enum
+    create_engine, event, Column, Integer, String, Date, Time, Float, ForeignKey, Enum, Index, inspect
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, scoped_session
 from sqlalchemy.types import Enum as SQLAEnum
+import os
+import random
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///hospital.db")
 
 Base = declarative_base()
 
@@ -75,11 +79,51 @@ class Appointment(Base):
     Patient_ID = Column(Integer, ForeignKey('patient.Patient_ID'))
     Date = Column(Date)
     Time = Column(Time)
-        
+    # Length in minutes; NULL means one slot (scheduling.DEFAULT_DURATION)
+    Duration = Column(Integer)
+
+    # Calendar lookups filter on (doctor|patient, date, time); both are covering
+    __table_args__ = (
+        Index("ix_appointment_doctor_date_time", "Doctor_ID", "Date", "Time"),
+        Index("ix_appointment_patient_date_time", "Patient_ID", "Date", "Time"),
+        Index("ix_appointment_date_time", "Date", "Time"),
+    )
+
     doctor = relationship("Doctor", back_populates="appointments")
     patient = relationship("Patient", back_populates="appointments")
 
 
+class AppointmentSlot(Base):
+    """
+    One row per hour a doctor is booked, (doctor, date, HH:00). Its primary
+    key is what makes double-booking a doctor impossible: inserting an
+    appointment that touches a taken hour fails with an IntegrityError. Kept
+    by triggers on appointment, see ensure_appointment_slots(); the app never
+    writes it directly.
+
+    A unique index on appointment itself would not build on databases whose
+    seed data already holds double bookings; those keep their one slot row.
+    """
+    __tablename__ = 'appointment_slot'
+
+    Doctor_ID = Column(Integer, primary_key=True)
+    Date = Column(Date, primary_key=True)
+    Time = Column(Time, primary_key=True)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+class PatientSlot(Base):
+    """The same per-hour claims for patients, so a patient is never booked twice at once."""
+    __tablename__ = 'patient_slot'
+
+    Patient_ID = Column(Integer, primary_key=True)
+    Date = Column(Date, primary_key=True)
+    Time = Column(Time, primary_key=True)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
 class MedicalRecord(Base):
     __tablename__ = 'medical_record'
 
@@ -89,6 +133,11 @@ class MedicalRecord(Base):
     Diagnosis = Column(String(255))
     Symptoms = Column(String(255))
 
+    __table_args__ = (
+        Index("ix_medical_record_patient", "Patient_ID", "Doctor_ID"),
+        Index("ix_medical_record_doctor", "Doctor_ID", "Patient_ID"),
+    )
+
     patient = relationship("Patient", back_populates="medical_records")
     doctor = relationship("Doctor", back_populates="medical_records")
     treatments = relationship("Treatment", back_populates="medical_record")
@@ -102,6 +151,10 @@ class Treatment(Base):
     Prescription = Column(String(255))
     Record_ID = Column(Integer, ForeignKey('medical_record.Record_ID'))
 
+    __table_args__ = (
+        Index("ix_treatment_record", "Record_ID"),
+    )
+
     medical_record = relationship("MedicalRecord", back_populates="treatments")
 
 
@@ -113,7 +166,12 @@ class Bill(Base):
     Date = Column(Date)
     Cost = Column(Float)
     Paid = Column(String(3))
-    
+
+    __table_args__ = (
+        Index("ix_bill_patient_date", "Patient_ID", "Date"),
+        Index("ix_bill_date", "Date"),
+    )
+
     patient = relationship("Patient", back_populates="bills")
 
 
@@ -128,14 +186,70 @@ class Department(Base):
     doctor = relationship("Doctor", back_populates="department")
     administrators = relationship("Administrator", back_populates="department")
 
+class ClinicRoom(Base):
+    """A physical room that appointments can be allocated to (see rooms.py)."""
+    __tablename__ = 'clinic_room'
+
+    Room_No = Column(Integer, primary_key=True)
+    Name = Column(String(50))
+    room_type = Column(String(50), nullable=False)
+    # Appointments the room can hold at the same time
+    Capacity = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        Index("ix_clinic_room_type", "room_type", "Capacity", "Room_No"),
+    )
+
+    bookings = relationship("Room", back_populates="clinic_room")
+
+
 class Room(Base):
+    """A room booking: the room an appointment needs and, once allocated, which one it got."""
     __tablename__ = 'room'
 
     Room_ID = Column(Integer, primary_key=True)
     Appt_ID = Column(Integer, ForeignKey('appointment.Appt_ID'))
     room_type = Column(String(50))
+    Room_No = Column(Integer, ForeignKey('clinic_room.Room_No'))
+
+    __table_args__ = (
+        Index("ix_room_appt", "Appt_ID", "room_type"),
+        Index("ix_room_no_appt", "Room_No", "Appt_ID"),
+    )
 
     appointment = relationship("Appointment", backref="room")
+    clinic_room = relationship("ClinicRoom", back_populates="bookings")
+
+
+class PersonKey(Base):
+    """
+    Normalized lookup keys (names, email, phone digits) of patients and
+    doctors for prefix search. Filled and kept current by triggers, see
+    ensure_person_keys(); the app never writes it directly.
+    """
+    __tablename__ = 'person_key'
+
+    Kind = Column(String(10), primary_key=True)
+    Key = Column(String(255), primary_key=True)
+    Person_ID = Column(Integer, primary_key=True)
+
+    # The primary key is the whole row: a range scan on (Kind, Key) is all a lookup reads
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+class TableVersion(Base):
+    """
+    Write counter per table, shared by every process using the database:
+    bumped once by each transaction writing the table (see
+    table_versions.track_writes), read for the /api ETags and to expire the
+    per-process caches.
+    """
+    __tablename__ = 'table_version'
+
+    Table_Name = Column(String(64), primary_key=True)
+    Version = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = {"sqlite_with_rowid": False}
 
 def get_session(engine):
     Session = sessionmaker(bind=engine)
@@ -172,12 +286,426 @@ def delete_user(session, user_id):
 # DATABASE INITIALIZATION
 # ---------------------------
 
-def init_db():
-    """Creates database and all tables."""
-    engine = create_engine('sqlite:///hospital.db')
+def ensure_columns(engine):
+    """
+    Adds any nullable column declared on the models that is missing from its
+    table. create_all() never alters existing tables, so databases created
+    before a column was declared never receive it otherwise.
+    Returns the "table.column" names that were added.
+    """
+    inspector = inspect(engine)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or column.primary_key or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def ensure_indexes(engine):
+    """
+    Creates any index declared on the models that is missing from the database.
+    create_all() only builds indexes together with new tables, so databases
+    created before an index was declared never receive it otherwise.
+    Returns the names of the indexes that were created.
+    """
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    if created:
+        # Refresh planner statistics so the new indexes are picked up
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return created
+
+
+# Full-text index over medical records, one row per record (rowid = Record_ID).
+# The treatments column holds the medicine and prescription of every treatment
+# of the record. Triggers keep it in step with both tables, whichever code path
+# writes them; prefix='2 3' makes short prefix queries index lookups.
+SEARCH_TABLE = "record_search"
+
+SEARCH_TREATMENTS_SQL = (
+    "(SELECT group_concat(coalesce(t.Medicine, '') || ' ' || coalesce(t.Prescription, ''), ' ')"
+    " FROM treatment t WHERE t.Record_ID = {record_id})"
+)
+
+SEARCH_REFRESH_SQL = (
+    f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {{record_id}};"
+    f" INSERT INTO {SEARCH_TABLE} (rowid, diagnosis, symptoms, treatments)"
+    f" SELECT m.Record_ID, m.Diagnosis, m.Symptoms, {SEARCH_TREATMENTS_SQL.format(record_id='m.Record_ID')}"
+    f" FROM medical_record m WHERE m.Record_ID = {{record_id}};"
+)
+
+SEARCH_TRIGGERS = {
+    "record_search_ai": f"AFTER INSERT ON medical_record BEGIN {SEARCH_REFRESH_SQL.format(record_id='new.Record_ID')} END",
+    "record_search_au": (
+        "AFTER UPDATE ON medical_record BEGIN"
+        f" DELETE FROM {SEARCH_TABLE} WHERE rowid = old.Record_ID;"
+        f" {SEARCH_REFRESH_SQL.format(record_id='new.Record_ID')} END"
+    ),
+    "record_search_ad": f"AFTER DELETE ON medical_record BEGIN DELETE FROM {SEARCH_TABLE} WHERE rowid = old.Record_ID; END",
+    "treatment_search_ai": f"AFTER INSERT ON treatment BEGIN {SEARCH_REFRESH_SQL.format(record_id='new.Record_ID')} END",
+    "treatment_search_au": (
+        "AFTER UPDATE ON treatment BEGIN"
+        f" {SEARCH_REFRESH_SQL.format(record_id='old.Record_ID')}"
+        f" {SEARCH_REFRESH_SQL.format(record_id='new.Record_ID')} END"
+    ),
+    "treatment_search_ad": f"AFTER DELETE ON treatment BEGIN {SEARCH_REFRESH_SQL.format(record_id='old.Record_ID')} END",
+}
+
+
+def ensure_search_index(engine):
+    """
+    Creates the medical record full-text index and its triggers on SQLite,
+    filling it from the existing rows the first time. Returns True if the
+    index was built.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    built = False
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(SEARCH_TABLE):
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "diagnosis, symptoms, treatments, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            conn.exec_driver_sql(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, diagnosis, symptoms, treatments)"
+                f" SELECT m.Record_ID, m.Diagnosis, m.Symptoms, {SEARCH_TREATMENTS_SQL.format(record_id='m.Record_ID')}"
+                " FROM medical_record m"
+            )
+            built = True
+        for name, body in SEARCH_TRIGGERS.items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    return built
+
+
+# Person keys: SQLite's lower() folds ASCII only, and search.normalize_key()
+# must fold queries the same way. Phone numbers are stored as digits.
+PHONE_DIGITS_SQL = "replace(replace(replace(replace(replace(replace({0}, ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+
+PERSON_KEY_SOURCES = {
+    "patient": ("patient", "Patient_ID", (
+        "lower(trim(First_Name))",
+        "lower(trim(Last_Name))",
+        "lower(trim(First_Name)) || ' ' || lower(trim(Last_Name))",
+        "lower(trim(Last_Name)) || ' ' || lower(trim(First_Name))",
+        "(SELECT lower(trim(u.Email)) FROM user u WHERE u.User_ID = Patient_ID)",
+        PHONE_DIGITS_SQL.format("trim(Phone)"),
+    )),
+    "doctor": ("doctor", "Doctor_ID", (
+        "lower(trim(First_Name))",
+        "lower(trim(Last_Name))",
+        "lower(trim(First_Name)) || ' ' || lower(trim(Last_Name))",
+        "lower(trim(Last_Name)) || ' ' || lower(trim(First_Name))",
+        "(SELECT lower(trim(u.Email)) FROM user u WHERE u.User_ID = Doctor_ID)",
+    )),
+}
+
+
+def person_keys_insert_sql(kind, person_id=None):
+    """INSERT ... SELECT of the keys of one person, or of everyone of `kind`."""
+    table, id_column, expressions = PERSON_KEY_SOURCES[kind]
+    where = f" WHERE {id_column} = {person_id}" if person_id is not None else ""
+    sources = " UNION ALL ".join(f"SELECT {expr} AS k, {id_column} AS id FROM {table}{where}" for expr in expressions)
+    return (
+        f"INSERT OR IGNORE INTO person_key (Kind, Key, Person_ID)"
+        f" SELECT '{kind}', k, id FROM ({sources}) WHERE k IS NOT NULL AND k <> ''"
+    )
+
+
+def person_keys_refresh_sql(kind, person_id):
+    return f"DELETE FROM person_key WHERE Kind = '{kind}' AND Person_ID = {person_id}; {person_keys_insert_sql(kind, person_id)};"
+
+
+def person_key_triggers():
+    """Trigger bodies by name: patient/doctor writes and user email changes."""
+    triggers = {}
+    for kind, (table, id_column, _) in PERSON_KEY_SOURCES.items():
+        triggers[f"{table}_person_key_ai"] = (
+            f"AFTER INSERT ON {table} BEGIN {person_keys_refresh_sql(kind, 'new.' + id_column)} END"
+        )
+        triggers[f"{table}_person_key_au"] = (
+            f"AFTER UPDATE ON {table} BEGIN"
+            f" DELETE FROM person_key WHERE Kind = '{kind}' AND Person_ID = old.{id_column};"
+            f" {person_keys_refresh_sql(kind, 'new.' + id_column)} END"
+        )
+        triggers[f"{table}_person_key_ad"] = (
+            f"AFTER DELETE ON {table} BEGIN DELETE FROM person_key WHERE Kind = '{kind}' AND Person_ID = old.{id_column}; END"
+        )
+    triggers["user_person_key_au"] = (
+        "AFTER UPDATE OF Email ON user BEGIN"
+        f" {person_keys_refresh_sql('patient', 'new.User_ID')}"
+        f" {person_keys_refresh_sql('doctor', 'new.User_ID')} END"
+    )
+    return triggers
+
+
+def ensure_person_keys(engine):
+    """
+    Creates the person_key triggers on SQLite and fills the table from the
+    existing patients and doctors if it is empty. Returns True if it was filled.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    filled = False
+    with engine.begin() as conn:
+        empty = conn.exec_driver_sql("SELECT NOT EXISTS (SELECT 1 FROM person_key)").scalar()
+        if empty:
+            for kind in PERSON_KEY_SOURCES:
+                conn.exec_driver_sql(person_keys_insert_sql(kind))
+            filled = True
+        for name, body in person_key_triggers().items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    return filled
+
+
+# Minutes after midnight of an appointment row's start and end. Times are
+# stored as 'HH:MM:SS...' text; NULL Duration means one hour.
+APPT_START_SQL = "(CAST(substr({a}.Time, 1, 2) AS INTEGER) * 60 + CAST(substr({a}.Time, 4, 2) AS INTEGER))"
+APPT_END_SQL = f"({APPT_START_SQL} + coalesce({{a}}.Duration, 60))"
+
+# Appointment writes claim and release one slot row per hour of the day the
+# appointment touches, for its doctor (appointment_slot) and its patient
+# (patient_slot). An hour is only released once no appointment touches it,
+# so legacy double bookings stay claimed. Starts off the hour (legacy seed
+# rows) claim every hour they touch.
+SLOT_TABLES = {"appointment_slot": "Doctor_ID", "patient_slot": "Patient_ID"}
+
+DAY_HOURS_SQL = "(SELECT column1 AS h FROM (VALUES " + ", ".join(f"({h})" for h in range(24)) + "))"
+SLOT_TIME_SQL = "printf('%02d:00:00.000000', s.h)"
+
+
+def slot_columns_set(owner, row):
+    return f"{row}.{owner} IS NOT NULL AND {row}.Date IS NOT NULL AND {row}.Time IS NOT NULL"
+
+
+def touches_hour_sql(row, hour):
+    return f"{APPT_START_SQL.format(a=row)} < ({hour} + 1) * 60 AND {APPT_END_SQL.format(a=row)} > {hour} * 60"
+
+
+def slot_claim_sql(table, owner, keep_old=False):
+    # On update, hours the row already held (same owner and day) stay claimed as they are
+    kept = (
+        f" AND NOT (old.{owner} IS new.{owner} AND old.Date IS new.Date AND old.Time IS NOT NULL"
+        f" AND {touches_hour_sql('old', 's.h')})"
+        if keep_old else ""
+    )
+    return (
+        f"INSERT INTO {table} ({owner}, Date, Time)"
+        f" SELECT new.{owner}, new.Date, {SLOT_TIME_SQL} FROM {DAY_HOURS_SQL} s"
+        f" WHERE {slot_columns_set(owner, 'new')} AND {touches_hour_sql('new', 's.h')}{kept};"
+    )
+
+
+def slot_release_sql(table, owner):
+    return (
+        f"DELETE FROM {table} WHERE {owner} = old.{owner} AND Date = old.Date AND old.Time IS NOT NULL"
+        f" AND Time IN (SELECT {SLOT_TIME_SQL} FROM {DAY_HOURS_SQL} s WHERE {touches_hour_sql('old', 's.h')})"
+        f" AND NOT EXISTS (SELECT 1 FROM appointment a"
+        f" WHERE a.{owner} = old.{owner} AND a.Date = old.Date AND a.Time IS NOT NULL"
+        f" AND {touches_hour_sql('a', f'CAST(substr({table}.Time, 1, 2) AS INTEGER)')});"
+    )
+
+
+def slot_fill_sql(table, owner):
+    return (
+        f"INSERT OR IGNORE INTO {table} ({owner}, Date, Time)"
+        f" SELECT a.{owner}, a.Date, {SLOT_TIME_SQL} FROM appointment a JOIN {DAY_HOURS_SQL} s"
+        f" ON {touches_hour_sql('a', 's.h')} WHERE {slot_columns_set(owner, 'a')}"
+    )
+
+
+def appointment_slot_triggers():
+    """Trigger bodies by name, three per slot table."""
+    triggers = {}
+    for table, owner in SLOT_TABLES.items():
+        triggers[f"{table}_hours_ai"] = f"AFTER INSERT ON appointment BEGIN {slot_claim_sql(table, owner)} END"
+        triggers[f"{table}_hours_au"] = (
+            f"AFTER UPDATE OF {owner}, Date, Time, Duration ON appointment"
+            f" WHEN old.{owner} IS NOT new.{owner} OR old.Date IS NOT new.Date"
+            " OR old.Time IS NOT new.Time OR old.Duration IS NOT new.Duration"
+            f" BEGIN {slot_release_sql(table, owner)} {slot_claim_sql(table, owner, keep_old=True)} END"
+        )
+        triggers[f"{table}_hours_ad"] = f"AFTER DELETE ON appointment BEGIN {slot_release_sql(table, owner)} END"
+    return triggers
+
+
+def ensure_appointment_slots(engine):
+    """
+    Creates the slot triggers on SQLite and fills each slot table from the
+    existing appointments if it is empty. Returns True if anything was filled.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    filled = False
+    with engine.begin() as conn:
+        for table, owner in SLOT_TABLES.items():
+            empty = conn.exec_driver_sql(f"SELECT NOT EXISTS (SELECT 1 FROM {table})").scalar()
+            if empty:
+                conn.exec_driver_sql(slot_fill_sql(table, owner))
+                filled = True
+        for name, body in appointment_slot_triggers().items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    return filled
+
+
+# Backstop for the room allocator: a booking may not put more appointments
+# in a room at once than its capacity, whichever code path writes it. It
+# counts the room's bookings that overlap the new one, which is exact for
+# bookings on the hourly grid.
+
+ROOM_OVERLAPS_SQL = (
+    "(SELECT count(*) FROM room r"
+    " JOIN appointment a ON a.Appt_ID = r.Appt_ID"
+    " JOIN appointment n ON n.Appt_ID = new.Appt_ID"
+    " WHERE r.Room_No = new.Room_No AND r.Room_ID IS NOT new.Room_ID AND a.Date = n.Date"
+    f" AND {APPT_START_SQL.format(a='a')} < {APPT_END_SQL.format(a='n')}"
+    f" AND {APPT_START_SQL.format(a='n')} < {APPT_END_SQL.format(a='a')})"
+)
+
+ROOM_FULL_CHECK = (
+    f"WHEN new.Room_No IS NOT NULL AND {ROOM_OVERLAPS_SQL}"
+    " >= (SELECT Capacity FROM clinic_room WHERE Room_No = new.Room_No)"
+    " BEGIN SELECT RAISE(ABORT, 'room is fully booked at that time'); END"
+)
+
+ROOM_CAPACITY_TRIGGERS = {
+    "room_capacity_bi": f"BEFORE INSERT ON room {ROOM_FULL_CHECK}",
+    "room_capacity_bu": f"BEFORE UPDATE OF Room_No, Appt_ID ON room {ROOM_FULL_CHECK}",
+}
+
+
+def ensure_room_capacity(engine):
+    """Creates the room capacity triggers on SQLite."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for name, body in ROOM_CAPACITY_TRIGGERS.items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+# Tables with a shared write version: the ones the /api lists serve with
+# ETags, which are also the ones the per-process caches are built from
+VERSIONED_TABLES = (
+    "user", "patient", "doctor", "administrator", "department", "appointment",
+    "room", "clinic_room", "medical_record", "treatment", "bill",
+)
+
+# Versions start at a random point, so ETags from a replaced database file
+# do not match the ones a client kept from the old one
+VERSION_START_RANGE = 10 ** 9
+
+
+def ensure_table_versions(engine):
+    """Adds the missing table_version rows (see table_versions.track_writes for the bumps)."""
+    with engine.begin() as conn:
+        present = {name for (name,) in conn.execute(TableVersion.__table__.select().with_only_columns(
+            TableVersion.Table_Name
+        ))}
+        missing = [name for name in VERSIONED_TABLES if name not in present]
+        if missing:
+            conn.execute(TableVersion.__table__.insert(), [
+                {"Table_Name": name, "Version": random.randrange(VERSION_START_RANGE)} for name in missing
+            ])
+
+
+# SQLite connection tuning, applied to every pooled connection:
+# - WAL lets readers proceed while a single writer commits
+# - busy_timeout makes a blocked writer wait instead of failing at once
+# - synchronous=NORMAL is durable under WAL and skips an fsync per commit
+# - cache_size is in KiB when negative (64 MiB page cache per connection)
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("busy_timeout", "5000"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", "-65536"),
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+    # The driver would only open a transaction at the first write, so reads
+    # before it would see no snapshot; _begin_sqlite opens it instead
+    dbapi_connection.isolation_level = None
+
+
+# Connection execution option making the next transaction a write transaction
+# (see begin_write)
+SQLITE_BEGIN_OPTION = "sqlite_begin"
+
+
+def _begin_sqlite(conn):
+    # BEGIN IMMEDIATE takes the write lock up front: a transaction that reads
+    # and then writes cannot find its snapshot outdated at the first write
+    # (SQLITE_BUSY_SNAPSHOT), it waits for the lock at BEGIN instead. Sent on
+    # the driver connection, so it does not count as a query in the metrics.
+    mode = conn.get_execution_options().get(SQLITE_BEGIN_OPTION)
+    conn.connection.driver_connection.execute(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+def create_db_engine(url=DATABASE_URL):
+    """Creates an engine whose connection pool is safe to share between threads."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True)
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # In-memory databases live inside one connection; keep the default pool
+        return create_engine(url)
+    engine = create_engine(
+        url,
+        pool_size=10,
+        max_overflow=20,
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(engine, "begin", _begin_sqlite)
+    return engine
+
+
+def begin_write(db_session):
+    """
+    Starts the session's next transaction as a write transaction, which on
+    SQLite takes the write lock at BEGIN. Call it before the transaction's
+    first read; a transaction already in progress is committed first, so it
+    must not hold unflushed changes meant for the new one.
+    """
+    db_session.commit()
+    db_session.connection(execution_options={SQLITE_BEGIN_OPTION: "IMMEDIATE"})
+
+
+def init_db(url=DATABASE_URL):
+    """Creates database, all tables, any missing columns and indexes, the search indexes and the triggers."""
+    engine = create_db_engine(url)
     Base.metadata.create_all(engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    ensure_search_index(engine)
+    ensure_person_keys(engine)
+    ensure_appointment_slots(engine)
+    ensure_room_capacity(engine)
+    ensure_table_versions(engine)
     return engine
 
 engine = init_db()
 Session = sessionmaker(bind=engine)
-session = Session()
+
+# One session per thread/request; the web app calls session.remove() on teardown
+session = scoped_session(Session)
@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from datetime import date, time
+from sqlalchemy.orm import joinedload, selectinload
+from models import Appointment, MedicalRecord, Patient
+from process_index import ProcessIndex
+from serializers import (
+    APPOINTMENT_FIELDS, BILL_FIELDS, MEDICAL_RECORD_FIELDS, PATIENT_DETAIL_FIELDS, ROOM_FIELDS, TREATMENT_FIELDS,
+)
+
+# Charts kept per process; the least recently read is dropped first
+CHART_CACHE_SIZE = 1000
+
+# Tables a chart is built from: table -> (id column, columns pointing at the
+# row of another chart table that ties a new row to its patient)
+CHART_TABLES = {
+    "patient": ("Patient_ID", ()),
+    "doctor": ("Doctor_ID", ()),
+    "appointment": ("Appt_ID", (("Patient_ID", "patient"),)),
+    "room": ("Room_ID", (("Appt_ID", "appointment"),)),
+    "medical_record": ("Record_ID", (("Patient_ID", "patient"),)),
+    "treatment": ("Treatment_ID", (("Record_ID", "medical_record"),)),
+    "bill": ("Payment_ID", (("Patient_ID", "patient"),)),
+}
+
+
+def _doctor_name(doctor):
+    return f"{doctor.First_Name} {doctor.Last_Name}" if doctor is not None else None
+
+
+def load_chart(db_session, patient_id):
+    """
+    (chart, keys) for one patient, or (None, ()) if there is no such patient.
+    Six queries: the patient, then one selectinload per collection
+    (appointments and records with their doctors joined in, rooms,
+    treatments, bills), each split only past 500 parent rows; a request for
+    a chart that is not cached makes a seventh, the cache's table version
+    read. `keys` are the (table, id) of every row the chart shows.
+    """
+    patient = (
+        db_session.query(Patient)
+        .options(
+            selectinload(Patient.appointments).joinedload(Appointment.doctor),
+            selectinload(Patient.appointments).selectinload(Appointment.room),
+            selectinload(Patient.medical_records).joinedload(MedicalRecord.doctor),
+            selectinload(Patient.medical_records).selectinload(MedicalRecord.treatments),
+            selectinload(Patient.bills),
+        )
+        .filter(Patient.Patient_ID == patient_id)
+        .one_or_none()
+    )
+    if patient is None:
+        return None, ()
+    keys = {("patient", patient_id)}
+
+    appointments = []
+    for appt in sorted(patient.appointments, key=lambda a: (a.Date or date.max, a.Time or time.min, a.Appt_ID)):
+        keys.add(("appointment", appt.Appt_ID))
+        keys.add(("doctor", appt.Doctor_ID))
+        rooms = sorted(appt.room, key=lambda r: r.Room_ID)
+        keys.update(("room", room.Room_ID) for room in rooms)
+        appointments.append({
+            **APPOINTMENT_FIELDS.serialize_entity(appt),
+            "Doctor_Name": _doctor_name(appt.doctor),
+            "Rooms": [ROOM_FIELDS.serialize_entity(room) for room in rooms],
+        })
+
+    records = []
+    for record in sorted(patient.medical_records, key=lambda r: r.Record_ID):
+        keys.add(("medical_record", record.Record_ID))
+        keys.add(("doctor", record.Doctor_ID))
+        treatments = sorted(record.treatments, key=lambda t: t.Treatment_ID)
+        keys.update(("treatment", treatment.Treatment_ID) for treatment in treatments)
+        records.append({
+            **MEDICAL_RECORD_FIELDS.serialize_entity(record),
+            "Doctor_Name": _doctor_name(record.doctor),
+            "Treatments": [TREATMENT_FIELDS.serialize_entity(treatment) for treatment in treatments],
+        })
+
+    bills = sorted(patient.bills, key=lambda b: b.Payment_ID)
+    keys.update(("bill", bill.Payment_ID) for bill in bills)
+
+    chart = {
+        **PATIENT_DETAIL_FIELDS.serialize_entity(patient),
+        "Appointments": appointments,
+        "MedicalRecords": records,
+        "Bills": [BILL_FIELDS.serialize_entity(bill) for bill in bills],
+    }
+    return chart, keys
+
+
+class PatientChartCache(ProcessIndex):
+    """
+    Built patient charts, dropped when a committed write touches a row they show.
+
+    Every cached chart registers the (table, id) of its rows, so a write is
+    mapped to the charts it affects with dict lookups, including writes
+    that only name a row's id (bulk updates) or its parent (a treatment's
+    Record_ID, a room booking's Appt_ID). Writes whose rows are not known
+    drop every chart, and so does a write to any chart table by another
+    process, seen through the shared table versions.
+    """
+
+    tables = tuple(CHART_TABLES)
+    columns = {table: (id_column, *(column for column, _ in refs)) for table, (id_column, refs) in CHART_TABLES.items()}
+
+    def __init__(self, size=CHART_CACHE_SIZE):
+        self.size = size
+        self.charts = OrderedDict()   # patient_id -> (chart, keys)
+        self.owners = {}              # (table, id) -> {patient_id, ...}
+        # Bumped by every invalidation, so a chart read while a write
+        # committed is not cached
+        self.generation = 0
+        super().__init__()
+
+    def _clear(self):
+        self.generation += 1
+        self.charts.clear()
+        self.owners.clear()
+
+    def _drop(self, patient_id):
+        _, keys = self.charts.pop(patient_id)
+        for key in keys:
+            patients = self.owners[key]
+            patients.discard(patient_id)
+            if not patients:
+                del self.owners[key]
+
+    def _store(self, patient_id, chart, keys):
+        if patient_id in self.charts:
+            self._drop(patient_id)
+        self.charts[patient_id] = (chart, keys)
+        for key in keys:
+            self.owners.setdefault(key, set()).add(patient_id)
+        while len(self.charts) > self.size:
+            self._drop(next(iter(self.charts)))
+
+    def get(self, db_session, patient_id):
+        """The patient's chart, or None if there is no such patient."""
+        with self.lock:
+            self._refresh(db_session)
+            entry = self.charts.get(patient_id)
+            if entry is not None:
+                self.charts.move_to_end(patient_id)
+                return entry[0]
+            generation = self.generation
+        chart, keys = load_chart(db_session, patient_id)
+        if chart is not None:
+            with self.lock:
+                if self.generation == generation:
+                    self._store(patient_id, chart, keys)
+        return chart
+
+    def _invalidate(self, keys):
+        """Drops the charts showing any of the (table, id) keys."""
+        self.generation += 1
+        patients = set()
+        for key in keys:
+            patients.update(self.owners.get(key, ()))
+        for patient_id in patients:
+            self._drop(patient_id)
+
+    def _committed(self, writes):
+        keys = set()
+        for table in CHART_TABLES.keys() & writes.tables:
+            rows = writes.changes(table)
+            if rows is None:
+                self._clear()
+                return
+            # Both sides: a row moved to another parent leaves the old parent's chart too
+            for old, new in rows:
+                for values in (old, new):
+                    if values is not None:
+                        keys.update(_row_keys(table, values))
+        if keys:
+            self._invalidate(keys)
+
+
+def _row_keys(table, values):
+    """(table, id) keys of a written row and of the rows it points at, from a dict of its values."""
+    id_column, refs = CHART_TABLES[table]
+    keys = set()
+    if values.get(id_column) is not None:
+        keys.add((table, values[id_column]))
+    for column, ref_table in refs:
+        if values.get(column) is not None:
+            keys.add((ref_table, values[column]))
+    return keys
+
+
+PATIENT_CHARTS = PatientChartCache()
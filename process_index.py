@@ -0,0 +1,88 @@
+import threading
+from appointment_changes import STATE_ATTRS, appointment_changes
+from table_versions import VersionWatch
+from write_tracking import write_tracker
+
+
+class ProcessIndex:
+    """
+    Base of the in-memory indexes and caches a server process keeps, one
+    module-level instance each (doctor loads, calendars, appointment
+    intervals, room occupancy, patient charts).
+
+    Commits of this process's tracked sessions are applied in place through
+    committed() (see track_process_indexes). Writes to `tables` by anything
+    else, another server process, the batch CLI or a script, show up as a
+    change of the shared table versions and empty the index, which reloads
+    what it needs on the next read.
+
+    Subclasses implement _clear() and _apply(changes), and call _refresh()
+    under the lock before reading.
+    """
+
+    # Tables the index is built from
+    tables = ("appointment",)
+    # Columns of the written rows the index needs: table -> columns
+    columns = {"appointment": STATE_ATTRS}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.watch = VersionWatch(*self.tables)
+        self._clear()
+
+    def _clear(self):
+        """Forgets everything loaded."""
+        raise NotImplementedError
+
+    def _apply(self, changes):
+        """Applies a list of (old, new) AppointmentState pairs."""
+        raise NotImplementedError
+
+    def _committed(self, writes):
+        """Applies a committed write_tracking.TransactionWrites."""
+        if "appointment" not in writes.tables:
+            return
+        changes = appointment_changes(writes)
+        if changes is None:
+            self._clear()
+        elif changes:
+            self._apply(changes)
+
+    def _refresh(self, db_session, current=None):
+        """Empties the index if `tables` were written elsewhere; `current` is an all_versions() result to reuse."""
+        if self.watch.foreign_writes(db_session, current):
+            self._clear()
+
+    def reset(self):
+        """Forgets everything loaded, e.g. once the sessions point at another database."""
+        with self.lock:
+            self._clear()
+            self.watch.reset()
+
+    def committed(self, writes):
+        """Write tracker subscriber."""
+        with self.lock:
+            self._committed(writes)
+            self.watch.committed(writes.versions)
+
+
+class DayIndex(ProcessIndex):
+    """A ProcessIndex holding the days from `loaded_from`, the day it was first read on, onwards."""
+
+    def _clear(self):
+        self.loaded_from = None
+
+    def _refresh(self, db_session, today):
+        super()._refresh(db_session)
+        if self.loaded_from is None or today < self.loaded_from:
+            self._clear()
+            self.loaded_from = today
+
+
+def track_process_indexes(session_factory, *indexes):
+    """Hands every commit of the factory's sessions to the indexes."""
+    tracker = write_tracker(session_factory)
+    for index in indexes:
+        for table, columns in index.columns.items():
+            tracker.watch(table, columns)
+        tracker.subscribe(index.committed)
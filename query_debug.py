@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def call_site():
+    """
+    Innermost template line or project source line on the current stack,
+    skipping SQLAlchemy, Jinja and Flask internals.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        template = frame.f_globals.get("__jinja_template__")
+        if template is not None:
+            return f"{template.name or '<template>'}:{template.get_corresponding_lineno(frame.f_lineno)}"
+        filename = frame.f_code.co_filename
+        if filename.startswith(ROOT) and filename != __file__ and "site-packages" not in filename:
+            return f"{os.path.relpath(filename, ROOT)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def explain(conn, statement, parameters):
+    """EXPLAIN QUERY PLAN rows on a raw cursor, so no engine events fire."""
+    if conn.dialect.name != "sqlite":
+        return []
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+        return [row[3] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"(explain failed: {e})"]
+    finally:
+        cursor.close()
+
+
+# --- N+1 detector: the same statement text repeated within one request ---
+
+def _start_request():
+    # statement text -> [count, call site of the first repeat past the threshold]
+    g.statement_shapes = {}
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context() or "statement_shapes" not in g:
+        return
+    shape = g.statement_shapes.get(statement)
+    if shape is None:
+        g.statement_shapes[statement] = [1, None]
+        return
+    shape[0] += 1
+    if shape[0] == current_app.config["N_PLUS_ONE_THRESHOLD"]:
+        shape[1] = call_site()
+
+
+def _report_repeats(response):
+    shapes = g.pop("statement_shapes", None)
+    if shapes:
+        for statement, (count, site) in shapes.items():
+            if site is not None:
+                current_app.logger.warning(
+                    "possible N+1: %d x same statement in %s, from %s\n  %s",
+                    count, request.endpoint, site,
+                    " ".join(statement.split()),
+                )
+    return response
+
+
+# --- Slow-query log ---
+
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+
+def _log_slow(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    threshold_ms = current_app.config["SLOW_QUERY_MS"]
+    elapsed_ms = (time.perf_counter() - context._slow_query_started) * 1000
+    if elapsed_ms < threshold_ms:
+        return
+    plan = [] if executemany else explain(conn, statement, parameters)
+    current_app.logger.warning(
+        "slow query: %.1f ms (threshold %g ms) from %s\n  %s\n  params: %r\n  plan:\n%s",
+        elapsed_ms, threshold_ms, call_site(), " ".join(statement.split()),
+        parameters if not executemany else f"{len(parameters)} rows",
+        "\n".join("    " + step for step in plan) or "    (none)",
+    )
+
+
+def init_query_debug(app, engine):
+    """
+    Development aids for `app`, watching the statements run on `engine`:
+    - with app.debug, warns when one request runs the same statement
+      N_PLUS_ONE_THRESHOLD times or more, naming the template or source
+      line that triggered the repeats;
+    - with SLOW_QUERY_MS set, logs every statement slower than that with
+      its parameters and EXPLAIN QUERY PLAN.
+    Neither costs anything per statement when it is off.
+    """
+    app.config.setdefault("N_PLUS_ONE_THRESHOLD", int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5)))
+    slow_ms = os.environ.get("SLOW_QUERY_MS")
+    app.config.setdefault("SLOW_QUERY_MS", float(slow_ms) if slow_ms else None)
+
+    if app.debug:
+        app.before_request(_start_request)
+        app.after_request(_report_repeats)
+        event.listen(engine, "after_cursor_execute", _count_statement)
+    if app.config["SLOW_QUERY_MS"] is not None:
+        event.listen(engine, "before_cursor_execute", _start_timer)
+        event.listen(engine, "after_cursor_execute", _log_slow)
@@ -0,0 +1,349 @@
+from datetime import datetime
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from lookups import chunked
+from models import User, Appointment, ClinicRoom, Room, Treatment, Bill, MedicalRecord, Department
+from scheduling import MAX_DURATION, MIN_DURATION
+
+
+class RecordError(ValueError):
+    """A single record in a mutation payload is invalid."""
+
+
+def parse_date(v):
+    if not v:
+        return None
+    try:
+        return datetime.strptime(v, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid date '{v}', expected YYYY-MM-DD")
+
+
+def parse_time(v):
+    if not v:
+        return None
+    try:
+        return datetime.strptime(v, "%H:%M").time()
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid time '{v}', expected HH:MM")
+
+
+def parse_duration(v):
+    if v is None or v == "":
+        return None
+    try:
+        minutes = int(v)
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid duration '{v}', expected minutes")
+    if not MIN_DURATION <= minutes <= MAX_DURATION:
+        raise RecordError(f"Duration must be between {MIN_DURATION} and {MAX_DURATION} minutes")
+    return minutes
+
+
+def parse_cost(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid cost '{v}'")
+
+
+def copy_present(data, *keys):
+    """Update values for the keys the payload mentions at all."""
+    return {key: data.get(key) for key in keys if key in data}
+
+
+# --- Per-type payload mapping ---
+# create_values(data) returns every column of a new row;
+# update_values(data) returns only the columns the payload changes.
+
+ALLOWED_USER_TYPES = {"patient", "doctor", "admin"}
+
+
+def user_create(data):
+    provided_type = (data.get("User_Type") or "").strip().lower()
+    return {
+        "Email": (data.get("Email") or "").strip(),
+        "Password": (data.get("Password") or ""),
+        "User_Type": (provided_type if provided_type in ALLOWED_USER_TYPES else "patient"),
+    }
+
+
+def user_update(data):
+    values = {}
+    email = (data.get("Email") or "").strip()
+    if email:
+        values["Email"] = email
+    provided_type = (data.get("User_Type") or "").strip().lower()
+    if provided_type in ALLOWED_USER_TYPES:
+        values["User_Type"] = provided_type
+    pwd = data.get("Password")
+    if pwd is not None and pwd != "":
+        values["Password"] = pwd
+    return values
+
+
+def department_create(data):
+    return {
+        "Dept_name": data.get("Dept_name"),
+        "Dept_head": data.get("Dept_head"),
+        "Doctor_ID": data.get("Doctor_ID"),
+    }
+
+
+def department_update(data):
+    return copy_present(data, "Dept_name", "Dept_head", "Doctor_ID")
+
+
+def medical_record_create(data):
+    return {
+        "Patient_ID": data.get("Patient_ID"),
+        "Doctor_ID": data.get("Doctor_ID"),
+        "Symptoms": data.get("Symptoms"),
+        "Diagnosis": data.get("Diagnosis"),
+    }
+
+
+def medical_record_update(data):
+    return copy_present(data, "Patient_ID", "Doctor_ID", "Symptoms", "Diagnosis")
+
+
+def appointment_create(data):
+    return {
+        "Doctor_ID": data.get("Doctor_ID"),
+        "Patient_ID": data.get("Patient_ID"),
+        "Date": parse_date(data.get("Date")),
+        "Time": parse_time(data.get("Time")),
+        "Duration": parse_duration(data.get("Duration")),
+    }
+
+
+def appointment_update(data):
+    values = copy_present(data, "Doctor_ID", "Patient_ID")
+    appt_date = parse_date(data.get("Date"))
+    if appt_date:
+        values["Date"] = appt_date
+    appt_time = parse_time(data.get("Time"))
+    if appt_time:
+        values["Time"] = appt_time
+    if "Duration" in data:
+        values["Duration"] = parse_duration(data["Duration"])
+    return values
+
+
+def room_create(data):
+    return {
+        "Appt_ID": data.get("Appt_ID"),
+        "room_type": data.get("room_type"),
+        "Room_No": data.get("Room_No"),
+    }
+
+
+def room_update(data):
+    return copy_present(data, "Appt_ID", "room_type", "Room_No")
+
+
+def parse_room_type(v):
+    room_type = (v or "").strip()
+    if not room_type:
+        raise RecordError("room_type is required")
+    return room_type
+
+
+def parse_capacity(v):
+    try:
+        capacity = int(v)
+    except (TypeError, ValueError):
+        raise RecordError(f"Invalid capacity '{v}'")
+    if capacity < 1:
+        raise RecordError("Capacity must be at least 1")
+    return capacity
+
+
+def clinic_room_create(data):
+    return {
+        "Name": data.get("Name"),
+        "room_type": parse_room_type(data.get("room_type")),
+        "Capacity": parse_capacity(data.get("Capacity", 1)),
+    }
+
+
+def clinic_room_update(data):
+    values = copy_present(data, "Name")
+    if "room_type" in data:
+        values["room_type"] = parse_room_type(data["room_type"])
+    if "Capacity" in data:
+        values["Capacity"] = parse_capacity(data["Capacity"])
+    return values
+
+
+def treatment_create(data):
+    return {
+        "Record_ID": data.get("Record_ID"),
+        "Medicine": data.get("Medicine"),
+        "Prescription": data.get("Prescription"),
+    }
+
+
+def treatment_update(data):
+    return copy_present(data, "Record_ID", "Medicine", "Prescription")
+
+
+def bill_create(data):
+    return {
+        "Patient_ID": data.get("Patient_ID"),
+        "Date": parse_date(data.get("Date")),
+        "Cost": parse_cost(data.get("Cost")) if data.get("Cost") not in (None, "") else 0.0,
+        "Paid": data.get("Paid"),
+    }
+
+
+def bill_update(data):
+    values = copy_present(data, "Patient_ID", "Paid")
+    bill_date = parse_date(data.get("Date"))
+    if bill_date:
+        values["Date"] = bill_date
+    if data.get("Cost") not in (None, ""):
+        values["Cost"] = parse_cost(data.get("Cost"))
+    return values
+
+
+class RecordType:
+    def __init__(self, model, id_attr, create_values, update_values, unique=()):
+        self.model = model
+        self.id_attr = id_attr
+        self.id_column = getattr(model, id_attr)
+        self.create_values = create_values
+        self.update_values = update_values
+        # Columns with a UNIQUE constraint, checked per item before writing
+        self.unique = unique
+
+
+RECORD_TYPES = {
+    "Users": RecordType(User, "User_ID", user_create, user_update, unique=("Email",)),
+    "Departments": RecordType(Department, "Dept_ID", department_create, department_update),
+    "MedicalRecords": RecordType(MedicalRecord, "Record_ID", medical_record_create, medical_record_update),
+    "Appointments": RecordType(Appointment, "Appt_ID", appointment_create, appointment_update),
+    "Rooms": RecordType(Room, "Room_ID", room_create, room_update),
+    "ClinicRooms": RecordType(ClinicRoom, "Room_No", clinic_room_create, clinic_room_update),
+    "Treatments": RecordType(Treatment, "Treatment_ID", treatment_create, treatment_update),
+    "Bills": RecordType(Bill, "Payment_ID", bill_create, bill_update),
+}
+
+
+def existing_ids(db_session, rtype, ids):
+    found = set()
+    for chunk in chunked(ids):
+        found.update(row[0] for row in db_session.query(rtype.id_column).filter(rtype.id_column.in_(chunk)))
+    return found
+
+
+def check_unique(db_session, rtype, planned, results):
+    """Marks items whose unique values collide with the database or an earlier item."""
+    for column_name in rtype.unique:
+        column = getattr(rtype.model, column_name)
+        wanted = {}
+        for index, _kind, record_id, values in planned:
+            value = values.get(column_name)
+            if value is not None:
+                wanted.setdefault(value, []).append((index, record_id))
+        owners = {}
+        for chunk in chunked(wanted):
+            owners.update(db_session.query(column, rtype.id_column).filter(column.in_(chunk)).all())
+        for value, items in wanted.items():
+            owner = owners.get(value)
+            for index, record_id in items:
+                if owner is not None and owner != record_id:
+                    results[index] = {"status": "error", "error": f"{column_name} already exists"}
+                else:
+                    # First item to claim the value owns it for the rest of the batch
+                    owner = record_id if record_id is not None else ("new", index)
+    return [p for p in planned if results[p[0]] is None]
+
+
+def apply_records(db_session, rtype_name, items):
+    """
+    Creates or updates a list of records of one type in the current
+    transaction, using one bulk UPDATE and one bulk INSERT.
+    An item with the id of an existing row updates it; any other item
+    creates a new row. Invalid items are reported and skipped, and so are
+    items a constraint or trigger of the database refuses when there are
+    several (a single item's IntegrityError is raised to the caller).
+    Returns one result dict per item, in payload order. The caller commits.
+    """
+    rtype = RECORD_TYPES[rtype_name]
+    id_attr = rtype.id_attr
+    results = [None] * len(items)
+
+    # Normalize ids first so the existence check is a single pass
+    record_ids = [None] * len(items)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"status": "error", "error": "Record must be an object"}
+            continue
+        raw_id = item.get(id_attr)
+        try:
+            record_ids[index] = int(raw_id) if raw_id else None
+        except (TypeError, ValueError):
+            results[index] = {"status": "error", "error": f"Invalid {id_attr} '{raw_id}'"}
+
+    found = existing_ids(db_session, rtype, {record_id for record_id in record_ids if record_id is not None})
+
+    planned = []
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        record_id = record_ids[index]
+        try:
+            if record_id in found:
+                planned.append((index, "updated", record_id, rtype.update_values(item)))
+            else:
+                planned.append((index, "created", None, rtype.create_values(item)))
+        except RecordError as e:
+            results[index] = {"status": "error", "error": str(e)}
+
+    if rtype.unique:
+        planned = check_unique(db_session, rtype, planned, results)
+
+    if len(planned) < 2:
+        write_planned(db_session, rtype, planned, results)
+        return results
+    try:
+        with db_session.begin_nested():
+            write_planned(db_session, rtype, planned, results)
+    except IntegrityError:
+        # A constraint or trigger (e.g. a slot taken twice) refused an item:
+        # write them one at a time to tell which. Updates go first, as in bulk.
+        for item in sorted(planned, key=lambda p: p[1] != "updated"):
+            try:
+                with db_session.begin_nested():
+                    write_planned(db_session, rtype, [item], results)
+            except IntegrityError as e:
+                results[item[0]] = {"status": "error", "error": f"Constraint violation: {e.orig}"}
+    return results
+
+
+def write_planned(db_session, rtype, planned, results):
+    """Writes planned (index, kind, record_id, values) items with one bulk UPDATE and one bulk INSERT."""
+    id_attr = rtype.id_attr
+    updates = []
+    creates = []
+    for index, kind, record_id, values in planned:
+        if kind == "updated":
+            if values:
+                updates.append({id_attr: record_id, **values})
+            results[index] = {"status": "updated", id_attr: record_id}
+        else:
+            creates.append((index, values))
+
+    if updates:
+        db_session.execute(update(rtype.model), updates)
+
+    if creates:
+        # Ids come from the INTEGER PRIMARY KEY (rowid) as each row is written,
+        # so concurrent batches can never be handed the same id
+        new_ids = db_session.scalars(
+            insert(rtype.model).returning(rtype.id_column, sort_by_parameter_order=True),
+            [values for _, values in creates],
+        ).all()
+        for (index, _), new_id in zip(creates, new_ids):
+            results[index] = {"status": "created", id_attr: new_id}
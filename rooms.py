@@ -0,0 +1,149 @@
+from appointment_changes import STATE_ATTRS
+from intervals import DayIntervals
+from models import Appointment, ClinicRoom, Room
+from process_index import ProcessIndex
+from scheduling import appointment_span
+from table_versions import VersionWatch, all_versions
+
+
+class RoomOccupancyIndex(ProcessIndex):
+    """
+    Which clinic rooms are in use when, for allocating a free room of a type.
+
+    The registry is read once and again after clinic_room changes. Occupancy
+    is loaded per day on first use, with one query joining that day's
+    appointments to their allocated rooms, into one sorted interval list per
+    room (see intervals.DayIntervals). A free-room check is then a bisect per
+    candidate room. Room bookings this process commits together with their
+    appointment are added in place; loaded days are dropped when an
+    appointment that may hold a room is moved or deleted, when a booking
+    changes otherwise, or when another process writes either table.
+
+    The room_capacity triggers (see models) make the database refuse any
+    booking this index has missed, e.g. one made by another process.
+    """
+
+    tables = ("appointment", "room")
+    columns = {"appointment": ("Appt_ID", *STATE_ATTRS), "room": ("Room_ID", "Appt_ID", "Room_No")}
+
+    def __init__(self):
+        self.registry_watch = VersionWatch("clinic_room")
+        self.capacity = None   # room_no -> capacity; None until the registry is read
+        self.by_type = {}      # room_type -> [room_no, ...], smallest capacity first
+        super().__init__()
+
+    def _clear(self):
+        self.days = {}         # date -> {room_no: DayIntervals}
+
+    def _refresh(self, db_session):
+        current = all_versions(db_session)
+        if self.registry_watch.foreign_writes(db_session, current) or self.capacity is None:
+            self.capacity = {}
+            self.by_type = {}
+            for room_no, room_type, capacity in (
+                db_session.query(ClinicRoom.Room_No, ClinicRoom.room_type, ClinicRoom.Capacity)
+                .order_by(ClinicRoom.room_type, ClinicRoom.Capacity, ClinicRoom.Room_No)
+            ):
+                self.capacity[room_no] = capacity
+                self.by_type.setdefault(room_type, []).append(room_no)
+            self.days = {}
+        super()._refresh(db_session, current)
+
+    def _day(self, db_session, day):
+        rooms = self.days.get(day)
+        if rooms is None:
+            rooms = self.days[day] = {}
+            for room_no, appt_time, duration in (
+                db_session.query(Room.Room_No, Appointment.Time, Appointment.Duration)
+                .join(Room, Room.Appt_ID == Appointment.Appt_ID)
+                .filter(Appointment.Date == day, Room.Room_No.isnot(None))
+            ):
+                if appt_time is not None:
+                    rooms.setdefault(room_no, DayIntervals()).add(*appointment_span(appt_time, duration))
+        return rooms
+
+    def _free(self, db_session, room_type, day, start, end):
+        rooms = self._day(db_session, day)
+        for room_no in self.by_type.get(room_type, ()):
+            intervals = rooms.get(room_no)
+            used = intervals.count_overlapping(start, end) if intervals else 0
+            if used < self.capacity[room_no]:
+                yield room_no, self.capacity[room_no] - used
+
+    # --- public API ---
+
+    def room_types(self, db_session):
+        with self.lock:
+            self._refresh(db_session)
+            return sorted(self.by_type)
+
+    def allocate(self, db_session, room_type, day, start_time, duration=None):
+        """
+        Room_No of a room of `room_type` with a place free for the whole
+        appointment, or None. The smallest such room wins (then the lowest
+        number), which keeps the large rooms open for when they are needed.
+        """
+        with self.lock:
+            self._refresh(db_session)
+            start, end = appointment_span(start_time, duration)
+            return next((room_no for room_no, _ in self._free(db_session, room_type, day, start, end)), None)
+
+    def free_rooms(self, db_session, room_type, day, start_time, duration=None):
+        """[(room_no, places left)] of every room of `room_type` free for the appointment."""
+        with self.lock:
+            self._refresh(db_session)
+            start, end = appointment_span(start_time, duration)
+            return list(self._free(db_session, room_type, day, start, end))
+
+    def reset(self):
+        with self.lock:
+            self.registry_watch.reset()
+            self.capacity = None
+            self.by_type = {}
+        super().reset()
+
+    def invalidate(self):
+        """Drops the loaded days, e.g. after a booking lost a race the index did not see."""
+        with self.lock:
+            self._clear()
+
+    def _committed(self, writes):
+        super()._committed(writes)
+        self.registry_watch.committed(writes.versions)
+        if "clinic_room" in writes.tables:
+            self.capacity = None
+        if "room" not in writes.tables:
+            return
+        bookings = writes.changes("room")
+        if bookings is None:
+            self.days = {}
+            return
+        appointments = {
+            new["Appt_ID"]: new for _, new in writes.changes("appointment") or () if new is not None
+        }
+        for old, new in bookings:
+            if old is not None and old["Room_No"] is not None:
+                # A booking moved or removed: its day is not known here
+                self.days = {}
+                return
+            if new is None or new["Room_No"] is None:
+                continue
+            appt = appointments.get(new["Appt_ID"])
+            if appt is None or appt["Time"] is None:
+                # A room booked for an appointment this transaction did not write
+                self.days = {}
+                return
+            rooms = self.days.get(appt["Date"])
+            if rooms is not None:
+                rooms.setdefault(new["Room_No"], DayIntervals()).add(*appointment_span(appt["Time"], appt["Duration"]))
+
+    def _apply(self, changes):
+        for old, new in changes:
+            # _committed adds the rooms of new appointments; a moved or deleted one may hold one
+            if old is not None:
+                self.days.pop(old.date, None)
+                if new is not None:
+                    self.days.pop(new.date, None)
+
+
+ROOM_OCCUPANCY = RoomOccupancyIndex()
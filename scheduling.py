@@ -0,0 +1,190 @@
+import heapq
+from datetime import time, timedelta
+from itertools import islice
+from sqlalchemy import or_
+from models import Appointment, AppointmentSlot
+
+# Bookable business hours: 09:00 - 16:00, one slot per hour
+SLOT_HOURS = tuple(range(9, 17))
+ALL_SLOTS_MASK = (1 << len(SLOT_HOURS)) - 1
+
+# Auto-booking starts this many days out and looks this far ahead
+BOOKING_LEAD_DAYS = 3
+MAX_DAYS_AHEAD = 60
+
+# Appointment lengths in minutes; rows without a Duration last one slot
+DEFAULT_DURATION = 60
+MIN_DURATION = 5
+MAX_DURATION = len(SLOT_HOURS) * 60
+
+
+def slot_bit(value):
+    """Returns the bitmap bit for a slot start time, or 0 if it is not a slot."""
+    if value is None or value.minute or value.second:
+        return 0
+    if value.hour not in SLOT_HOURS:
+        return 0
+    return 1 << (value.hour - SLOT_HOURS[0])
+
+
+def appointment_span(start_time, duration=None):
+    """[start, end) of an appointment in minutes after midnight."""
+    start = start_time.hour * 60 + start_time.minute
+    return start, start + (duration or DEFAULT_DURATION)
+
+
+def slot_mask(start_time, duration=None):
+    """Bitmap of every slot an appointment overlaps, 0 if none (or no start time)."""
+    if start_time is None:
+        return 0
+    start, end = appointment_span(start_time, duration)
+    first = max(start // 60, SLOT_HOURS[0])
+    last = min((end - 1) // 60, SLOT_HOURS[-1])
+    if first > last:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << (first - SLOT_HOURS[0])
+
+
+def slots_needed(duration):
+    """Consecutive slots an appointment of `duration` minutes takes when it starts on the hour."""
+    return -(-(duration or DEFAULT_DURATION) // 60)
+
+
+def claimed_hours(start_time, duration=None):
+    """Hours of the day (0-23) whose slot rows an appointment claims: every hour it touches (see models)."""
+    start, end = appointment_span(start_time, duration)
+    return range(start // 60, min((end - 1) // 60, 23) + 1)
+
+
+def load_busy_bitmaps(db_session, doctor_id, patient_id, start_date, end_date):
+    """
+    Loads every slot taken by the doctor or the patient between start_date
+    and end_date (inclusive) in a single range query.
+    Returns {date: bitmap} where bit i set means an appointment overlaps SLOT_HOURS[i].
+    """
+    rows = (
+        db_session.query(Appointment.Date, Appointment.Time, Appointment.Duration)
+        .filter(
+            Appointment.Date >= start_date,
+            Appointment.Date <= end_date,
+            or_(Appointment.Doctor_ID == doctor_id, Appointment.Patient_ID == patient_id),
+        )
+        .all()
+    )
+    return _day_bitmaps(rows)
+
+
+def load_patient_bitmaps(db_session, patient_id, start_date, end_date):
+    """Like load_busy_bitmaps, for the patient's appointments only."""
+    rows = (
+        db_session.query(Appointment.Date, Appointment.Time, Appointment.Duration)
+        .filter(
+            Appointment.Patient_ID == patient_id,
+            Appointment.Date >= start_date,
+            Appointment.Date <= end_date,
+        )
+        .all()
+    )
+    return _day_bitmaps(rows)
+
+
+def _day_bitmaps(rows):
+    busy = {}
+    for appt_date, appt_time, duration in rows:
+        mask = slot_mask(appt_time, duration)
+        if mask:
+            busy[appt_date] = busy.get(appt_date, 0) | mask
+    return busy
+
+
+def first_free_in_bitmap(bitmap, slots=1):
+    """
+    Returns the earliest slot hour in a day bitmap that starts `slots` free
+    consecutive slots, or None if the day has no such run.
+    """
+    free = ~bitmap & ALL_SLOTS_MASK
+    for _ in range(slots - 1):
+        # Bit i stays set only while slot i+1 (and so on) is free too
+        free &= free >> 1
+    if not free:
+        return None
+    # Lowest set bit -> earliest free hour
+    return SLOT_HOURS[(free & -free).bit_length() - 1]
+
+
+def find_first_free_slot(db_session, doctor_id, patient_id, start_date, max_days_ahead=MAX_DAYS_AHEAD,
+                         duration=DEFAULT_DURATION, accept=None):
+    """
+    Finds the earliest hour on or after start_date from which neither the
+    doctor nor the patient has an appointment for `duration` minutes, and
+    that accept(date, hour) agrees to if given (e.g. a room is free).
+    Returns (date, hour) or None if the whole horizon is booked.
+    """
+    end_date = start_date + timedelta(days=max_days_ahead)
+    busy = load_busy_bitmaps(db_session, doctor_id, patient_id, start_date, end_date)
+    slots = slots_needed(duration)
+    for offset in range(0, max_days_ahead + 1):
+        candidate_date = start_date + timedelta(days=offset)
+        bitmap = busy.get(candidate_date, 0)
+        hour = first_free_in_bitmap(bitmap, slots)
+        while hour is not None and accept is not None and not accept(candidate_date, hour):
+            # Rejected: treat the start as taken and try the next one that day
+            bitmap |= 1 << (hour - SLOT_HOURS[0])
+            hour = first_free_in_bitmap(bitmap, slots)
+        if hour is not None:
+            return candidate_date, hour
+    return None
+
+
+def free_slots(doctor_busy, patient_busy, start_date, max_days_ahead=MAX_DAYS_AHEAD, slots=1):
+    """
+    Yields (date, hour) for every hour on or after start_date that starts
+    `slots` consecutive slots free in both {date: bitmap} maps, earliest
+    first. Lazy: a caller that stops after the first few slots only looks
+    at the first few days.
+    """
+    for offset in range(0, max_days_ahead + 1):
+        day = start_date + timedelta(days=offset)
+        free = ~(doctor_busy.get(day, 0) | patient_busy.get(day, 0)) & ALL_SLOTS_MASK
+        for _ in range(slots - 1):
+            free &= free >> 1
+        while free:
+            lowest = free & -free
+            yield day, SLOT_HOURS[lowest.bit_length() - 1]
+            free ^= lowest
+
+
+def _doctor_slots(doctor_id, rank, doctor_busy, patient_busy, start_date, max_days_ahead):
+    for day, hour in free_slots(doctor_busy, patient_busy, start_date, max_days_ahead):
+        yield day, hour, rank, doctor_id
+
+
+def taken_slots(db_session, slots):
+    """The (date, hour, doctor_id) slots among `slots` that the database holds for their doctor, in one lookup."""
+    if not slots:
+        return set()
+    # Three IN lists seek the primary key; a row-value IN over all three columns would scan
+    rows = db_session.query(AppointmentSlot.Date, AppointmentSlot.Time, AppointmentSlot.Doctor_ID).filter(
+        AppointmentSlot.Doctor_ID.in_({doctor_id for _, _, doctor_id in slots}),
+        AppointmentSlot.Date.in_({day for day, _, _ in slots}),
+        AppointmentSlot.Time.in_({time(hour, 0) for _, hour, _ in slots}),
+    )
+    wanted = set(slots)
+    return {slot for day, slot_time, doctor_id in rows if (slot := (day, slot_time.hour, doctor_id)) in wanted}
+
+
+def earliest_slots(doctor_busy, patient_busy, start_date, k, rank=None, max_days_ahead=MAX_DAYS_AHEAD):
+    """
+    The k earliest free slots across several doctors, as (date, hour, doctor_id).
+
+    doctor_busy maps doctor_id -> {date: bitmap}. Each doctor's free slots
+    are merged with a heap, so the work is one head per doctor plus O(log n)
+    per returned slot rather than doctors x days x hours. Slots at the same
+    time are ordered by rank[doctor_id] (e.g. upcoming load), then by id.
+    """
+    rank = rank or {}
+    streams = [
+        _doctor_slots(doctor_id, rank.get(doctor_id, 0), busy, patient_busy, start_date, max_days_ahead)
+        for doctor_id, busy in doctor_busy.items()
+    ]
+    return [(day, hour, doctor_id) for day, hour, _, doctor_id in islice(heapq.merge(*streams), k)]
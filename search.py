@@ -0,0 +1,174 @@
+import math
+import re
+import string
+from sqlalchemy import select, text
+from models import SEARCH_TABLE, Doctor, Patient, PersonKey, User
+
+# Diagnosis matches weigh most, then symptoms, then treatments
+SEARCH_WEIGHTS = (4.0, 2.0, 1.0)
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query):
+    """
+    FTS5 MATCH expression for free text typed by a user: every word must
+    appear, the last one as a prefix so results follow the typing.
+    Returns None if the query has no searchable words.
+    """
+    words = WORD.findall(query or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+def format_cursor(after):
+    """The X-Next-Cursor value for a (score, Record_ID) search position."""
+    score, record_id = after
+    # repr() round-trips the float, so the next page starts exactly after this hit
+    return f"{score!r}:{record_id}"
+
+
+def parse_cursor(cursor):
+    """(score, Record_ID) from a format_cursor() value; ValueError if it is not one."""
+    score, _, record_id = (cursor or "").partition(":")
+    score, record_id = float(score), int(record_id)
+    if not math.isfinite(score):
+        raise ValueError(f"invalid search cursor '{cursor}'")
+    return score, record_id
+
+
+def search_records(db_session, query, patient_id=None, doctor_id=None, limit=20, after=None):
+    """
+    Ranked medical record hits for `query`, optionally limited to one
+    patient's or one doctor's records. Returns (hits, next) where hits is
+    up to `limit` dicts, best first, and next is the (score, Record_ID) to
+    pass as `after` for the following page, or None on the last one.
+    Pages seek past `after` instead of counting an offset, so a deep page
+    costs no more than the first.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], None
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    score = f"bm25({SEARCH_TABLE}, {weights})"
+    scope = ""
+    # One extra row tells whether another page exists
+    params = {"q": expression, "limit": limit + 1}
+    if patient_id is not None:
+        scope += ' AND m."Patient_ID" = :patient_id'
+        params["patient_id"] = patient_id
+    if doctor_id is not None:
+        scope += ' AND m."Doctor_ID" = :doctor_id'
+        params["doctor_id"] = doctor_id
+    if after is not None:
+        scope += f' AND ({score} > :after_score OR ({score} = :after_score AND m."Record_ID" > :after_id))'
+        params["after_score"], params["after_id"] = after
+    rows = db_session.execute(text(
+        f'SELECT m."Record_ID", m."Patient_ID", m."Doctor_ID", m."Diagnosis", m."Symptoms",'
+        f" snippet({SEARCH_TABLE}, -1, '[', ']', '...', 12), {score} AS score"
+        f' FROM {SEARCH_TABLE} JOIN medical_record m ON m."Record_ID" = {SEARCH_TABLE}.rowid'
+        f" WHERE {SEARCH_TABLE} MATCH :q{scope}"
+        ' ORDER BY score, m."Record_ID" LIMIT :limit'
+    ), params).all()
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = (rows[-1].score, rows[-1].Record_ID)
+    hits = [
+        {
+            "Record_ID": record_id,
+            "Patient_ID": patient,
+            "Doctor_ID": doctor,
+            "Diagnosis": diagnosis,
+            "Symptoms": symptoms,
+            "Snippet": snippet,
+            # bm25() is lower-is-better; flip it so clients can sort descending
+            "Score": round(-score, 4),
+        }
+        for record_id, patient, doctor, diagnosis, symptoms, snippet, score in rows
+    ]
+    return hits, next_after
+
+
+# --- People typeahead (person_key prefix index) ---
+
+# SQLite's lower() only folds ASCII letters; fold queries the same way
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+PHONE_QUERY = re.compile(r"^[\d\s()+.-]+$")
+PHONE_SEPARATORS = re.compile(r"[\s()+.-]")
+
+# Most keys one person can have (see models.PERSON_KEY_SOURCES)
+MAX_KEYS_PER_PERSON = 6
+
+
+def normalize_key(query):
+    """The person_key form of a typed query: ASCII-lowercased, single-spaced; phones as digits."""
+    query = (query or "").strip()
+    if PHONE_QUERY.match(query) and any(c.isdigit() for c in query):
+        return PHONE_SEPARATORS.sub("", query)
+    return " ".join(query.translate(ASCII_LOWER).split())
+
+
+def prefix_matches(db_session, kind, prefix, limit):
+    """[(key, person_id)] of the first `limit` people whose key starts with `prefix`, in key order."""
+    # Every key starting with prefix sorts in [prefix, prefix with its last character bumped)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    rows = db_session.execute(
+        select(PersonKey.Key, PersonKey.Person_ID)
+        .where(PersonKey.Kind == kind, PersonKey.Key >= prefix, PersonKey.Key < upper)
+        .order_by(PersonKey.Key)
+        .limit(limit * MAX_KEYS_PER_PERSON)
+    )
+    best = {}
+    for key, person_id in rows:
+        best.setdefault(person_id, key)
+        if len(best) == limit:
+            break
+    return [(key, person_id) for person_id, key in best.items()]
+
+
+def search_people(db_session, query, kinds=("patient", "doctor"), limit=10):
+    """
+    Up to `limit` patients and/or doctors whose name, email or phone starts
+    with `query`, ordered by the matching key.
+    """
+    prefix = normalize_key(query)
+    if not prefix:
+        return []
+    matches = sorted(
+        (key, kind, person_id)
+        for kind in kinds
+        for key, person_id in prefix_matches(db_session, kind, prefix, limit)
+    )[:limit]
+
+    ids = {kind: [person_id for _, k, person_id in matches if k == kind] for kind in kinds}
+    details = {}
+    if ids.get("patient"):
+        rows = (
+            db_session.query(Patient.Patient_ID, Patient.First_Name, Patient.Last_Name, Patient.Phone, User.Email)
+            .outerjoin(User, User.User_ID == Patient.Patient_ID)
+            .filter(Patient.Patient_ID.in_(ids["patient"]))
+        )
+        for person_id, first, last, phone, email in rows:
+            details["patient", person_id] = {
+                "First_Name": first, "Last_Name": last, "Email": email, "Phone": phone,
+            }
+    if ids.get("doctor"):
+        rows = (
+            db_session.query(Doctor.Doctor_ID, Doctor.First_Name, Doctor.Last_Name, Doctor.Specialization, User.Email)
+            .outerjoin(User, User.User_ID == Doctor.Doctor_ID)
+            .filter(Doctor.Doctor_ID.in_(ids["doctor"]))
+        )
+        for person_id, first, last, specialization, email in rows:
+            details["doctor", person_id] = {
+                "First_Name": first, "Last_Name": last, "Email": email, "Specialization": specialization,
+            }
+
+    return [
+        {"Kind": kind, "ID": person_id, "Match": key, **details[kind, person_id]}
+        for key, kind, person_id in matches
+        if (kind, person_id) in details
+    ]
@@ -1,12 +1,13 @@
 from sqlalchemy.orm import sessionmaker
 from models import (
     Base,
-    init_db,
+    engine,
     User,
     Administrator,
     Doctor,
     Patient,
     Appointment,
+    ClinicRoom,
     Room,
     Treatment,
     MedicalRecord,
@@ -14,13 +15,18 @@ from models import (
     Department,
 )
 from datetime import date, time, datetime
+import argparse
 import os
 import csv
-from sqlalchemy import text
+import sys
+import time as time_module
+from sqlalchemy import text, select, insert, update, bindparam
+from table_versions import track_writes
 
-# Creates a connection to database
-engine = init_db()
+# The engine models set up on import, schema and all
 Session = sessionmaker(bind=engine)
+# Seeded rows reach running servers through the shared table versions
+track_writes(Session)
 session = Session()
 
 # Ensure schema quirks (idempotent migrations)
@@ -137,11 +143,21 @@ def ensure_appointment(doctor_id, patient_id, appt_date, appt_time):
     return appt
 
 
-def ensure_room(appt_id, room_type):
+def ensure_clinic_room(name, room_type, capacity):
+    clinic_room = session.query(ClinicRoom).filter(ClinicRoom.Name == name).first()
+    if clinic_room:
+        return clinic_room
+    clinic_room = ClinicRoom(Name=name, room_type=room_type, Capacity=capacity)
+    session.add(clinic_room)
+    session.flush()
+    return clinic_room
+
+
+def ensure_room(appt_id, room_type, room_no=None):
     room = session.query(Room).filter(Room.Appt_ID == appt_id).first()
     if room:
         return room
-    room = Room(Appt_ID=appt_id, room_type=room_type)
+    room = Room(Appt_ID=appt_id, room_type=room_type, Room_No=room_no)
     session.add(room)
     session.flush()
     return room
@@ -220,6 +236,21 @@ def ensure_bill(patient_id, bill_date, cost, paid=None):
     return bill
 
 
+# Map to find appointment by composite values for room linking
+def find_appointment_id(doctor_id, patient_id, appt_date, appt_time):
+    appt = (
+        session.query(Appointment)
+        .filter(
+            Appointment.Doctor_ID == doctor_id,
+            Appointment.Patient_ID == patient_id,
+            Appointment.Date == appt_date,
+            Appointment.Time == appt_time,
+        )
+        .first()
+    )
+    return appt.Appt_ID if appt else None
+
+
 # -----------------------------
 # Loading helpers
 # -----------------------------
@@ -232,7 +263,8 @@ def read_rows(file_name):
     Reads CSV-with-headers from seed_data/<file_name>.
     - Supports .txt or .csv naming (prefers .txt).
     - Ignores empty lines and lines starting with '#'
-    Returns list[dict]. Missing file -> empty list.
+    Yields one dict per row while reading, so large files are never held
+    in memory. Missing file -> no rows.
     """
     candidates = [
         os.path.join(SEED_DIR, f"{file_name}.txt"),
@@ -240,20 +272,15 @@ def read_rows(file_name):
     ]
     path = next((p for p in candidates if os.path.exists(p)), None)
     if not path:
-        return []
+        return
 
-    rows = []
     with open(path, "r", encoding="utf-8-sig", newline="") as fh:
         # Filter comments/blank lines while retaining CSV parsing
-        filtered = [line for line in fh if line.strip() and not line.lstrip().startswith("#")]
-        if not filtered:
-            return []
+        filtered = (line for line in fh if line.strip() and not line.lstrip().startswith("#"))
         reader = csv.DictReader(filtered)
         for raw in reader:
             # strip whitespace from keys/values
-            row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in raw.items() if k is not None}
-            rows.append(row)
-    return rows
+            yield {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in raw.items() if k is not None}
 
 
 def parse_date(value):
@@ -276,181 +303,637 @@ def to_float(value):
     return float(value)
 
 
+def to_int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
 # -----------------------------
-# Seed from files (order matters due to FKs)
+# Seed from files, one row at a time (order matters due to FKs)
 # -----------------------------
-# 1) Users
-for row in read_rows("users"):
-    ensure_user(
-        email=row.get("Email"),
-        password=row.get("Password"),
-        user_type=row.get("User_Type"),
-    )
+def seed_rowwise():
+    # 1) Users
+    for row in read_rows("users"):
+        ensure_user(
+            email=row.get("Email"),
+            password=row.get("Password"),
+            user_type=row.get("User_Type"),
+        )
 
-session.flush()
-
-# Build quick lookup maps by email
-email_to_user = {u.Email: u for u in session.query(User).all()}
-
-# 2) Doctors
-for row in read_rows("doctors"):
-    email = row.get("Email")
-    user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="doctor")
-    email_to_user[email] = user
-    ensure_doctor(
-        user=user,
-        first_name=row.get("First_Name"),
-        last_name=row.get("Last_Name"),
-        specialization=row.get("Specialization"),
-    )
+    session.flush()
 
-# 3) Patients
-for row in read_rows("patients"):
-    email = row.get("Email")
-    user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="patient")
-    email_to_user[email] = user
-    ensure_patient(
-        user=user,
-        first_name=row.get("First_Name"),
-        last_name=row.get("Last_Name"),
-        address=row.get("Address"),
-        phone=row.get("Phone"),
-        condition=row.get("Condition"),
-        admission=parse_date(row.get("Admission_Date")),
-        discharge=parse_date(row.get("Discharge_Date")),
-    )
+    # Build quick lookup maps by email
+    email_to_user = {u.Email: u for u in session.query(User).all()}
+
+    # 2) Doctors
+    for row in read_rows("doctors"):
+        email = row.get("Email")
+        user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="doctor")
+        email_to_user[email] = user
+        ensure_doctor(
+            user=user,
+            first_name=row.get("First_Name"),
+            last_name=row.get("Last_Name"),
+            specialization=row.get("Specialization"),
+        )
 
-# 4) Administrators
-for row in read_rows("administrators"):
-    email = row.get("Email")
-    user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="admin")
-    email_to_user[email] = user
-    ensure_admin(
-        user=user,
-        first_name=row.get("First_Name"),
-        last_name=row.get("Last_Name"),
-        dept_id=None,  # optionally linked after departments
-    )
+    # 3) Patients
+    for row in read_rows("patients"):
+        email = row.get("Email")
+        user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="patient")
+        email_to_user[email] = user
+        ensure_patient(
+            user=user,
+            first_name=row.get("First_Name"),
+            last_name=row.get("Last_Name"),
+            address=row.get("Address"),
+            phone=row.get("Phone"),
+            condition=row.get("Condition"),
+            admission=parse_date(row.get("Admission_Date")),
+            discharge=parse_date(row.get("Discharge_Date")),
+        )
 
-session.flush()
+    # 4) Administrators
+    for row in read_rows("administrators"):
+        email = row.get("Email")
+        user = email_to_user.get(email) or ensure_user(email=email, password=row.get("Password", ""), user_type="admin")
+        email_to_user[email] = user
+        ensure_admin(
+            user=user,
+            first_name=row.get("First_Name"),
+            last_name=row.get("Last_Name"),
+            dept_id=None,  # optionally linked after departments
+        )
 
-# Build role maps
-doctor_email_to_id = {d.user.Email: d.Doctor_ID for d in session.query(Doctor).all() if d.user}
-patient_email_to_id = {p.user.Email: p.Patient_ID for p in session.query(Patient).all() if p.user}
+    session.flush()
 
-# 5) Departments
-for row in read_rows("departments"):
-    doc_email = row.get("Doctor_Email")
-    doc_id = doctor_email_to_id.get(doc_email) if doc_email else None
-    ensure_department(
-        name=row.get("Dept_name") or row.get("Name"),
-        head=row.get("Dept_head") or row.get("Head"),
-        doctor_id=doc_id,
-    )
+    # Build role maps
+    doctor_email_to_id = {d.user.Email: d.Doctor_ID for d in session.query(Doctor).all() if d.user}
+    patient_email_to_id = {p.user.Email: p.Patient_ID for p in session.query(Patient).all() if p.user}
+
+    # 5) Departments
+    for row in read_rows("departments"):
+        doc_email = row.get("Doctor_Email")
+        doc_id = doctor_email_to_id.get(doc_email) if doc_email else None
+        ensure_department(
+            name=row.get("Dept_name") or row.get("Name"),
+            head=row.get("Dept_head") or row.get("Head"),
+            doctor_id=doc_id,
+        )
 
-session.flush()
-
-# Optionally link admins to departments if provided in file
-dept_name_to_dept = {d.Dept_name: d for d in session.query(Department).all()}
-for row in read_rows("administrators"):
-    email = row.get("Email")
-    dept_name = row.get("Dept_name") or row.get("Dept")
-    if not dept_name:
-        continue
-    user = email_to_user.get(email)
-    dept = dept_name_to_dept.get(dept_name)
-    if user and dept:
-        admin = session.query(Administrator).filter(Administrator.Admin_ID == user.User_ID).first()
-        if admin and admin.Dept_ID != dept.Dept_ID:
-            admin.Dept_ID = dept.Dept_ID
-            session.flush()
+    session.flush()
 
-# 6) Appointments
-for row in read_rows("appointments"):
-    doc_email = row.get("Doctor_Email")
-    pat_email = row.get("Patient_Email")
-    d_id = doctor_email_to_id.get(doc_email)
-    p_id = patient_email_to_id.get(pat_email)
-    if not d_id or not p_id:
-        continue
-    appt = ensure_appointment(
-        doctor_id=d_id,
-        patient_id=p_id,
-        appt_date=parse_date(row.get("Date")),
-        appt_time=parse_time(row.get("Time")),
-    )
+    # Optionally link admins to departments if provided in file
+    dept_name_to_dept = {d.Dept_name: d for d in session.query(Department).all()}
+    for row in read_rows("administrators"):
+        email = row.get("Email")
+        dept_name = row.get("Dept_name") or row.get("Dept")
+        if not dept_name:
+            continue
+        user = email_to_user.get(email)
+        dept = dept_name_to_dept.get(dept_name)
+        if user and dept:
+            admin = session.query(Administrator).filter(Administrator.Admin_ID == user.User_ID).first()
+            if admin and admin.Dept_ID != dept.Dept_ID:
+                admin.Dept_ID = dept.Dept_ID
+                session.flush()
+
+    # 6) Appointments
+    for row in read_rows("appointments"):
+        doc_email = row.get("Doctor_Email")
+        pat_email = row.get("Patient_Email")
+        d_id = doctor_email_to_id.get(doc_email)
+        p_id = patient_email_to_id.get(pat_email)
+        if not d_id or not p_id:
+            continue
+        appt = ensure_appointment(
+            doctor_id=d_id,
+            patient_id=p_id,
+            appt_date=parse_date(row.get("Date")),
+            appt_time=parse_time(row.get("Time")),
+        )
 
-# Map to find appointment by composite values for room linking
-def find_appointment_id(doctor_id, patient_id, appt_date, appt_time):
-    appt = (
-        session.query(Appointment)
-        .filter(
-            Appointment.Doctor_ID == doctor_id,
-            Appointment.Patient_ID == patient_id,
-            Appointment.Date == appt_date,
-            Appointment.Time == appt_time,
+    # 7) Clinic rooms
+    for row in read_rows("clinic_rooms"):
+        ensure_clinic_room(
+            name=row.get("Name"),
+            room_type=row.get("room_type") or row.get("Room_Type"),
+            capacity=to_int(row.get("Capacity")) or 1,
         )
-        .first()
-    )
-    return appt.Appt_ID if appt else None
 
-# 7) Rooms
-for row in read_rows("rooms"):
-    doc_email = row.get("Doctor_Email")
-    pat_email = row.get("Patient_Email")
-    d_id = doctor_email_to_id.get(doc_email)
-    p_id = patient_email_to_id.get(pat_email)
-    appt_date = parse_date(row.get("Date"))
-    appt_time = parse_time(row.get("Time"))
-    appt_id = find_appointment_id(d_id, p_id, appt_date, appt_time) if d_id and p_id else None
-    if appt_id:
-        ensure_room(appt_id, row.get("room_type") or row.get("Room_Type"))
-
-# 8) Medical Records
-for row in read_rows("medical_records"):
-    doc_email = row.get("Doctor_Email")
-    pat_email = row.get("Patient_Email")
-    d_id = doctor_email_to_id.get(doc_email)
-    p_id = patient_email_to_id.get(pat_email)
-    if not d_id or not p_id:
-        continue
-    ensure_medical_record(
-        patient_id=p_id,
-        doctor_id=d_id,
-        diagnosis=row.get("Diagnosis"),
-        symptoms=row.get("Symptoms"),
-    )
+    session.flush()
+    clinic_room_ids = dict(session.query(ClinicRoom.Name, ClinicRoom.Room_No))
+
+    # 8) Rooms
+    for row in read_rows("rooms"):
+        doc_email = row.get("Doctor_Email")
+        pat_email = row.get("Patient_Email")
+        d_id = doctor_email_to_id.get(doc_email)
+        p_id = patient_email_to_id.get(pat_email)
+        appt_date = parse_date(row.get("Date"))
+        appt_time = parse_time(row.get("Time"))
+        appt_id = find_appointment_id(d_id, p_id, appt_date, appt_time) if d_id and p_id else None
+        if appt_id:
+            ensure_room(
+                appt_id, row.get("room_type") or row.get("Room_Type"), clinic_room_ids.get(row.get("Room_Name")),
+            )
+
+    # 9) Medical Records
+    for row in read_rows("medical_records"):
+        doc_email = row.get("Doctor_Email")
+        pat_email = row.get("Patient_Email")
+        d_id = doctor_email_to_id.get(doc_email)
+        p_id = patient_email_to_id.get(pat_email)
+        if not d_id or not p_id:
+            continue
+        ensure_medical_record(
+            patient_id=p_id,
+            doctor_id=d_id,
+            diagnosis=row.get("Diagnosis"),
+            symptoms=row.get("Symptoms"),
+        )
 
-# 9) Treatments
-for row in read_rows("treatments"):
-    doc_email = row.get("Doctor_Email")
-    pat_email = row.get("Patient_Email")
-    diagnosis = row.get("Diagnosis")
-    d_id = doctor_email_to_id.get(doc_email)
-    p_id = patient_email_to_id.get(pat_email)
-    if not d_id or not p_id:
-        continue
-    record = ensure_medical_record(p_id, d_id, diagnosis)
-    ensure_treatment(
-        record_id=record.Record_ID,
-        medicine=row.get("Medicine"),
-        prescription=row.get("Prescription") or row.get("Perscription"),
-    )
+    # 10) Treatments
+    for row in read_rows("treatments"):
+        doc_email = row.get("Doctor_Email")
+        pat_email = row.get("Patient_Email")
+        diagnosis = row.get("Diagnosis")
+        d_id = doctor_email_to_id.get(doc_email)
+        p_id = patient_email_to_id.get(pat_email)
+        if not d_id or not p_id:
+            continue
+        record = ensure_medical_record(p_id, d_id, diagnosis)
+        ensure_treatment(
+            record_id=record.Record_ID,
+            medicine=row.get("Medicine"),
+            prescription=row.get("Prescription") or row.get("Perscription"),
+        )
+
+    # 11) Bills
+    for row in read_rows("bills"):
+        pat_email = row.get("Patient_Email")
+        p_id = patient_email_to_id.get(pat_email)
+        if not p_id:
+            continue
+        ensure_bill(
+            patient_id=p_id,
+            bill_date=parse_date(row.get("Date")),
+            cost=to_float(row.get("Cost")),
+            paid=row.get("Paid"),
+        )
+
+    # Save all
+    session.commit()
 
-# 10) Bills
-for row in read_rows("bills"):
-    pat_email = row.get("Patient_Email")
-    p_id = patient_email_to_id.get(pat_email)
-    if not p_id:
-        continue
-    ensure_bill(
-        patient_id=p_id,
-        bill_date=parse_date(row.get("Date")),
-        cost=to_float(row.get("Cost")),
-        paid=row.get("Paid"),
-    )
 
 # -----------------------------
-# Save all
+# Bulk loader (--bulk): streams each file once, checks existing keys
+# against in-memory sets/maps and inserts with executemany in batches,
+# one transaction per table. Skips exactly what seed_rowwise() would skip.
 # -----------------------------
-session.commit()
+DEFAULT_BATCH_SIZE = 5000
+
+users_t = User.__table__
+doctors_t = Doctor.__table__
+patients_t = Patient.__table__
+admins_t = Administrator.__table__
+departments_t = Department.__table__
+appointments_t = Appointment.__table__
+clinic_rooms_t = ClinicRoom.__table__
+rooms_t = Room.__table__
+records_t = MedicalRecord.__table__
+treatments_t = Treatment.__table__
+bills_t = Bill.__table__
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Seconds between progress lines when stderr is not a terminal (a log file or pipe)
+PROGRESS_INTERVAL = 10.0
+
+
+class Progress:
+    """
+    Running per-table counts on stderr. On a terminal one line is rewritten
+    after every batch; elsewhere a full line is printed every
+    PROGRESS_INTERVAL seconds, and once more when the table is done.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.started = self.printed = time_module.perf_counter()
+        self.live = sys.stderr.isatty()
+
+    def report(self, final=False):
+        now = time_module.perf_counter()
+        if not (final or self.live or now - self.printed >= PROGRESS_INTERVAL):
+            return
+        self.printed = now
+        elapsed = now - self.started
+        rate = self.read / elapsed if elapsed > 0 else 0
+        line = (
+            f"{self.table:<16} read {self.read:>10,}  inserted {self.inserted:>10,}  "
+            f"updated {self.updated:>8,}  {rate:>10,.0f} rows/s"
+        )
+        print(
+            "\r" + line if self.live else line,
+            end="\n" if final or not self.live else "",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def insert_rows(conn, table, rows, returning=None):
+    """executemany INSERT; with `returning`, gives back those columns in row order."""
+    if not rows:
+        return []
+    if returning is None:
+        conn.execute(insert(table), rows)
+        return []
+    return conn.execute(insert(table).returning(*returning, sort_by_parameter_order=True), rows).all()
+
+
+def add_missing_users(conn, batch, email_to_id, default_type):
+    """Creates users for emails in the batch that do not exist yet; returns how many."""
+    new_users = {}
+    for row in batch:
+        email = row.get("Email")
+        if email in email_to_id or email in new_users:
+            continue
+        if default_type is None:
+            new_users[email] = {"Email": email, "Password": row.get("Password"), "User_Type": row.get("User_Type")}
+        else:
+            new_users[email] = {"Email": email, "Password": row.get("Password", ""), "User_Type": default_type}
+    rows = list(new_users.values())
+    for user_id, email in insert_rows(conn, users_t, rows, returning=(users_t.c.User_ID, users_t.c.Email)):
+        email_to_id[email] = user_id
+    return len(rows)
+
+
+def bulk_users(batch_size, email_to_id):
+    progress = Progress("users")
+    with engine.begin() as conn:
+        for batch in batched(read_rows("users"), batch_size):
+            progress.read += len(batch)
+            progress.inserted += add_missing_users(conn, batch, email_to_id, default_type=None)
+            progress.report()
+    progress.report(final=True)
+
+
+def bulk_profiles(batch_size, email_to_id, file_name, table, id_column, user_type, build):
+    """Doctors, patients and administrators: one profile row per user, keyed by user id."""
+    progress = Progress(file_name)
+    with engine.begin() as conn:
+        existing = set(conn.scalars(select(id_column)))
+        for batch in batched(read_rows(file_name), batch_size):
+            progress.read += len(batch)
+            add_missing_users(conn, batch, email_to_id, default_type=user_type)
+            rows = []
+            for row in batch:
+                user_id = email_to_id[row.get("Email")]
+                if user_id in existing:
+                    continue
+                existing.add(user_id)
+                rows.append(build(user_id, row))
+            insert_rows(conn, table, rows)
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+
+
+def build_doctor(user_id, row):
+    return {
+        "Doctor_ID": user_id,
+        "First_Name": row.get("First_Name"),
+        "Last_Name": row.get("Last_Name"),
+        "Specialization": row.get("Specialization"),
+    }
+
+
+def build_patient(user_id, row):
+    return {
+        "Patient_ID": user_id,
+        "First_Name": row.get("First_Name"),
+        "Last_Name": row.get("Last_Name"),
+        "Address": row.get("Address"),
+        "Phone": row.get("Phone"),
+        "Admission_Date": parse_date(row.get("Admission_Date")),
+        "Discharge_Date": parse_date(row.get("Discharge_Date")),
+        "Condition": row.get("Condition"),
+    }
+
+
+def build_admin(user_id, row):
+    # Departments are linked in a later pass, like seed_rowwise()
+    return {
+        "Admin_ID": user_id,
+        "First_Name": row.get("First_Name"),
+        "Last_Name": row.get("Last_Name"),
+        "Dept_ID": None,
+    }
+
+
+def email_map(profile_id_column):
+    """email -> profile id for doctors or patients, in one join."""
+    with engine.connect() as conn:
+        return dict(conn.execute(
+            select(users_t.c.Email, profile_id_column).join(users_t, users_t.c.User_ID == profile_id_column)
+        ).all())
+
+
+def bulk_departments(batch_size, doctor_email_to_id):
+    progress = Progress("departments")
+    with engine.begin() as conn:
+        existing = set(conn.scalars(select(departments_t.c.Dept_name)))
+        for batch in batched(read_rows("departments"), batch_size):
+            progress.read += len(batch)
+            rows = []
+            for row in batch:
+                name = row.get("Dept_name") or row.get("Name")
+                if name in existing:
+                    continue
+                existing.add(name)
+                doc_email = row.get("Doctor_Email")
+                rows.append({
+                    "Dept_name": name,
+                    "Dept_head": row.get("Dept_head") or row.get("Head"),
+                    "Doctor_ID": doctor_email_to_id.get(doc_email) if doc_email else None,
+                })
+            insert_rows(conn, departments_t, rows)
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+
+
+def bulk_link_admin_departments(batch_size, email_to_id):
+    progress = Progress("admin depts")
+    with engine.begin() as conn:
+        dept_name_to_id = dict(conn.execute(select(departments_t.c.Dept_name, departments_t.c.Dept_ID)).all())
+        admin_dept = dict(conn.execute(select(admins_t.c.Admin_ID, admins_t.c.Dept_ID)).all())
+        stmt = (
+            update(admins_t)
+            .where(admins_t.c.Admin_ID == bindparam("admin_id"))
+            .values(Dept_ID=bindparam("dept_id"))
+        )
+        for batch in batched(read_rows("administrators"), batch_size):
+            progress.read += len(batch)
+            changes = []
+            for row in batch:
+                dept_id = dept_name_to_id.get(row.get("Dept_name") or row.get("Dept"))
+                admin_id = email_to_id.get(row.get("Email"))
+                if dept_id is None or admin_id not in admin_dept or admin_dept[admin_id] == dept_id:
+                    continue
+                admin_dept[admin_id] = dept_id
+                changes.append({"admin_id": admin_id, "dept_id": dept_id})
+            if changes:
+                conn.execute(stmt, changes)
+            progress.updated += len(changes)
+            progress.report()
+    progress.report(final=True)
+
+
+def appointment_key(row, doctor_email_to_id, patient_email_to_id):
+    d_id = doctor_email_to_id.get(row.get("Doctor_Email"))
+    p_id = patient_email_to_id.get(row.get("Patient_Email"))
+    if not d_id or not p_id:
+        return None
+    return (d_id, p_id, parse_date(row.get("Date")), parse_time(row.get("Time")))
+
+
+def bulk_appointments(batch_size, doctor_email_to_id, patient_email_to_id):
+    """Returns (doctor, patient, date, time) -> Appt_ID for room linking."""
+    progress = Progress("appointments")
+    columns = (appointments_t.c.Doctor_ID, appointments_t.c.Patient_ID, appointments_t.c.Date, appointments_t.c.Time)
+    with engine.begin() as conn:
+        key_to_id = {}
+        for d_id, p_id, appt_date, appt_time, appt_id in conn.execute(select(*columns, appointments_t.c.Appt_ID)):
+            key_to_id.setdefault((d_id, p_id, appt_date, appt_time), appt_id)
+        for batch in batched(read_rows("appointments"), batch_size):
+            progress.read += len(batch)
+            new_keys = []
+            for row in batch:
+                key = appointment_key(row, doctor_email_to_id, patient_email_to_id)
+                if key is None or key in key_to_id:
+                    continue
+                key_to_id[key] = None
+                new_keys.append(key)
+            rows = [{"Doctor_ID": k[0], "Patient_ID": k[1], "Date": k[2], "Time": k[3]} for k in new_keys]
+            for key, (appt_id,) in zip(new_keys, insert_rows(conn, appointments_t, rows, returning=(appointments_t.c.Appt_ID,))):
+                key_to_id[key] = appt_id
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+    return key_to_id
+
+
+def bulk_clinic_rooms(batch_size):
+    """Returns clinic room name -> Room_No for room linking."""
+    progress = Progress("clinic_rooms")
+    with engine.begin() as conn:
+        name_to_id = dict(conn.execute(select(clinic_rooms_t.c.Name, clinic_rooms_t.c.Room_No)).all())
+        for batch in batched(read_rows("clinic_rooms"), batch_size):
+            progress.read += len(batch)
+            rows = []
+            for row in batch:
+                name = row.get("Name")
+                if name in name_to_id:
+                    continue
+                name_to_id[name] = None
+                rows.append({
+                    "Name": name,
+                    "room_type": row.get("room_type") or row.get("Room_Type"),
+                    "Capacity": to_int(row.get("Capacity")) or 1,
+                })
+            returned = insert_rows(conn, clinic_rooms_t, rows, returning=(clinic_rooms_t.c.Room_No,))
+            for row, (room_no,) in zip(rows, returned):
+                name_to_id[row["Name"]] = room_no
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+    return name_to_id
+
+
+def bulk_rooms(batch_size, doctor_email_to_id, patient_email_to_id, appointment_ids, clinic_room_ids):
+    progress = Progress("rooms")
+    with engine.begin() as conn:
+        has_room = set(conn.scalars(select(rooms_t.c.Appt_ID)))
+        for batch in batched(read_rows("rooms"), batch_size):
+            progress.read += len(batch)
+            rows = []
+            for row in batch:
+                key = appointment_key(row, doctor_email_to_id, patient_email_to_id)
+                appt_id = appointment_ids.get(key) if key else None
+                if not appt_id or appt_id in has_room:
+                    continue
+                has_room.add(appt_id)
+                rows.append({
+                    "Appt_ID": appt_id,
+                    "room_type": row.get("room_type") or row.get("Room_Type"),
+                    "Room_No": clinic_room_ids.get(row.get("Room_Name")),
+                })
+            insert_rows(conn, rooms_t, rows)
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+
+
+def load_medical_records(conn):
+    """(patient, doctor, diagnosis) -> [Record_ID, Symptoms], first record per key."""
+    records = {}
+    query = select(records_t.c.Patient_ID, records_t.c.Doctor_ID, records_t.c.Diagnosis, records_t.c.Record_ID, records_t.c.Symptoms)
+    for p_id, d_id, diagnosis, record_id, symptoms in conn.execute(query.order_by(records_t.c.Record_ID)):
+        records.setdefault((p_id, d_id, diagnosis), [record_id, symptoms])
+    return records
+
+
+def insert_medical_records(conn, pending, records):
+    """Inserts {key: symptoms} and records the new ids; returns how many."""
+    keys = list(pending)
+    rows = [{"Patient_ID": k[0], "Doctor_ID": k[1], "Diagnosis": k[2], "Symptoms": pending[k]} for k in keys]
+    for key, (record_id,) in zip(keys, insert_rows(conn, records_t, rows, returning=(records_t.c.Record_ID,))):
+        records[key] = [record_id, pending[key]]
+    return len(rows)
+
+
+def bulk_medical_records(batch_size, doctor_email_to_id, patient_email_to_id):
+    progress = Progress("medical_records")
+    backfill = (
+        update(records_t)
+        .where(records_t.c.Record_ID == bindparam("record_id"))
+        .values(Symptoms=bindparam("symptoms"))
+    )
+    with engine.begin() as conn:
+        records = load_medical_records(conn)
+        for batch in batched(read_rows("medical_records"), batch_size):
+            progress.read += len(batch)
+            pending = {}
+            backfills = {}
+            for row in batch:
+                d_id = doctor_email_to_id.get(row.get("Doctor_Email"))
+                p_id = patient_email_to_id.get(row.get("Patient_Email"))
+                if not d_id or not p_id:
+                    continue
+                key = (p_id, d_id, row.get("Diagnosis"))
+                symptoms = row.get("Symptoms")
+                if key in pending:
+                    # Backfill symptoms if missing
+                    if symptoms and not pending[key]:
+                        pending[key] = symptoms
+                elif key in records:
+                    if symptoms and not records[key][1]:
+                        records[key][1] = symptoms
+                        backfills[records[key][0]] = symptoms
+                else:
+                    pending[key] = symptoms
+            progress.inserted += insert_medical_records(conn, pending, records)
+            if backfills:
+                conn.execute(backfill, [{"record_id": r, "symptoms": s} for r, s in backfills.items()])
+            progress.updated += len(backfills)
+            progress.report()
+    progress.report(final=True)
+
+
+def bulk_treatments(batch_size, doctor_email_to_id, patient_email_to_id):
+    progress = Progress("treatments")
+    with engine.begin() as conn:
+        records = load_medical_records(conn)
+        existing = set(conn.execute(
+            select(treatments_t.c.Record_ID, treatments_t.c.Medicine, treatments_t.c.Prescription)
+        ).all())
+        for batch in batched(read_rows("treatments"), batch_size):
+            progress.read += len(batch)
+            wanted = []
+            missing_records = {}
+            for row in batch:
+                d_id = doctor_email_to_id.get(row.get("Doctor_Email"))
+                p_id = patient_email_to_id.get(row.get("Patient_Email"))
+                if not d_id or not p_id:
+                    continue
+                record_key = (p_id, d_id, row.get("Diagnosis"))
+                if record_key not in records:
+                    missing_records[record_key] = None
+                wanted.append((record_key, row.get("Medicine"), row.get("Prescription") or row.get("Perscription")))
+            # Treatments can reference a diagnosis that has no record yet
+            insert_medical_records(conn, missing_records, records)
+            rows = []
+            for record_key, medicine, prescription in wanted:
+                key = (records[record_key][0], medicine, prescription)
+                if key in existing:
+                    continue
+                existing.add(key)
+                rows.append({"Record_ID": key[0], "Medicine": medicine, "Prescription": prescription})
+            insert_rows(conn, treatments_t, rows)
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+
+
+def bulk_bills(batch_size, patient_email_to_id):
+    progress = Progress("bills")
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(bills_t.c.Patient_ID, bills_t.c.Date, bills_t.c.Cost)).all())
+        for batch in batched(read_rows("bills"), batch_size):
+            progress.read += len(batch)
+            rows = []
+            for row in batch:
+                p_id = patient_email_to_id.get(row.get("Patient_Email"))
+                if not p_id:
+                    continue
+                key = (p_id, parse_date(row.get("Date")), to_float(row.get("Cost")))
+                if key in existing:
+                    continue
+                existing.add(key)
+                rows.append({"Patient_ID": key[0], "Date": key[1], "Cost": key[2], "Paid": row.get("Paid")})
+            insert_rows(conn, bills_t, rows)
+            progress.inserted += len(rows)
+            progress.report()
+    progress.report(final=True)
+
+
+def seed_bulk(batch_size=DEFAULT_BATCH_SIZE):
+    with engine.connect() as conn:
+        email_to_id = dict(conn.execute(select(users_t.c.Email, users_t.c.User_ID)).all())
+
+    bulk_users(batch_size, email_to_id)
+    bulk_profiles(batch_size, email_to_id, "doctors", doctors_t, doctors_t.c.Doctor_ID, "doctor", build_doctor)
+    bulk_profiles(batch_size, email_to_id, "patients", patients_t, patients_t.c.Patient_ID, "patient", build_patient)
+    bulk_profiles(batch_size, email_to_id, "administrators", admins_t, admins_t.c.Admin_ID, "admin", build_admin)
+
+    doctor_email_to_id = email_map(doctors_t.c.Doctor_ID)
+    patient_email_to_id = email_map(patients_t.c.Patient_ID)
+
+    bulk_departments(batch_size, doctor_email_to_id)
+    bulk_link_admin_departments(batch_size, email_to_id)
+    appointment_ids = bulk_appointments(batch_size, doctor_email_to_id, patient_email_to_id)
+    clinic_room_ids = bulk_clinic_rooms(batch_size)
+    bulk_rooms(batch_size, doctor_email_to_id, patient_email_to_id, appointment_ids, clinic_room_ids)
+    del appointment_ids
+    bulk_medical_records(batch_size, doctor_email_to_id, patient_email_to_id)
+    bulk_treatments(batch_size, doctor_email_to_id, patient_email_to_id)
+    bulk_bills(batch_size, patient_email_to_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed hospital.db from the files in seed_data/.")
+    parser.add_argument("--bulk", action="store_true", help="stream files and insert in batches (for large datasets)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per INSERT batch in --bulk mode")
+    parser.add_argument("--seed-dir", default=SEED_DIR, help="directory holding the seed files")
+    args = parser.parse_args()
+    SEED_DIR = args.seed_dir
+    if args.bulk:
+        seed_bulk(args.batch_size)
+    else:
+        seed_rowwise()
@@ -0,0 +1,130 @@
+from sqlalchemy import Date, Time
+from models import (
+    User, Patient, Doctor, Administrator, Appointment, ClinicRoom, Room, Treatment, Bill, MedicalRecord, Department,
+)
+
+
+class FieldSpec:
+    """
+    The columns an API endpoint exposes, as (json_key, column) pairs in output order.
+    Queries select just these columns, so rows come back as plain tuples
+    instead of fully hydrated ORM entities.
+    """
+
+    def __init__(self, id_column, fields):
+        self.id_column = id_column
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = tuple(column for _, column in fields)
+        # Positions of DATE/TIME columns, which JSON needs as strings
+        self.temporal = tuple(
+            i for i, column in enumerate(self.columns) if isinstance(column.type, (Date, Time))
+        )
+
+    def query(self, db_session):
+        return db_session.query(*self.columns)
+
+    def serialize(self, row):
+        if not self.temporal:
+            return dict(zip(self.keys, row))
+        values = list(row)
+        for i in self.temporal:
+            if values[i] is not None:
+                values[i] = str(values[i])
+        return dict(zip(self.keys, values))
+
+    def serialize_entity(self, obj):
+        """Same output for an already loaded ORM entity."""
+        return self.serialize(tuple(getattr(obj, column.key) for column in self.columns))
+
+
+PATIENT_FIELDS = FieldSpec(Patient.Patient_ID, (
+    ("Patient_ID", Patient.Patient_ID),
+    ("First_Name", Patient.First_Name),
+    ("Last_Name", Patient.Last_Name),
+))
+
+# Demographics, for a single patient's chart
+PATIENT_DETAIL_FIELDS = FieldSpec(Patient.Patient_ID, (
+    ("Patient_ID", Patient.Patient_ID),
+    ("First_Name", Patient.First_Name),
+    ("Last_Name", Patient.Last_Name),
+    ("Address", Patient.Address),
+    ("Phone", Patient.Phone),
+    ("Admission_Date", Patient.Admission_Date),
+    ("Discharge_Date", Patient.Discharge_Date),
+    ("Condition", Patient.Condition),
+))
+
+DOCTOR_FIELDS = FieldSpec(Doctor.Doctor_ID, (
+    ("Doctor_ID", Doctor.Doctor_ID),
+    ("First_Name", Doctor.First_Name),
+    ("Last_Name", Doctor.Last_Name),
+    ("Specialization", Doctor.Specialization),
+))
+
+APPOINTMENT_FIELDS = FieldSpec(Appointment.Appt_ID, (
+    ("Appt_ID", Appointment.Appt_ID),
+    ("Doctor_ID", Appointment.Doctor_ID),
+    ("Patient_ID", Appointment.Patient_ID),
+    ("Date", Appointment.Date),
+    ("Time", Appointment.Time),
+    ("Duration", Appointment.Duration),
+))
+
+ROOM_FIELDS = FieldSpec(Room.Room_ID, (
+    ("Room_ID", Room.Room_ID),
+    ("Appt_ID", Room.Appt_ID),
+    ("room_type", Room.room_type),
+    ("Room_No", Room.Room_No),
+))
+
+CLINIC_ROOM_FIELDS = FieldSpec(ClinicRoom.Room_No, (
+    ("Room_No", ClinicRoom.Room_No),
+    ("Name", ClinicRoom.Name),
+    ("room_type", ClinicRoom.room_type),
+    ("Capacity", ClinicRoom.Capacity),
+))
+
+# Note: frontend expects 'Perscription' (misspelling), so we output that key
+TREATMENT_FIELDS = FieldSpec(Treatment.Treatment_ID, (
+    ("Treatment_ID", Treatment.Treatment_ID),
+    ("Medicine", Treatment.Medicine),
+    ("Perscription", Treatment.Prescription),
+))
+
+USER_FIELDS = FieldSpec(User.User_ID, (
+    ("User_ID", User.User_ID),
+    ("Email", User.Email),
+    ("User_Type", User.User_Type),
+    ("Password", User.Password),
+))
+
+ADMINISTRATOR_FIELDS = FieldSpec(Administrator.Admin_ID, (
+    ("Admin_ID", Administrator.Admin_ID),
+    ("First_Name", Administrator.First_Name),
+    ("Last_Name", Administrator.Last_Name),
+    ("Dept_ID", Administrator.Dept_ID),
+))
+
+DEPARTMENT_FIELDS = FieldSpec(Department.Dept_ID, (
+    ("Dept_ID", Department.Dept_ID),
+    ("Dept_name", Department.Dept_name),
+    ("Dept_head", Department.Dept_head),
+    ("Doctor_ID", Department.Doctor_ID),
+))
+
+MEDICAL_RECORD_FIELDS = FieldSpec(MedicalRecord.Record_ID, (
+    ("Record_ID", MedicalRecord.Record_ID),
+    ("Patient_ID", MedicalRecord.Patient_ID),
+    ("Doctor_ID", MedicalRecord.Doctor_ID),
+    ("Symptoms", MedicalRecord.Symptoms),
+    ("Diagnosis", MedicalRecord.Diagnosis),
+))
+
+BILL_FIELDS = FieldSpec(Bill.Payment_ID, (
+    ("Payment_ID", Bill.Payment_ID),
+    ("Patient_ID", Bill.Patient_ID),
+    ("Date", Bill.Date),
+    ("Cost", Bill.Cost),
+    ("Paid", Bill.Paid),
+))
@@ -30,6 +30,13 @@ function filterList() {
   });
 }
 
+// --- full-table API reads ---
+// List endpoints are paged; ?format=json streams the whole table instead,
+// which is what the records view needs.
+function fetchTable(url) {
+  return fetch(`${url}?format=json`).then(r => r.json());
+}
+
 // --- table builder --- 
 function buildTable(columns, data) {
   const header = document.getElementById("tableHeader");
@@ -178,7 +185,7 @@ function DisplayRecords(type){
           {key: "Email", label: "Email"},
           {key: "User_Type", label: "Type"}
         ];
-        fetch("/api/users").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/users").then(data => buildTable(columns, data));
         break;
       case "Administrators":
         columns = [
@@ -187,7 +194,7 @@ function DisplayRecords(type){
           {key: "Last_Name", label: "Last Name"},
           {key: "Dept_ID", label: "Department"}
         ];
-        fetch("/api/administrators").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/administrators").then(data => buildTable(columns, data));
         break;
       case "Departments":
         columns = [
@@ -196,7 +203,7 @@ function DisplayRecords(type){
           {key: "Dept_head", label: "Head"},
           {key: "Doctor_ID", label: "Doctor ID"}
         ];
-        fetch("/api/departments").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/departments").then(data => buildTable(columns, data));
         break;
     case "MedicalRecords":
         columns = [
@@ -206,7 +213,7 @@ function DisplayRecords(type){
           {key: "Symptoms", label: "Symptoms"},
           {key: "Diagnosis", label: "Diagnosis"}
         ];
-        fetch("/api/medical_records").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/medical_records").then(data => buildTable(columns, data));
         break;
     case "Bills":
         columns = [
@@ -216,7 +223,7 @@ function DisplayRecords(type){
           {key: "Cost", label: "Cost"},
           {key: "Paid", label: "Paid"}
         ];
-        fetch("/api/bills").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/bills").then(data => buildTable(columns, data));
         break;
     case "Treatments":
         columns = [
@@ -224,7 +231,7 @@ function DisplayRecords(type){
           {key: "Medicine", label: "Medicine"},
           {key: "Perscription", label: "Perscription"}
         ];
-        fetch("/api/treatments").then(r => r.json()).then(data => buildTable(columns, data));
+        fetchTable("/api/treatments").then(data => buildTable(columns, data));
         break;
   case "Rooms":
     columns = [
@@ -232,7 +239,7 @@ function DisplayRecords(type){
       { key: "Appt_ID", label: "Appointment" },
       { key: "room_type", label: "Type" }
     ];
-    fetch("/api/rooms").then(r => r.json()).then(data => buildTable(columns, data));
+    fetchTable("/api/rooms").then(data => buildTable(columns, data));
     break;
   case "Appointments":
     columns = [
@@ -242,7 +249,7 @@ function DisplayRecords(type){
       { key: "Date", label: "Date" },
       { key: "Time", label: "Time" }
     ];
-    fetch("/api/appointments").then(r => r.json()).then(data => buildTable(columns, data));
+    fetchTable("/api/appointments").then(data => buildTable(columns, data));
     break;
   case "Doctors":
     columns = [
@@ -251,7 +258,7 @@ function DisplayRecords(type){
       { key: "Last_Name", label: "Last Name" },
       { key: "Specialization", label: "Specialization" }
     ];
-    fetch("/api/doctors").then(r => r.json()).then(data => buildTable(columns, data));
+    fetchTable("/api/doctors").then(data => buildTable(columns, data));
     break;
 
   case "Patients":
@@ -260,7 +267,7 @@ function DisplayRecords(type){
         { key: "First_Name", label: "First Name" },
         { key: "Last_Name", label: "Last Name" }
       ];
-      fetch("/api/patients").then(r => r.json()).then(data => buildTable(columns, data));
+      fetchTable("/api/patients").then(data => buildTable(columns, data));
       break;
   }
 
@@ -0,0 +1,113 @@
+from sqlalchemy import bindparam, update
+from models import VERSIONED_TABLES, TableVersion
+from write_tracking import pending_writes, write_tracker
+
+# Per-table write counters used to build ETags for GET endpoints and to
+# expire the per-process caches. They live in the table_version table, so
+# all processes and scripts writing the database see the same versions.
+# Each transaction of a tracked session bumps the versions of the tables it
+# writes once, at its first write to them (see track_writes); anything
+# writing the file another way bumps the rows itself.
+#
+# Every commit of this process's tracked sessions is handed to the caches
+# with its (version before -> version after) per table, so a cache that
+# applies this process's writes itself can tell them from anyone else's.
+
+# The table is a dozen rows; reading all of them as plain SQL is cheaper than building a filtered ORM query
+ALL_VERSIONS_SQL = "SELECT Table_Name, Version FROM table_version"
+
+
+def all_versions(db_session):
+    """
+    {table: version} of every table as the session's transaction sees it.
+    The table is read once per transaction; this transaction's own bumps
+    are added on top.
+    """
+    connection = db_session.connection()
+    transaction = connection.get_transaction()
+    cached = db_session.info.get("versions")
+    if cached is not None and cached[0] is transaction:
+        current = cached[1]
+    else:
+        current = dict(connection.exec_driver_sql(ALL_VERSIONS_SQL).fetchall())
+        db_session.info["versions"] = (transaction, current)
+    writes = pending_writes(db_session)
+    if writes is not None and writes.versions:
+        current = current | {table: after for table, (_, after) in writes.versions.items()}
+    return current
+
+
+def versions(db_session, tables, current=None):
+    """Current versions of `tables`, in order; `current` is an all_versions() result to reuse."""
+    if current is None:
+        current = all_versions(db_session)
+    return tuple(current.get(table, 0) for table in tables)
+
+
+def etag_for(db_session, *tables):
+    """ETag for a response built from the given tables; changes on any committed write to them."""
+    return "-".join(f"{table}.{current}" for table, current in zip(tables, versions(db_session, tables)))
+
+
+class VersionWatch:
+    """
+    Tells a per-process cache when the tables it is built from were written
+    by another process (or by a session of this one that is not tracked).
+    Use it under the cache's own lock.
+    """
+
+    def __init__(self, *tables):
+        self.tables = tables
+        self.seen = None
+
+    def reset(self):
+        self.seen = None
+
+    def foreign_writes(self, db_session, current=None):
+        """
+        True if anything but this process's tracked commits wrote the tables
+        since the last call (and on the first call); remembers the current
+        versions either way. Call it before reading the tables.
+        """
+        current = versions(db_session, self.tables, current)
+        seen, self.seen = self.seen, current
+        return seen != current
+
+    def committed(self, steps):
+        """
+        Follows a commit of this process the cache has applied; `steps` is
+        {table: (version before, version after)}. A table last seen at
+        another version than `before` was also written elsewhere and stays
+        behind, so the next check reports it.
+        """
+        if self.seen is None:
+            return
+        self.seen = tuple(
+            steps[table][1] if table in steps and steps[table][0] == seen else seen
+            for table, seen in zip(self.tables, self.seen)
+        )
+
+
+# Built once: a flush is not the place to build and compile a statement
+BUMP_VERSIONS = (
+    update(TableVersion.__table__)
+    .where(TableVersion.__table__.c.Table_Name.in_(bindparam("tables", expanding=True)))
+    .values(Version=TableVersion.__table__.c.Version + 1)
+    .returning(TableVersion.__table__.c.Table_Name, TableVersion.__table__.c.Version)
+)
+
+
+def _bump_written(session, writes):
+    """Bumps the versions of the tables the transaction has written and not bumped yet."""
+    tables = [table for table in VERSIONED_TABLES if table in writes.tables and table not in writes.versions]
+    if not tables:
+        return
+    # The write lock is held from the first write on, so nobody can commit
+    # between the version this reads and the one it writes
+    for table, after in session.connection().execute(BUMP_VERSIONS, {"tables": tables}):
+        writes.versions[table] = (after - 1, after)
+
+
+def track_writes(session_factory):
+    """Makes every transaction of the factory's sessions bump the versions of the tables it writes."""
+    write_tracker(session_factory).after_write(_bump_written)
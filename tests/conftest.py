@@ -0,0 +1,63 @@
+"""
+Fixtures shared by the tests: a small generated database, built once per
+session, and a scratch copy of it per test that the app is bound to.
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The app binds an engine on import; keep that one off any real database
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import generate_dataset
+import models
+from app import PROCESS_INDEXES
+
+# Large enough for SQLite to plan the queries as it would on a real database
+# (see test_query_plans); the same shape as bench_routes at 20000
+DATASET = dict(admins=5, doctors=15, patients=2000, appointments=20000)
+
+
+@pytest.fixture(scope="session")
+def layout():
+    return generate_dataset.Layout(DATASET["admins"], DATASET["doctors"], DATASET["patients"])
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    path = tmp_path_factory.mktemp("dataset") / "hospital.db"
+    generate_dataset.generate(generate_dataset.parse_args([
+        "--format", "sqlite",
+        "--out", str(path),
+        "--workers", "1",
+        "--admins", str(DATASET["admins"]),
+        "--doctors", str(DATASET["doctors"]),
+        "--patients", str(DATASET["patients"]),
+        "--appointments", str(DATASET["appointments"]),
+        "--rooms", str(DATASET["appointments"] // 4),
+        "--records", str(DATASET["appointments"] // 4),
+        "--treatments", str(DATASET["appointments"] // 3),
+        "--bills", str(DATASET["appointments"] // 5),
+    ]))
+    # Bring it up to the current schema once, rather than in every copy
+    models.init_db(f"sqlite:///{path}").dispose()
+    return path
+
+
+@pytest.fixture
+def db_path(dataset, tmp_path):
+    """A scratch copy of the dataset, with the app's sessions and indexes pointed at it."""
+    path = tmp_path / "hospital.db"
+    shutil.copyfile(dataset, path)
+    models.session.remove()
+    engine = models.init_db(f"sqlite:///{path}")
+    models.Session.configure(bind=engine)
+    for index in PROCESS_INDEXES:
+        index.reset()
+    yield path
+    models.session.remove()
+    engine.dispose()
@@ -0,0 +1,75 @@
+from datetime import date, time, timedelta
+
+from sqlalchemy import insert, update
+
+import models
+from batch_scheduling import schedule_batch
+from models import Appointment, Doctor
+from scheduling import SLOT_HOURS
+
+# Far past the generated appointments, so every doctor starts with no upcoming load
+TODAY = date(2040, 1, 2)
+DAY = TODAY + timedelta(days=5)
+
+
+def book(rows):
+    models.session.execute(insert(Appointment), [
+        {"Doctor_ID": doctor_id, "Patient_ID": patient_id, "Date": day, "Time": time(hour, 0)}
+        for doctor_id, patient_id, day, hour in rows
+    ])
+    models.session.commit()
+
+
+def specialize(doctor_ids, specialization):
+    models.session.execute(
+        update(Doctor).where(Doctor.Doctor_ID.in_(doctor_ids)).values(Specialization=specialization)
+    )
+    models.session.commit()
+
+
+def request(patient_id, specialization, days, **extra):
+    return {
+        "Patient_ID": patient_id, "Specialization": specialization,
+        "From": DAY.isoformat(), "To": (DAY + timedelta(days=days)).isoformat(), **extra,
+    }
+
+
+def test_batch_moves_bookings_off_the_doctor_the_first_pass_overloaded(db_path, layout):
+    first, second = layout.doctor_id(0), layout.doctor_id(1)
+    specialize([first, second], "Test Batch")
+    # Eight upcoming appointments each: the second doctor's fill DAY
+    book([(first, layout.patient_id(100), DAY + timedelta(days=20), hour) for hour in SLOT_HOURS])
+    book([(second, layout.patient_id(101), DAY, hour) for hour in SLOT_HOURS])
+    # Patients 2 and 3 are busy on the two days after DAY, so only the first doctor fits them
+    for n, doctor_id in ((2, layout.doctor_id(2)), (3, layout.doctor_id(3))):
+        book([
+            (doctor_id, layout.patient_id(n), DAY + timedelta(days=offset), hour)
+            for offset in (1, 2) for hour in SLOT_HOURS
+        ])
+
+    # The first pass places the shorter windows first: one of them lands on
+    # the first doctor, who then also has to take both narrow patients
+    results = schedule_batch(models.session, [
+        request(layout.patient_id(0), "Test Batch", 1),
+        request(layout.patient_id(1), "Test Batch", 1),
+        request(layout.patient_id(2), "Test Batch", 2),
+        request(layout.patient_id(3), "Test Batch", 2),
+    ], today=TODAY, dry_run=True)
+
+    assert [result["status"] for result in results] == ["planned"] * 4
+    assert [result["Doctor_ID"] for result in results] == [second, second, first, first]
+
+
+def test_batch_books_the_whole_duration(db_path, layout):
+    doctor_id = layout.doctor_id(4)
+    specialize([doctor_id], "Test Long")
+    book([(doctor_id, layout.patient_id(200), DAY, hour) for hour in (9, 11)])
+
+    items = [request(layout.patient_id(4), "Test Long", 0, Duration="120")]
+    planned, = schedule_batch(models.session, items, today=TODAY, dry_run=True)
+    assert (planned["Date"], planned["Time"], planned["Duration"]) == (DAY.isoformat(), "12:00", 120)
+
+    created, = schedule_batch(models.session, items, today=TODAY)
+    assert created["status"] == "created"
+    appt = models.session.get(Appointment, created["Appt_ID"])
+    assert (appt.Time, appt.Duration) == (time(12, 0), 120)
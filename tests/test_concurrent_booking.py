@@ -0,0 +1,107 @@
+"""
+Auto-bookings fired from several processes at once, each with its own
+engine, session and in-memory indexes as under a multi-process server.
+"""
+import multiprocessing
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+import models
+from app import app
+from models import APPT_END_SQL, APPT_START_SQL
+from scheduling import BOOKING_LEAD_DAYS, MAX_DAYS_AHEAD, SLOT_HOURS
+
+WORKERS = 4
+
+
+def book(path, emails, query, barrier, results):
+    """Worker: logs every patient in, waits for the others, then auto-books once per patient."""
+    models.session.remove()
+    models.Session.configure(bind=models.create_db_engine(f"sqlite:///{path}"))
+    clients = []
+    for email in emails:
+        client = app.test_client()
+        client.post("/login", data={"email": email, "password": "patient123"})
+        clients.append(client)
+    barrier.wait()
+    responses = []
+    for client in clients:
+        response = client.post(f"/api/appointments/auto{query}")
+        responses.append((response.status_code, response.get_json()))
+    results.put(responses)
+
+
+def book_in_parallel(path, emails, query=""):
+    """(status, body) of one auto-booking per patient email, spread over WORKERS processes."""
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [
+        context.Process(target=book, args=(path, emails[i::WORKERS], query, barrier, results))
+        for i in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    responses = [response for _ in processes for response in results.get(timeout=120)]
+    for process in processes:
+        process.join()
+    return responses
+
+
+def last_appt_id(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT COALESCE(MAX(Appt_ID), 0) FROM appointment").fetchone()[0]
+
+
+def overlapping(path, owner, watermark):
+    """Pairs of appointments past `watermark` (on either side) that overlap for the same `owner` column."""
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(
+            f"SELECT a.Appt_ID, b.Appt_ID FROM appointment a JOIN appointment b"
+            f" ON b.{owner} = a.{owner} AND b.Date = a.Date AND b.Appt_ID > a.Appt_ID"
+            f" WHERE b.Appt_ID > ? AND {APPT_START_SQL.format(a='a')} < {APPT_END_SQL.format(a='b')}"
+            f" AND {APPT_START_SQL.format(a='b')} < {APPT_END_SQL.format(a='a')}",
+            (watermark,),
+        ).fetchall()
+
+
+def test_parallel_bookings_are_never_double_booked(db_path, layout):
+    watermark = last_appt_id(db_path)
+    emails = [layout.patient_email(n) for n in range(40)]
+
+    responses = book_in_parallel(db_path, emails)
+
+    assert [status for status, _ in responses] == [200] * len(emails)
+    assert overlapping(db_path, "Doctor_ID", watermark) == []
+    assert overlapping(db_path, "Patient_ID", watermark) == []
+
+
+def test_racing_for_the_last_free_slots_only_fails_once_they_are_gone(db_path, layout):
+    # One doctor of their own specialization, booked solid but for a few hours
+    doctor_id = layout.doctor_id(0)
+    filler_id = layout.patient_id(layout.patients - 1)
+    start = datetime.utcnow().date() + timedelta(days=BOOKING_LEAD_DAYS)
+    free = {(start + timedelta(days=offset), 10) for offset in range(0, MAX_DAYS_AHEAD + 1, 6)}
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute("UPDATE doctor SET Specialization = 'Test Triage' WHERE Doctor_ID = ?", (doctor_id,))
+        conn.executemany(
+            "INSERT INTO appointment (Doctor_ID, Patient_ID, Date, Time) VALUES (?, ?, ?, ?)",
+            [
+                (doctor_id, filler_id, day.isoformat(), f"{hour:02d}:00:00.000000")
+                for day in (start + timedelta(days=offset) for offset in range(MAX_DAYS_AHEAD + 1))
+                for hour in SLOT_HOURS
+                if (day, hour) not in free
+            ],
+        )
+    watermark = last_appt_id(db_path)
+    emails = [layout.patient_email(n) for n in range(2 * len(free))]
+
+    responses = book_in_parallel(db_path, emails, "?specialization=Test%20Triage")
+
+    assert sorted(status for status, _ in responses) == [200] * len(free) + [409] * len(free)
+    assert {
+        (date.fromisoformat(body["Date"]), int(body["Time"][:2])) for status, body in responses if status == 200
+    } == free
+    assert all(body["error"] == "No available slots" for status, body in responses if status == 409)
+    assert overlapping(db_path, "Doctor_ID", watermark) == []
@@ -0,0 +1,33 @@
+import sqlite3
+from contextlib import closing
+
+from models import APPT_END_SQL, APPT_START_SQL
+
+
+def test_room_bookings_fit_the_clinic_rooms(dataset):
+    with closing(sqlite3.connect(dataset)) as conn:
+        assert conn.execute("SELECT count(*) FROM clinic_room").fetchone()[0] > 0
+        assert conn.execute("SELECT count(Room_No) FROM room").fetchone()[0] > 0
+        wrong_type = conn.execute(
+            "SELECT count(*) FROM room r JOIN clinic_room c ON c.Room_No = r.Room_No WHERE c.room_type != r.room_type"
+        ).fetchone()[0]
+        assert wrong_type == 0
+        # Bookings of one room overlapping another booking of it, more often than it has places
+        overbooked = conn.execute(
+            "SELECT count(*) FROM room r JOIN appointment a ON a.Appt_ID = r.Appt_ID"
+            " JOIN clinic_room c ON c.Room_No = r.Room_No"
+            " WHERE (SELECT count(*) FROM room r2 JOIN appointment a2 ON a2.Appt_ID = r2.Appt_ID"
+            "        WHERE r2.Room_No = r.Room_No AND a2.Date = a.Date"
+            f"       AND {APPT_START_SQL.format(a='a2')} < {APPT_END_SQL.format(a='a')}"
+            f"       AND {APPT_START_SQL.format(a='a')} < {APPT_END_SQL.format(a='a2')}) > c.Capacity"
+        ).fetchone()[0]
+        assert overbooked == 0
+
+
+def test_nobody_is_double_booked(dataset):
+    with closing(sqlite3.connect(dataset)) as conn:
+        for owner in ("Doctor_ID", "Patient_ID"):
+            clashes = conn.execute(
+                f'SELECT count(*) FROM (SELECT 1 FROM appointment GROUP BY "{owner}", Date, Time HAVING count(*) > 1)'
+            ).fetchone()[0]
+            assert clashes == 0, f"{clashes} double-booked {owner} slots"
@@ -0,0 +1,32 @@
+import models
+from app import app
+from generate_dataset import Layout
+from models import Bill
+
+
+def admin_client():
+    client = app.test_client()
+    client.post("/login", data={"email": Layout.admin_email(0), "password": "admin123"})
+    return client
+
+
+def test_list_without_paging_args_returns_every_row(db_path):
+    response = admin_client().get("/api/bills")
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+    assert len(response.get_json()) == models.session.query(Bill).count()
+
+
+def test_pages_have_their_own_etags(db_path):
+    client = admin_client()
+    first = client.get("/api/bills?limit=10")
+    second = client.get(f"/api/bills?limit=10&after={first.headers['X-Next-Cursor']}")
+    assert len(first.get_json()) == 10
+    assert first.get_json()[-1]["Payment_ID"] < second.get_json()[0]["Payment_ID"]
+    assert first.headers["ETag"] != second.headers["ETag"]
+
+    # A page revalidates against its own ETag only
+    again = client.get("/api/bills?limit=10", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    other = client.get("/api/bills?limit=20", headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
@@ -0,0 +1,21 @@
+from app import app
+from generate_dataset import Layout
+
+
+def test_metrics_need_an_admin_or_the_token(db_path, monkeypatch):
+    visitor = app.test_client()
+    assert visitor.get("/metrics").status_code == 401
+
+    admin = app.test_client()
+    admin.post("/login", data={"email": Layout.admin_email(0), "password": "admin123"})
+    response = admin.get("/metrics")
+    assert response.status_code == 200
+    assert b"hospital_requests_total" in response.data
+
+    patient = app.test_client()
+    patient.post("/login", data={"email": Layout.patient_email(0), "password": "patient123"})
+    assert patient.get("/metrics").status_code == 401
+
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "scrape-secret")
+    assert visitor.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert visitor.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
@@ -0,0 +1,228 @@
+"""
+Query-plan regression check: requests every rule of the app's url_map
+against the generated database, captures each SQL statement it issues and
+runs EXPLAIN QUERY PLAN on it. A statement that falls back to a full table
+scan of appointment, medical_record, bill, treatment or room fails, unless
+the request lists the whole table on purpose.
+
+Every rule needs its requests in PLAN_REQUESTS: a new route fails here
+until it gets them. Run it after touching a filter in a route or an index
+in models.py.
+"""
+import re
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import generate_dataset
+import models
+from app import app
+from generate_dataset import Layout
+
+HOT_TABLES = ("appointment", "medical_record", "bill", "treatment", "room")
+
+# "SCAN bill" is a table scan; "SCAN bill USING [COVERING] INDEX ..." walks an index.
+# SQLite before 3.36 printed "SCAN TABLE bill".
+TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(%s)(?: AS \w+)?$" % "|".join(HOT_TABLES))
+
+# One request to check: who sends it (visitor, patient, doctor or admin), its
+# url, formatted with the ids of the test, the test client kwargs, and the
+# hot tables it may scan because it lists them whole
+PlanRequest = namedtuple("PlanRequest", "who url kwargs allowed", defaults=({}, frozenset()))
+
+WEEK = (date.today() + timedelta(days=7)).isoformat()
+
+
+def listing(table, url):
+    """A whole-table list (which may scan it) and its second page, which must seek by id."""
+    return [
+        PlanRequest("admin", url, allowed=frozenset({table})),
+        PlanRequest("admin", f"{url}?after=100"),
+    ]
+
+
+# 'METHOD /rule' -> the requests checked for it
+PLAN_REQUESTS = {
+    "GET /static/<path:filename>": [PlanRequest("visitor", "/static/style.css")],
+    "GET /": [PlanRequest("visitor", "/")],
+    "POST /login": [PlanRequest("visitor", "/login", {
+        "data": {"email": Layout.patient_email(1), "password": "patient123"},
+    })],
+    "GET /signup": [PlanRequest("visitor", "/signup")],
+    "POST /signup": [PlanRequest("visitor", "/signup", {"json": {
+        "email": "plans@hospital.example", "password": "plans123", "first_name": "Plan",
+        "last_name": "Check", "address": "1 Main St", "phone": "0400000000",
+    }})],
+    "GET /edit_profile": [PlanRequest("patient", "/edit_profile")],
+    "POST /edit_profile": [PlanRequest("patient", "/edit_profile", {"data": {
+        "email": Layout.patient_email(0), "first_name": "Plan", "last_name": "Check",
+        "address": "2 Park Ave", "phone": "0400000001",
+    }})],
+    "GET /patient/<int:patient_id>": [PlanRequest("patient", "/patient/{patient}")],
+    "GET /profile": [
+        PlanRequest("patient", "/profile"), PlanRequest("doctor", "/profile"), PlanRequest("admin", "/profile"),
+    ],
+    "GET /doctor/<int:doctor_id>": [PlanRequest("doctor", "/doctor/{doctor}")],
+    "GET /admin/<int:admin_id>": [PlanRequest("admin", "/admin/{admin}")],
+    "GET /logout": [PlanRequest("patient", "/logout")],
+    "GET /home": [PlanRequest("patient", "/home")],
+    "GET /ViewRecords": [PlanRequest("admin", "/ViewRecords")],
+    "GET /AppointmentView/<int:user_id>": [
+        PlanRequest("patient", "/AppointmentView/{patient}"),
+        PlanRequest("doctor", "/AppointmentView/{doctor}"),
+        PlanRequest("admin", "/AppointmentView/{admin}", allowed=frozenset({"appointment"})),
+    ],
+    "GET /BillView/<int:user_id>": [PlanRequest("patient", "/BillView/{patient}")],
+    "GET /MedicalRecords/<int:user_id>": [
+        PlanRequest("patient", "/MedicalRecords/{patient}"), PlanRequest("doctor", "/MedicalRecords/{doctor}"),
+    ],
+    # Renders templates/RequestAppointment.html, which does not exist: it
+    # fails before any query, so only its status is expected
+    "GET /RequestAppointment": [],
+    "GET /api/patients": [PlanRequest("admin", "/api/patients")],
+    "GET /api/patients/<int:patient_id>/chart": [PlanRequest("patient", "/api/patients/{patient}/chart")],
+    "GET /api/doctors": [PlanRequest("admin", "/api/doctors")],
+    "GET /api/appointments": listing("appointment", "/api/appointments") + [
+        PlanRequest("admin", "/api/appointments?doctor_id={doctor}&date_from=2024-06-01&date_to=2024-06-30"),
+        PlanRequest("admin", "/api/appointments?patient_id={patient}"),
+    ],
+    "GET /api/rooms": listing("room", "/api/rooms"),
+    "GET /api/clinic_rooms": [PlanRequest("admin", "/api/clinic_rooms")],
+    "GET /api/clinic_rooms/free": [
+        PlanRequest("admin", f"/api/clinic_rooms/free?room_type={generate_dataset.ROOM_TYPES[0]}&date={WEEK}&time=10:00"),
+    ],
+    "GET /api/treatments": listing("treatment", "/api/treatments"),
+    "GET /api/users": [PlanRequest("admin", "/api/users")],
+    "GET /api/administrators": [PlanRequest("admin", "/api/administrators")],
+    "GET /api/departments": [PlanRequest("admin", "/api/departments")],
+    "GET /api/medical_records": listing("medical_record", "/api/medical_records") + [
+        PlanRequest("admin", "/api/medical_records?doctor_id={doctor}"),
+    ],
+    "GET /api/bills": listing("bill", "/api/bills") + [
+        PlanRequest("admin", "/api/bills?patient_id={patient}"),
+    ],
+    "GET /api/search/records": [
+        PlanRequest("admin", "/api/search/records?q=pain"),
+        PlanRequest("admin", "/api/search/records?q=pain&after=-5.0:100"),
+        PlanRequest("doctor", "/api/search/records?q=pain"),
+        PlanRequest("patient", "/api/search/records?q=check"),
+    ],
+    "GET /api/search/people": [
+        PlanRequest("admin", "/api/search/people?q=jo"), PlanRequest("patient", "/api/search/people?q=jo"),
+    ],
+    "GET /api/doctors/<int:doctor_id>/availability": [
+        PlanRequest("patient", "/api/doctors/{doctor}/availability"),
+    ],
+    "GET /api/doctors/availability": [
+        PlanRequest("patient", "/api/doctors/availability?ids={doctor}"),
+        PlanRequest("patient", f"/api/doctors/availability?specialization={generate_dataset.SPECIALIZATIONS[6]}"),
+    ],
+    "POST /api/records/<string:rtype>": [
+        PlanRequest("admin", "/api/records/Bills", {"json": {
+            "Patient_ID": "{patient}", "Date": "2025-03-01", "Cost": "120.00", "Paid": "No",
+        }}),
+        PlanRequest("admin", "/api/records/Appointments", {"json": {"Appt_ID": "1", "Time": "10:00"}}),
+        PlanRequest("admin", "/api/records/Appointments", {"json": [
+            {"Doctor_ID": "{doctor}", "Patient_ID": "{patient}", "Date": WEEK, "Time": "11:00"},
+            {"Doctor_ID": "{doctor}", "Patient_ID": "{patient}", "Date": WEEK, "Time": "11:00"},
+        ]}),
+    ],
+    "GET /api/appointments/suggestions": [PlanRequest("patient", "/api/appointments/suggestions")],
+    "POST /api/appointments/auto": [
+        PlanRequest("patient", "/api/appointments/auto"),
+        PlanRequest("patient", "/api/appointments/auto", {"json": {"room_type": generate_dataset.ROOM_TYPES[0]}}),
+    ],
+    "POST /api/appointments/batch": [
+        PlanRequest("admin", "/api/appointments/batch", {"json": [{"Patient_ID": "{patient}"}]}),
+    ],
+    "GET /metrics": [PlanRequest("visitor", "/metrics"), PlanRequest("admin", "/metrics")],
+}
+
+# Rules whose only request is expected to fail, with the status
+BROKEN_RULES = {"GET /RequestAppointment": 500}
+
+RULES = sorted(
+    f"{method} {rule.rule}"
+    for rule in app.url_map.iter_rules()
+    for method in rule.methods - {"HEAD", "OPTIONS"}
+)
+
+
+def logged_in_client(email, password):
+    client = app.test_client()
+    client.post("/login", data={"email": email, "password": password})
+    with client.session_transaction() as flask_session:
+        user_id = flask_session.get("user_id")
+    return client, user_id
+
+
+def filled(value, ids):
+    """`value` with the {id} fields of every string in it formatted."""
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: filled(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [filled(item, ids) for item in value]
+    return value
+
+
+def capture(client, method, url, kwargs):
+    """Runs one request and returns (response, the (statement, parameters) pairs it executed)."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    engine = models.session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = getattr(client, method)(url, **kwargs)
+        # Streamed bodies run their queries as they are read
+        response.get_data()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def query_plan(explain_conn, statement, parameters):
+    rows = explain_conn.execute("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+    return [row[3] for row in rows]
+
+
+@pytest.mark.parametrize("rule", RULES)
+def test_no_table_scans_on_hot_tables(rule, db_path, layout):
+    if rule not in PLAN_REQUESTS:
+        pytest.fail(f"no plan requests for {rule}: add them to PLAN_REQUESTS")
+    method, path = rule.split(" ", 1)
+    clients = {"visitor": app.test_client()}
+    clients["patient"], patient_id = logged_in_client(layout.patient_email(0), "patient123")
+    clients["doctor"], doctor_id = logged_in_client(layout.doctor_email(0), "doc123")
+    clients["admin"], admin_id = logged_in_client(layout.admin_email(0), "admin123")
+    ids = {"patient": patient_id, "doctor": doctor_id, "admin": admin_id}
+
+    if rule in BROKEN_RULES:
+        response = getattr(clients["patient"], method.lower())(path)
+        assert response.status_code == BROKEN_RULES[rule]
+        return
+
+    adapter = app.url_map.bind("localhost")
+    scans = []
+    with closing(sqlite3.connect(db_path)) as explain_conn:
+        for request in PLAN_REQUESTS[rule]:
+            url = filled(request.url, ids)
+            matched, _ = adapter.match(url.split("?")[0], method=method, return_rule=True)
+            assert f"{method} {matched.rule}" == rule, f"{url} is not a request for {rule}"
+            response, statements = capture(clients[request.who], method.lower(), url, filled(request.kwargs, ids))
+            assert response.status_code < 500, f"{method} {url} returned {response.status_code}"
+            for statement, parameters in statements:
+                for step in query_plan(explain_conn, statement, parameters):
+                    match = TABLE_SCAN.match(step)
+                    if match and match.group(1) not in request.allowed:
+                        scans.append(f"{url}: {step}\n  {' '.join(statement.split())}")
+    assert not scans, "full scans of hot tables:\n" + "\n".join(scans)
@@ -0,0 +1,27 @@
+import models
+from app import app
+from generate_dataset import Layout
+from search import search_records
+
+
+def test_search_pages_cover_every_hit_once(db_path):
+    client = app.test_client()
+    client.post("/login", data={"email": Layout.admin_email(0), "password": "admin123"})
+    everything, next_after = search_records(models.session, "pain", limit=100000)
+    assert everything and next_after is None
+
+    paged, url = [], "/api/search/records?q=pain&limit=7"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        paged.extend(hit["Record_ID"] for hit in response.get_json())
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/search/records?q=pain&limit=7&after={cursor}" if cursor else None
+    assert paged == [hit["Record_ID"] for hit in everything]
+
+
+def test_search_rejects_bad_cursor(db_path):
+    client = app.test_client()
+    client.post("/login", data={"email": Layout.admin_email(0), "password": "admin123"})
+    assert client.get("/api/search/records?q=pain&after=40").status_code == 400
+    assert client.get("/api/search/records?q=pain&after=nan:3").status_code == 400
@@ -0,0 +1,226 @@
+"""
+What each transaction writes, collected by one set of session hooks per
+session factory and handed to subscribers once the transaction commits:
+the scheduling indexes (see appointment_changes) and the patient chart
+cache build on it.
+
+Subscribers watch tables and columns. For those, every written row is
+recorded as an (old, new) pair of {column: value} dicts of the watched
+columns, None for the side that does not exist (a create or a delete); the
+two are equal when only other columns changed. Rows come from:
+
+  - unit-of-work flushes, with the old values from the attribute history;
+  - bulk INSERTs with their parameters, and bulk UPDATEs by primary key,
+    whose rows are read just before the statement runs;
+  - other UPDATE/DELETE statements, whose rows are not known here: the
+    table is marked unknown and subscribers drop what they hold of it.
+
+Rows written inside a savepoint that is rolled back are forgotten with it.
+Callbacks registered with after_write run inside the transaction after
+each flush or bulk statement, e.g. to bump the shared table versions.
+"""
+from sqlalchemy import event, inspect, select
+from lookups import as_id, chunked
+
+
+class TransactionWrites:
+    """The writes of one transaction."""
+
+    def __init__(self):
+        self.tables = set()    # every table written
+        self.rows = {}         # watched table -> [(old, new), ...]
+        self.unknown = set()   # watched tables written by statements whose rows are not known
+        self.versions = {}     # table -> (version before, version after) of the shared versions bumped
+
+    def changes(self, table):
+        """[(old, new)] rows written to a watched table; None if some are not known."""
+        if table in self.unknown:
+            return None
+        return self.rows.get(table, [])
+
+    def checkpoint(self):
+        return (
+            set(self.tables), {table: len(rows) for table, rows in self.rows.items()}, set(self.unknown),
+            dict(self.versions),
+        )
+
+    def restore(self, checkpoint):
+        self.tables, counts, self.unknown, self.versions = checkpoint
+        self.rows = {table: self.rows[table][:count] for table, count in counts.items()}
+
+
+def _row_values(state, columns):
+    return {column: getattr(state.obj(), column) for column in columns}
+
+
+def _old_values(state, columns):
+    """Column values of a flushed object as they were before the flush."""
+    values = {}
+    attrs = state.attrs
+    for column in columns:
+        history = attrs[column].history
+        if history.deleted:
+            values[column] = history.deleted[0]
+        elif history.unchanged:
+            values[column] = history.unchanged[0]
+        else:
+            values[column] = attrs[column].value
+    return values
+
+
+def _id_columns(mapper):
+    """Names of the primary and foreign key columns: payloads may carry them as strings."""
+    return {column.key for column in mapper.local_table.columns if column.primary_key or column.foreign_keys}
+
+
+class WriteTracker:
+    def __init__(self):
+        self.columns = {}       # watched table -> [column, ...]
+        self.subscribers = []   # callables taking the TransactionWrites of each commit
+        self.writers = []       # callables taking (session, TransactionWrites) after each write, in its transaction
+
+    def watch(self, table, columns):
+        """Records rows written to `table` with (at least) these columns."""
+        watched = self.columns.setdefault(table, [])
+        watched.extend(column for column in columns if column not in watched)
+
+    def subscribe(self, callback):
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def after_write(self, callback):
+        if callback not in self.writers:
+            self.writers.append(callback)
+
+    # --- session hooks ---
+
+    def listen(self, session_factory):
+        event.listen(session_factory, "after_flush", self._collect_flushed)
+        event.listen(session_factory, "do_orm_execute", self._collect_executed)
+        event.listen(session_factory, "after_transaction_create", self._begin)
+        event.listen(session_factory, "after_commit", self._commit)
+        event.listen(session_factory, "after_transaction_end", self._end)
+
+    @staticmethod
+    def _pending(session):
+        writes = session.info.get("writes")
+        if writes is None:
+            writes = session.info["writes"] = TransactionWrites()
+        return writes
+
+    def _written(self, session, writes):
+        for callback in self.writers:
+            callback(session, writes)
+
+    def _collect_flushed(self, session, _flush_context):
+        writes = self._pending(session)
+        for objects, has_old, has_new in (
+            (session.new, False, True), (session.dirty, True, True), (session.deleted, True, False),
+        ):
+            for obj in objects:
+                if has_old and has_new and not session.is_modified(obj, include_collections=False):
+                    continue
+                state = inspect(obj)
+                table = state.mapper.local_table.name
+                writes.tables.add(table)
+                columns = self.columns.get(table)
+                if not columns or table in writes.unknown:
+                    continue
+                old = _old_values(state, columns) if has_old else None
+                new = _row_values(state, columns) if has_new else None
+                writes.rows.setdefault(table, []).append((old, new))
+        self._written(session, writes)
+
+    def _collect_executed(self, orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is None:
+            return
+        session = orm_execute_state.session
+        table = mapper.local_table.name
+        writes = self._pending(session)
+        writes.tables.add(table)
+        columns = self.columns.get(table)
+        if columns and table not in writes.unknown:
+            self._collect_rows(session, writes, mapper, table, columns, orm_execute_state)
+        self._written(session, writes)
+
+    def _collect_rows(self, session, writes, mapper, table, columns, orm_execute_state):
+        parameters = orm_execute_state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+        ids = _id_columns(mapper)
+        key = mapper.primary_key[0].key if len(mapper.primary_key) == 1 else None
+
+        def normalized(row):
+            return {column: as_id(row[column]) if column in ids else row[column] for column in columns if column in row}
+
+        if rows and orm_execute_state.is_insert:
+            writes.rows.setdefault(table, []).extend(
+                (None, {column: None for column in columns} | normalized(row)) for row in rows
+            )
+        elif rows and orm_execute_state.is_update and key and all(key in row for row in rows):
+            # Bulk UPDATE by primary key: read the rows as they are before it runs
+            old = self._stored_rows(session, mapper, key, columns, [as_id(row[key]) for row in rows])
+            changed = writes.rows.setdefault(table, [])
+            for row in rows:
+                before = old.get(as_id(row[key]))
+                if before is not None:
+                    changed.append((before, before | normalized(row)))
+        else:
+            writes.unknown.add(table)
+
+    @staticmethod
+    def _stored_rows(session, mapper, key, columns, ids):
+        model = mapper.class_
+        stored = {}
+        for chunk in chunked(ids):
+            for row in session.execute(
+                select(getattr(model, key), *(getattr(model, column) for column in columns))
+                .where(getattr(model, key).in_(chunk))
+            ):
+                stored[row[0]] = dict(zip(columns, row[1:]))
+        return stored
+
+    def _begin(self, session, transaction):
+        if transaction.nested:
+            session.info.setdefault("write_checkpoints", {})[transaction] = self._pending(session).checkpoint()
+
+    def _commit(self, session):
+        nested = session.get_nested_transaction()
+        if nested is not None:
+            # A savepoint was released: its writes stay with the transaction
+            session.info.get("write_checkpoints", {}).pop(nested, None)
+            return
+        writes = session.info.pop("writes", None)
+        if writes is None or not writes.tables:
+            return
+        for callback in self.subscribers:
+            callback(writes)
+
+    def _end(self, session, transaction):
+        if transaction.nested:
+            # Still checkpointed: the savepoint was rolled back
+            checkpoint = session.info.get("write_checkpoints", {}).pop(transaction, None)
+            if checkpoint is not None and "writes" in session.info:
+                session.info["writes"].restore(checkpoint)
+        elif transaction.parent is None:
+            session.info.pop("writes", None)
+            session.info.pop("write_checkpoints", None)
+
+
+_trackers = {}
+
+
+def write_tracker(session_factory):
+    """The WriteTracker of a session factory, listening to its sessions from the first call on."""
+    tracker = _trackers.get(session_factory)
+    if tracker is None:
+        tracker = _trackers[session_factory] = WriteTracker()
+        tracker.listen(session_factory)
+    return tracker
+
+
+def pending_writes(session):
+    """The TransactionWrites of the session's transaction so far, or None."""
+    return session.info.get("writes")